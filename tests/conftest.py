@@ -0,0 +1,45 @@
+import pytest
+from apscheduler.schedulers.background import BackgroundScheduler
+
+from watchtower.checks import DnsCheck
+from watchtower.cluster import Coordinator
+from watchtower.executors import CheckExecutors
+from watchtower.models import Config
+from watchtower.testcases import StateLog, TestSuite
+
+
+class FakeExecutors(CheckExecutors):
+    """Stands in for CheckExecutors, returns canned results instead of probing"""
+
+    def __init__(self, results=None):
+        super().__init__()
+        self.results = results or {}
+        self.ran = []
+
+    def run(self, test):
+        self.ran.append(test)
+        result = self.results.get(test.target, self.results.get(type(test), True))
+        if isinstance(test, DnsCheck):
+            test.address = "192.0.2.1" if result else None
+        return result
+
+    async def run_async(self, test):
+        return self.run(test)
+
+    def shutdown(self):
+        pass
+
+
+@pytest.fixture
+def make_suite():
+    def make(hosts, results=None, coordinated=False, **kwargs):
+        suite = TestSuite(
+            scheduler=BackgroundScheduler(), state_log=StateLog(100), executors=FakeExecutors(results), **kwargs
+        )
+        if coordinated:
+            # Sharded mode, tests join workers to the coordinator by hand
+            suite.coordinator = Coordinator(suite)
+        suite.initialize_tests(Config(config_version=1, hosts=hosts))
+        return suite
+
+    return make
@@ -0,0 +1,85 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from watchtower.alerts import Alert, AlertDispatcher, Digest, Notifier
+
+
+class MemoryNotifier(Notifier):
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.digests = []
+        self.gate = None
+
+    async def send(self, digest):
+        if self.gate:
+            await asyncio.get_running_loop().run_in_executor(None, self.gate.wait)
+        self.digests.append(digest)
+
+
+def alert(i, previous=True, state=False):
+    return Alert(f"check-{i}", f"group-{i % 3}", "ping", f"192.0.2.{i % 250}", previous, state, False, time.time())
+
+
+@pytest.fixture
+def dispatcher():
+    dispatchers = []
+
+    def make(*notifiers, **kwargs):
+        dispatcher = AlertDispatcher(list(notifiers), batch_window=0.1, **kwargs)
+        dispatcher.start()
+        dispatchers.append(dispatcher)
+        return dispatcher
+
+    yield make
+    for dispatcher in dispatchers:
+        dispatcher.stop(timeout=2)
+
+
+def test_outage_is_one_digest(dispatcher):
+    notifier = MemoryNotifier()
+    alerts = dispatcher(notifier)
+    for i in range(5000):
+        alerts.submit(alert(i))
+    alerts.stop(timeout=2)
+    (digest,) = notifier.digests
+    assert digest.counts == {"down": 5000}
+    assert len(digest.groups) == 3
+
+
+def test_bounces_are_not_sent(dispatcher):
+    notifier = MemoryNotifier()
+    alerts = dispatcher(notifier)
+    alerts.submit(alert(1))
+    alerts.submit(alert(1, previous=False, state=True))
+    alerts.submit(alert(2))
+    alerts.stop(timeout=2)
+    (digest,) = notifier.digests
+    assert [a.test_id for a in digest.alerts] == ["check-2"]
+
+
+def test_pending_alerts_are_bounded_behind_a_slow_notifier(dispatcher):
+    notifier = MemoryNotifier()
+    notifier.gate = threading.Event()
+    alerts = dispatcher(notifier, queue_size=100)
+    alerts.submit(alert(0))
+    time.sleep(0.3)
+    # The notifier is now stuck sending the first digest
+    for round_ in range(5):
+        for i in range(80):
+            alerts.submit(alert(1000 + i + round_ * 80))
+        time.sleep(0.2)
+    assert len(alerts._pending[notifier]) == 100
+    assert notifier.dropped == 300
+    assert alerts.dropped == 300
+    notifier.gate.set()
+    alerts.stop(timeout=2)
+    assert notifier.digests[-1].dropped == 300
+
+
+def test_digest_text_lists_alerts():
+    digest = Digest([alert(1), alert(2, previous=False, state=True)], dropped=4)
+    assert digest.subject == "[WatchTower] 1 down, 1 up in 2 groups"
+    assert "4 alerts were dropped" in digest.text()
@@ -0,0 +1,57 @@
+from watchtower.checks import DnsCheck, TcpCheck
+from watchtower.models import Check, Host
+
+
+def tcp(port=80):
+    return Check(type="tcp", options={"port": port})
+
+
+def dns(**options):
+    return Check(type="dns", options=options)
+
+
+def batch_of(suite, target):
+    return suite.batches[(target, 60)]
+
+
+def probed(suite):
+    return [type(test) for test in suite.executors.ran]
+
+
+def test_failed_a_lookup_gates_probes(make_suite):
+    suite = make_suite([Host("web", "Web", "web.example.com", [dns(), tcp()])], {DnsCheck: False}, coalesce=True)
+    suite.run_batch(batch_of(suite, "web.example.com"))
+    assert probed(suite) == [DnsCheck]
+    test = next(test for test, _ in suite.tests.values() if isinstance(test, TcpCheck))
+    assert test.last_run_successful is False
+    assert "Could not resolve" in test.extended_results
+
+
+def test_passing_a_lookup_shares_its_address(make_suite):
+    suite = make_suite([Host("web", "Web", "web.example.com", [dns(), tcp()])], coalesce=True)
+    suite.run_batch(batch_of(suite, "web.example.com"))
+    assert probed(suite) == [DnsCheck, TcpCheck]
+
+
+def test_other_record_types_do_not_gate(make_suite, monkeypatch):
+    batch_resolved = []
+    monkeypatch.setattr("watchtower.batch.HostBatch.resolve", lambda self: batch_resolved.append(1) or "192.0.2.1")
+    checks = [dns(record_type="MX"), dns(nameservers=["192.0.2.53"]), tcp()]
+    suite = make_suite([Host("mail", "Mail", "mail.example.com", checks)], {DnsCheck: False}, coalesce=True)
+    suite.run_batch(batch_of(suite, "mail.example.com"))
+    assert probed(suite) == [DnsCheck, DnsCheck, TcpCheck]
+    assert batch_resolved == [1]
+
+
+def test_ip_literal_targets_are_never_gated(make_suite):
+    suite = make_suite([Host("local", "Local", "127.0.0.1", [dns(), tcp()])], {DnsCheck: False}, coalesce=True)
+    suite.run_batch(batch_of(suite, "127.0.0.1"))
+    assert probed(suite) == [DnsCheck, TcpCheck]
+
+
+def test_suppressed_checks_are_not_failed_as_unresolved(make_suite):
+    suite = make_suite([Host("web", "Web", "web.example.com", [dns(), tcp()])], {DnsCheck: False}, coalesce=True)
+    tcp_check = next(test for test, _ in suite.tests.values() if isinstance(test, TcpCheck))
+    tcp_check.suppressed = True
+    suite.run_batch(batch_of(suite, "web.example.com"))
+    assert tcp_check.last_run_successful is None
@@ -0,0 +1,103 @@
+import hashlib
+import multiprocessing
+
+import pytest
+
+from watchtower.browserpool import BrowserPool, BrowserWorker
+
+
+class FakeDriver:
+    """Picklable stand-in for a WebDriver, pages "load" instantly"""
+
+    def __init__(self, browser):
+        self.browser = browser
+
+    def set_page_load_timeout(self, timeout):
+        pass
+
+    def get(self, url):
+        self.url = url
+
+    def execute_script(self, script):
+        return None
+
+    def get_screenshot_as_png(self):
+        return f"png of {self.url}".encode()
+
+    def quit(self):
+        pass
+
+
+def fake_driver(browser):
+    return FakeDriver(browser)
+
+
+def job(url="https://web.example.com", **extra):
+    return {"url": url, "timeout": 5, **extra}
+
+
+def test_close_kills_a_worker_outside_its_process_group(monkeypatch):
+    worker = BrowserWorker(multiprocessing.get_context("spawn"), "chrome", fake_driver)
+
+    def no_group(pid, sig):
+        raise ProcessLookupError(pid)
+
+    monkeypatch.setattr("watchtower.browserpool.os.killpg", no_group)
+    worker.healthy = False
+    worker.close(timeout=5)
+    assert not worker.process.is_alive()
+
+
+@pytest.fixture
+def pool():
+    pool = BrowserPool(size=1, max_uses=2, driver_factory=fake_driver)
+    yield pool
+    pool.shutdown()
+
+
+def test_idle_workers_are_reused(pool):
+    with pool.checkout("chrome", 5) as first:
+        assert first.load(job())["ok"]
+    with pool.checkout("chrome", 5) as again:
+        assert again is first
+
+
+def test_checkout_waits_for_a_free_slot(pool):
+    with pool.checkout("chrome", 5) as worker:
+        assert worker is not None
+        with pool.checkout("chrome", 0.1) as busy:
+            assert busy is None
+    assert pool.load("chrome", "https://web.example.com", timeout=0.1)["ok"]
+
+
+def test_workers_are_retired_after_max_uses(pool):
+    with pool.checkout("chrome", 5) as first:
+        first.load(job())
+        first.load(job())
+    assert pool._idle == []
+    with pool.checkout("chrome", 5) as fresh:
+        assert fresh is not first and fresh.uses == 0
+
+
+def test_unhealthy_workers_are_retired(pool):
+    with pool.checkout("chrome", 5) as first:
+        first.healthy = False
+    with pool.checkout("chrome", 5) as fresh:
+        assert fresh is not first
+
+
+def test_idle_worker_of_another_browser_is_replaced(pool):
+    with pool.checkout("chrome", 5) as chrome:
+        chrome.load(job())
+    with pool.checkout("firefox", 5) as firefox:
+        assert firefox.browser == "firefox"
+    assert pool._count == 1 and pool._idle == [firefox]
+
+
+def test_unchanged_screenshots_are_not_sent_back(pool):
+    url = "https://web.example.com"
+    digest = hashlib.sha256(f"png of {url}".encode()).hexdigest()
+    result = pool.load("chrome", url, screenshot=True)
+    assert result["screenshot_digest"] == digest and result["screenshot"] == f"png of {url}".encode()
+    result = pool.load("chrome", url, screenshot=True, previous_digest=digest)
+    assert result["screenshot_digest"] == digest and "screenshot" not in result
@@ -0,0 +1,35 @@
+import asyncio
+
+from watchtower.checks import TcpCheck
+
+
+class FakeWriter:
+    def __init__(self):
+        self.closed = self.waited = False
+
+    def close(self):
+        self.closed = True
+
+    async def wait_closed(self):
+        self.waited = True
+
+
+def test_async_tcp_check_waits_for_its_transport_to_close(monkeypatch):
+    writer = FakeWriter()
+
+    async def open_connection(address, port):
+        return None, writer
+
+    monkeypatch.setattr("watchtower.checks.asyncio.open_connection", open_connection)
+    assert asyncio.run(TcpCheck("127.0.0.1", options={"port": 80}).async_run()) is True
+    assert writer.closed and writer.waited
+
+
+def test_async_tcp_check_against_a_local_server():
+    async def run():
+        server = await asyncio.start_server(lambda reader, writer: writer.close(), "127.0.0.1", 0)
+        port = server.sockets[0].getsockname()[1]
+        async with server:
+            return await TcpCheck("127.0.0.1", options={"port": port}).async_run()
+
+    assert asyncio.run(run()) is True
@@ -0,0 +1,151 @@
+import threading
+import time
+
+import pytest
+
+from watchtower.checks import BrowserCheck, PingCheck
+from watchtower.cluster import HashRing, WorkerSuite, host_key, run_worker, worker_settings
+from watchtower.models import Check, Host
+from watchtower.ratelimit import ProbeLimiter
+from watchtower.screenshots import ScreenshotStore
+
+
+def test_ring_is_empty_without_nodes():
+    assert HashRing().node_for("web") is None
+
+
+def test_ring_moves_only_keys_of_a_new_node():
+    ring = HashRing()
+    ring.add("a")
+    ring.add("b")
+    keys = [f"host{i}" for i in range(1000)]
+    before = {key: ring.node_for(key) for key in keys}
+    ring.add("c")
+    after = {key: ring.node_for(key) for key in keys}
+    moved = [key for key in keys if before[key] != after[key]]
+    assert all(after[key] == "c" for key in moved)
+    assert 200 < len(moved) < 470
+    ring.remove("c")
+    assert {key: ring.node_for(key) for key in keys} == before
+
+
+class FakeConn:
+    def __init__(self):
+        self.sent = []
+
+    def send(self, message):
+        self.sent.append(message)
+
+    def of_kind(self, kind):
+        return [payload for sent_kind, payload in self.sent if sent_kind == kind]
+
+
+def join(coordinator, name):
+    conn = FakeConn()
+    coordinator._join(name, conn)
+    coordinator._rebalance_timer.cancel()
+    coordinator._rebalance()
+    return conn
+
+
+def hosts(count):
+    return [Host(f"web{i}", "Web", f"web{i}.example.com", [Check(type="ping")]) for i in range(count)]
+
+
+def added(conn):
+    return {sharded.descriptor.test_id for payload in conn.of_kind("add") for sharded in payload}
+
+
+def removed(conn):
+    return {test_id for payload in conn.of_kind("remove") for test_id in payload}
+
+
+def test_hosts_are_handed_out_when_workers_join(make_suite):
+    suite = make_suite(hosts(20), coordinated=True)
+    coordinator = suite.coordinator
+    assert coordinator.status()["unassigned_checks"] == 20
+    first = join(coordinator, "w1")
+    assert added(first) == set(suite.tests)
+
+    second = join(coordinator, "w2")
+    moved = added(second)
+    assert moved and moved == removed(first)
+    assert coordinator.status()["workers"]["w1"]["checks"] + len(moved) == 20
+    assert not suite.executors.ran
+
+
+def test_results_only_count_from_the_owner(make_suite):
+    suite = make_suite(hosts(1), coordinated=True)
+    coordinator = suite.coordinator
+    join(coordinator, "w1")
+    test_id, (test, _) = next(iter(suite.tests.items()))
+    coordinator._record("w2", test_id, False, 0.1, {})
+    assert test.last_run_successful is None
+    coordinator._record("w1", test_id, True, 0.1, {"extended_results": "ok"})
+    assert test.last_run_successful is True and test.extended_results == "ok"
+
+
+def test_workers_skip_checks_behind_a_down_host(make_suite):
+    checks = [
+        Host("gw", "Net", "gw.example.com", [Check(type="ping")]),
+        Host("web", "Web", "web.example.com", [Check(type="ping")], depends_on=["gw"]),
+    ]
+    suite = make_suite(checks, coordinated=True)
+    coordinator = suite.coordinator
+    conn = join(coordinator, "w1")
+    gw_id = next(test_id for test_id, (test, _) in suite.tests.items() if test.target == "gw.example.com")
+    web_id = next(test_id for test_id in suite.tests if test_id != gw_id)
+
+    coordinator._record("w1", gw_id, False, 0.1, {})
+    assert conn.of_kind("suppress") == [{web_id: True}]
+    coordinator._record("w1", gw_id, True, 0.1, {})
+    assert conn.of_kind("suppress")[-1] == {web_id: False}
+    assert not suite.executors.ran
+
+
+def test_worker_screenshots_go_to_the_coordinator_store(make_suite, tmp_path):
+    checks = [Host("web", "Web", "https://web.example.com", [Check(type="browser")])]
+    suite = make_suite(checks, coordinated=True, screenshot_store=ScreenshotStore(str(tmp_path)))
+    join(suite.coordinator, "w1")
+    test_id, (test, _) = next(iter(suite.tests.items()))
+    assert isinstance(test, BrowserCheck)
+    suite.coordinator._record("w1", test_id, True, 1.0, {"screenshot": ("ab" * 32, b"\x89PNG")})
+    assert suite.screenshot_store.latest_digest(test_id) == "ab" * 32
+    assert test.screenshot is None
+
+
+def test_workers_take_the_coordinator_settings(make_suite):
+    suite = make_suite([], spread=False, jitter=5, limiter=ProbeLimiter(max_per_target=2, rate=10))
+    settings = worker_settings(suite)
+    worker = WorkerSuite.configured(FakeConn(), suite.scheduler, settings)
+    assert (worker.spread, worker.jitter, worker.coalesce) == (False, 5, suite.coalesce)
+    assert (worker.limiter.max_per_target, worker.limiter.rate) == (2, 10)
+    assert worker.executors.modes == suite.executors.modes
+
+    host = Host("web", "Web", "web.example.com", [])
+    check = PingCheck("web.example.com")
+    worker.add_test(host, check)
+    worker.apply("suppress", {check.test_id: True})
+    assert check.suppressed
+
+
+def test_worker_connects_and_stops(make_suite):
+    suite = make_suite(hosts(2), coordinated=True)
+    coordinator = suite.coordinator
+    coordinator.start()
+    worker = threading.Thread(
+        target=run_worker, args=(coordinator.address, coordinator.authkey, "w1"), kwargs={"reconnect": False}
+    )
+    worker.start()
+    deadline = time.monotonic() + 5
+    while "w1" not in coordinator.workers and time.monotonic() < deadline:
+        time.sleep(0.05)
+    assert "w1" in coordinator.workers
+    coordinator.stop()
+    worker.join(5)
+    assert not worker.is_alive()
+
+
+@pytest.mark.parametrize("name", ["web", "db"])
+def test_host_key_includes_group_and_target(name):
+    assert host_key(Host(name, "G", f"{name}.example.com", [])) == f"G|{name}|{name}.example.com"
@@ -0,0 +1,84 @@
+import json
+
+import pytest
+
+from watchtower.config import ConfigLoader, InvalidWatchTowerConfigException
+
+
+def load(tmp_path, hosts, **extra):
+    path = tmp_path / "watchtower.json"
+    path.write_text(json.dumps({"config_version": 1, "hosts": hosts, **extra}))
+    return ConfigLoader().load(str(path))
+
+
+def errors(tmp_path, hosts, **extra):
+    with pytest.raises(InvalidWatchTowerConfigException) as raised:
+        load(tmp_path, hosts, **extra)
+    return raised.value.errors
+
+
+def host(name, **fields):
+    return {"name": name, "target": f"{name}.example.com", "checks": [{"type": "ping"}], **fields}
+
+
+def test_depends_on_is_expanded_for_ranges(tmp_path):
+    config = load(tmp_path, [host("sw{i}", range=[1, 2]), host("web{i}", range=[1, 2], depends_on="sw{i}")])
+    assert [h.depends_on for h in config.hosts] == [[], [], ["sw1"], ["sw2"]]
+
+
+def test_unknown_and_self_dependencies(tmp_path):
+    found = errors(tmp_path, [host("web", depends_on=["gw", "web"])])
+    assert any("unknown host 'gw'" in error for error in found)
+    assert any("cannot depend on itself" in error for error in found)
+
+
+def test_dependency_cycles(tmp_path):
+    found = errors(tmp_path, [host("a", depends_on="b"), host("b", depends_on="a")])
+    assert any("dependency cycle" in error for error in found)
+
+
+def test_duplicate_names_rejected_with_dependencies(tmp_path):
+    found = errors(tmp_path, [host("gw"), host("gw"), host("web", depends_on="gw")])
+    assert len(found) == 1
+    assert found[0].endswith(
+        "hosts[1].name: host 'gw' is already defined, names must be unique when depends_on is used"
+    )
+
+
+def test_duplicate_names_allowed_without_dependencies(tmp_path):
+    assert len(load(tmp_path, [host("gw"), host("gw")]).hosts) == 2
+
+
+def checks(*entries):
+    return [{"name": "web", "target": "web.example.com", "checks": list(entries)}]
+
+
+def test_check_options_validated_per_type(tmp_path):
+    found = errors(
+        tmp_path,
+        checks(
+            {"type": "tcp"},
+            {"type": "port", "options": {"port": 70000}},
+            {"type": "dns", "options": {"record_type": "TXT"}},
+            {"type": "http_status", "options": {"method": "POST", "timeout": 0}},
+            {"type": "ping", "options": {"failures": "5/3"}},
+        ),
+    )
+    assert any("checks[0].options: missing required option 'port'" in error for error in found)
+    assert any("checks[1].options.port" in error for error in found)
+    assert any("checks[2].options.record_type" in error for error in found)
+    assert any("checks[3].options.method" in error for error in found)
+    assert any("checks[3].options.timeout" in error for error in found)
+    assert any("checks[4].options.failures" in error for error in found)
+
+
+def test_valid_check_options_load(tmp_path):
+    config = load(
+        tmp_path,
+        checks(
+            {"type": "tcp", "options": {"port": 443, "timeout": 2.5}},
+            {"type": "dns", "options": {"record_type": "mx", "nameservers": ["1.1.1.1"]}},
+            {"type": "browser", "options": {"browser": "firefox"}},
+        ),
+    )
+    assert len(config.hosts[0].checks) == 3
@@ -0,0 +1,88 @@
+from types import SimpleNamespace
+
+import pytest
+
+from watchtower.checks import PingCheck, TcpCheck
+from watchtower.dependencies import DependencyGraph, topological_order
+from watchtower.models import Check, Host
+
+
+def test_topological_order_puts_parents_first():
+    order = topological_order({"web": {"sw"}, "sw": {"gw"}, "db": {"sw"}})
+    assert order.index("gw") < order.index("sw") < order.index("web")
+    assert order.index("sw") < order.index("db")
+
+
+def test_topological_order_names_the_cycle():
+    with pytest.raises(ValueError, match="dependency cycle"):
+        topological_order({"a": {"b"}, "b": {"c"}, "c": {"a"}})
+
+
+def graph(**depends_on):
+    dependencies = DependencyGraph()
+    hosts = [SimpleNamespace(name=name, depends_on=parents) for name, parents in depends_on.items()]
+    dependencies.configure(hosts)
+    return dependencies
+
+
+def test_down_parent_makes_descendants_unreachable():
+    dependencies = graph(gw=[], sw=["gw"], web=["sw"])
+    dependencies.track("gw-ping", "gw", True)
+    assert dependencies.record("gw-ping", False) == ["sw", "web"]
+    assert dependencies.suppressed("web") and not dependencies.suppressed("gw")
+    assert dependencies.record("gw-ping", True) == ["sw", "web"]
+    assert not dependencies.unreachable
+
+
+def test_host_is_down_only_when_every_check_fails():
+    dependencies = graph(gw=[], web=["gw"])
+    dependencies.track("gw-ping", "gw", True)
+    dependencies.track("gw-tcp", "gw", True)
+    assert dependencies.record("gw-ping", False) == []
+    assert dependencies.record("gw-tcp", False) == ["web"]
+    assert dependencies.untrack("gw-tcp") == []
+    assert dependencies.untrack("gw-ping") == ["web"]
+
+
+def test_suite_skips_checks_behind_a_down_host(make_suite):
+    hosts = [
+        Host("gw", "Net", "gw.example.com", [Check(type="ping")]),
+        Host("web", "Web", "web.example.com", [Check(type="tcp", options={"port": 80})], depends_on=["gw"]),
+    ]
+    suite = make_suite(hosts, {"gw.example.com": False})
+    (ping, ping_group), = [entry for entry in suite.tests.values() if isinstance(entry[0], PingCheck)]
+    (tcp, tcp_group), = [entry for entry in suite.tests.values() if isinstance(entry[0], TcpCheck)]
+
+    suite.run_test(ping, ping_group)
+    assert tcp.suppressed
+    assert suite.run_test(tcp, tcp_group) is None
+    assert tcp not in suite.executors.ran
+
+    suite.executors.results["gw.example.com"] = True
+    suite.run_test(ping, ping_group)
+    assert not tcp.suppressed
+    suite.run_test(tcp, tcp_group)
+    assert tcp in suite.executors.ran
+
+
+def test_suppressed_period_is_not_counted_as_missed_runs(make_suite, monkeypatch):
+    hosts = [
+        Host("gw", "Net", "gw.example.com", [Check(type="ping")]),
+        Host("web", "Web", "web.example.com", [Check(type="tcp", options={"port": 80})], depends_on=["gw"]),
+    ]
+    suite = make_suite(hosts, {"gw.example.com": False})
+    (ping, ping_group), = [entry for entry in suite.tests.values() if isinstance(entry[0], PingCheck)]
+    (tcp, tcp_group), = [entry for entry in suite.tests.values() if isinstance(entry[0], TcpCheck)]
+
+    now = [0.0]
+    monkeypatch.setattr("watchtower.metrics.time.monotonic", lambda: now[0])
+    suite.run_test(tcp, tcp_group)
+    suite.run_test(ping, ping_group)
+    # An hour behind the down gateway
+    now[0] = 3600.0
+    suite.executors.results["gw.example.com"] = True
+    suite.run_test(ping, ping_group)
+    missed = suite.engine_stats.missed_runs
+    suite.run_test(tcp, tcp_group)
+    assert tcp in suite.executors.ran
+    assert suite.engine_stats.missed_runs == missed
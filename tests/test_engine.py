@@ -0,0 +1,37 @@
+import asyncio
+import time
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+from watchtower.adaptive import AdaptiveTrigger
+from watchtower.engine import AsyncScheduler
+
+
+def test_adaptive_trigger_skips_to_the_next_slot():
+    start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    trigger = AdaptiveTrigger(SimpleNamespace(current=2), start_date=start)
+    assert trigger.get_next_fire_time(None, start - timedelta(seconds=5)) == start
+    assert trigger.get_next_fire_time(None, start + timedelta(seconds=11)) == start + timedelta(seconds=12)
+    assert trigger.get_next_fire_time(None, start + timedelta(seconds=12)) == start + timedelta(seconds=12)
+
+
+def test_overrun_catches_up_instead_of_running_back_to_back():
+    runs = []
+
+    async def probe():
+        runs.append(time.monotonic())
+        if len(runs) == 1:
+            # Overruns the 0.2s interval by more than the engine's 1s grace
+            await asyncio.sleep(1.5)
+
+    start = datetime.now(timezone.utc) + timedelta(seconds=0.1)
+    scheduler = AsyncScheduler()
+    scheduler.add_job(probe, AdaptiveTrigger(SimpleNamespace(current=0.2), start_date=start))
+    scheduler.start()
+    time.sleep(2.5)
+    scheduler.shutdown()
+
+    assert scheduler.missed_runs == 1
+    assert 2 <= len(runs) <= 6
+    gaps = [later - earlier for earlier, later in zip(runs[1:], runs[2:])]
+    assert all(gap > 0.1 for gap in gaps)
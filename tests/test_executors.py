@@ -0,0 +1,26 @@
+from watchtower.checks import BrowserCheck, PingCheck, TcpCheck
+from watchtower.executors import CheckExecutors, apply_outcome, build_check, describe, outcome_fields
+
+
+def test_modes_by_type_and_option():
+    executors = CheckExecutors({PingCheck: "process"})
+    assert executors.mode(PingCheck("web")) == "process"
+    assert executors.mode(PingCheck("web", options={"executor": "thread"})) == "thread"
+    assert executors.mode(TcpCheck("web", options={"port": 80})) == "inline"
+
+
+def test_browser_checks_stay_in_the_parent():
+    executors = CheckExecutors({BrowserCheck: "process"})
+    assert executors.mode(BrowserCheck("https://web.example.com")) == "thread"
+    assert executors.mode(BrowserCheck("https://web.example.com", options={"executor": "process"})) == "thread"
+
+
+def test_descriptor_round_trip_keeps_identity_and_outcome():
+    check = TcpCheck("web", interval=30, options={"port": 443})
+    check._resolved_address = "192.0.2.1"
+    rebuilt = build_check(describe(check))
+    assert (rebuilt.test_id, rebuilt.interval, rebuilt.options) == (check.test_id, 30, {"port": 443})
+    assert rebuilt._resolved_address == "192.0.2.1"
+    rebuilt.extended_results = "refused"
+    assert apply_outcome(check, (False, outcome_fields(rebuilt))) is False
+    assert check.extended_results == "refused"
@@ -0,0 +1,70 @@
+from types import SimpleNamespace
+
+from watchtower.models import Check, Host
+from watchtower.testcases import GroupIndex
+
+
+def check(test_id, state=None):
+    return SimpleNamespace(test_id=test_id, health=SimpleNamespace(state=state))
+
+
+def test_counts_follow_status_changes():
+    groups = GroupIndex()
+    web, api = check("web"), check("api", True)
+    group = groups.add("Web", web)
+    groups.add("Web", api)
+    assert group.state() == ([], {"passing": 1, "failing": 0, "pending": 1})
+
+    groups.record(web, group, False)
+    groups.record(api, group, False)
+    groups.record(api, group, False)
+    assert group.state() == (["web", "api"], {"passing": 0, "failing": 2, "pending": 0})
+
+    groups.record(web, group, True)
+    assert group.failing_checks == ["api"]
+    assert groups.totals() == {"passing": 1, "failing": 1, "pending": 0, "groups": 1}
+
+
+def test_fleet_totals_span_groups():
+    groups = GroupIndex()
+    web = groups.add("Web", check("web", False))
+    groups.add("Db", check("db", True))
+    assert groups.totals() == {"passing": 1, "failing": 1, "pending": 0, "groups": 2}
+    assert web.counts.total == 1 and len(groups) == 2
+
+
+def test_emptied_group_is_dropped():
+    groups = GroupIndex()
+    web, api = check("web", False), check("api")
+    group = groups.add("Web", web)
+    groups.add("Web", api)
+    groups.remove(web, group)
+    assert group.state() == ([], {"passing": 0, "failing": 0, "pending": 1})
+    groups.remove(api, group)
+    groups.remove(api, group)
+    assert groups.get("Web") is None
+    assert groups.totals() == {"passing": 0, "failing": 0, "pending": 0, "groups": 0}
+
+
+def test_results_of_a_replaced_check_are_ignored():
+    groups = GroupIndex()
+    old = check("web")
+    group = groups.add("Web", old)
+    groups.remove(old, group)
+    groups.add("Web", check("web"))
+    groups.record(old, group, False)
+    assert groups.totals()["failing"] == 0
+
+
+def test_suite_reports_group_counts(make_suite):
+    hosts = [
+        Host("web", "Web", "web.example.com", [Check(type="ping")]),
+        Host("api", "Web", "api.example.com", [Check(type="ping")]),
+    ]
+    suite = make_suite(hosts, {"web.example.com": False})
+    for test, group in list(suite.tests.values()):
+        suite.run_test(test, group)
+    (group,) = suite.to_json()["groups"]
+    assert group["counts"] == {"passing": 1, "failing": 1, "pending": 0}
+    assert len(group["failing_checks"]) == 1
+    assert suite.to_json()["totals"] == {"passing": 1, "failing": 1, "pending": 0, "groups": 1}
@@ -0,0 +1,61 @@
+import pytest
+
+from watchtower.health import HealthPolicy, HealthState, parse_failures
+
+
+def states(policy, results):
+    health = HealthState(policy)
+    observed = []
+    for result in results:
+        health.observe(result)
+        observed.append(health.state)
+    return observed
+
+
+def test_single_failure_goes_down_by_default():
+    assert states(HealthPolicy(), [True, False, True]) == [True, False, True]
+
+
+def test_n_of_m_threshold():
+    policy = HealthPolicy(failures=3, window=5, flap_window=0)
+    assert states(policy, [True, False, True, False, True, False]) == [True, True, True, True, True, False]
+
+
+def test_recovery_is_not_undone_by_failures_still_in_the_window():
+    policy = HealthPolicy(failures=3, window=5, recoveries=1, flap_window=0)
+    results = [True, False, False, False, True, True, True, True]
+    assert states(policy, results) == [True, True, True, False, True, True, True, True]
+
+
+def test_recoveries_need_passes_in_a_row():
+    policy = HealthPolicy(recoveries=2, flap_window=0)
+    assert states(policy, [False, True, False, True, True]) == [False, False, False, False, True]
+
+
+def test_observe_reports_changes_only():
+    health = HealthState(HealthPolicy(flap_window=0))
+    assert health.observe(True)
+    assert not health.observe(True)
+    assert not health.observe(None)
+    assert health.observe(False)
+
+
+def test_flapping_holds_state():
+    health = HealthState(HealthPolicy(flap_window=5))
+    for result in [True, False, True, False, True]:
+        health.observe(result)
+    assert health.flapping
+    state = health.state
+    health.observe(False)
+    assert health.state is state
+
+
+@pytest.mark.parametrize("value, expected", [(3, (3, 3)), ("2/5", (2, 5)), ("4", (4, 4))])
+def test_parse_failures(value, expected):
+    assert parse_failures(value) == expected
+
+
+@pytest.mark.parametrize("value", ["0/3", "4/3", "1/65", "x", True])
+def test_parse_failures_rejects(value):
+    with pytest.raises(ValueError):
+        parse_failures(value)
@@ -0,0 +1,83 @@
+import asyncio
+
+import httpx
+import pytest
+
+from watchtower import httppool
+from watchtower.checks import HttpStatusCheck
+from watchtower.httppool import BodyScanner
+
+
+def test_scanner_finds_strings_across_chunks():
+    scanner = BodyScanner([b"hello world", b"bye"], limit=1000)
+    for chunk in (b"xx hel", b"lo wo", b"rld ..."):
+        assert not scanner.feed(chunk)
+    assert scanner.missing == [b"bye"]
+    scanner.feed(b"b")
+    scanner.feed(b"ye")
+    assert scanner.missing == [] and scanner.read == 21
+
+
+def test_scanner_stops_at_the_limit():
+    scanner = BodyScanner([b"needle"], limit=10)
+    assert not scanner.feed(b"12345")
+    assert scanner.feed(b"6789needle")
+    assert scanner.truncated and scanner.read == 10 and scanner.missing == [b"needle"]
+
+
+def test_clients_are_shared_per_settings():
+    try:
+        assert httppool.get_client() is httppool.get_client()
+        assert httppool.get_client(verify=False) is not httppool.get_client()
+    finally:
+        httppool.close()
+    assert httppool._clients == {}
+
+
+def test_async_clients_are_per_loop():
+    async def client():
+        return httppool.get_async_client(), httppool.get_async_client()
+
+    first, again = asyncio.run(client())
+    other, _ = asyncio.run(client())
+    assert first is again and first is not other
+
+
+@pytest.fixture
+def serve(monkeypatch):
+    """Routes the shared sync client to a handler instead of the network"""
+
+    def serve(handler):
+        requests = []
+
+        def record(request):
+            requests.append(request)
+            return handler(request)
+
+        client = httpx.Client(transport=httpx.MockTransport(record))
+        monkeypatch.setitem(httppool._clients, (False, True), client)
+        return requests
+
+    return serve
+
+
+def test_status_and_content(serve):
+    serve(lambda request: httpx.Response(200, content=b"<html>status: ok</html>"))
+    assert HttpStatusCheck("https://web.example.com", options={"expect_content": "status: ok"}).run()
+    check = HttpStatusCheck("https://web.example.com", options={"expect_content": ["missing"], "max_body_bytes": 8})
+    assert not check.run()
+    assert check.extended_results == "HTTP Status Code: 200, content not found: 'missing' (in first 8 bytes)"
+
+
+def test_unexpected_status_fails(serve):
+    serve(lambda request: httpx.Response(503))
+    check = HttpStatusCheck("https://web.example.com")
+    assert not check.run()
+    assert check.extended_results == "HTTP Status Code: 503"
+    assert HttpStatusCheck("https://web.example.com", options={"expected_status_codes": [503]}).run()
+
+
+def test_head_requests_skip_the_body(serve):
+    requests = serve(lambda request: httpx.Response(200))
+    assert HttpStatusCheck("https://web.example.com", options={"method": "head"}).run()
+    assert requests[0].method == "HEAD"
@@ -0,0 +1,99 @@
+import socket
+import struct
+import time
+
+import pytest
+
+from watchtower import icmp
+from watchtower.checks import PingCheck
+from watchtower.icmp import ICMP_ECHO_REPLY, IcmpProber, PingResult
+
+IDENTIFIER = 0x1234
+
+
+class EchoSocket:
+    """Stands in for the ICMP socket, answers every echo request over a local UDP socket"""
+
+    def __init__(self):
+        self.inbox = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.inbox.bind(("127.0.0.1", 0))
+        self.outbox = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sent = []
+        # Rewrites (identifier, sequence) of a reply, returning None drops it
+        self.answer = lambda identifier, sequence: (identifier, sequence)
+
+    def fileno(self):
+        return self.inbox.fileno()
+
+    def recvfrom(self, size):
+        return self.inbox.recvfrom(size)
+
+    def sendto(self, packet, address):
+        _, _, _, identifier, sequence = struct.unpack("!BBHHH", packet[:8])
+        self.sent.append(sequence)
+        answer = self.answer(identifier, sequence)
+        if answer is not None:
+            reply = struct.pack("!BBHHH", ICMP_ECHO_REPLY, 0, 0, *answer) + packet[8:]
+            self.outbox.sendto(reply, self.inbox.getsockname())
+
+
+@pytest.fixture
+def prober(monkeypatch):
+    monkeypatch.setattr(IcmpProber, "_open_socket", staticmethod(lambda: (EchoSocket(), False)))
+    monkeypatch.setattr(IcmpProber, "_sock_identifier", lambda self: IDENTIFIER)
+    return IcmpProber()
+
+
+def ping(prober, count=3, timeout=0.5):
+    return prober.ping("localhost", "127.0.0.1", count=count, timeout=timeout, interval=0.01)
+
+
+def test_replies_are_matched_to_their_requests(prober):
+    result = ping(prober)
+    assert (result.transmitted, result.received, result.packet_loss) == (3, 3, 0)
+    assert len(result.rtts) == 3
+    assert not prober._pending
+
+
+def test_replies_for_other_requests_are_ignored(prober):
+    prober._sock.answer = lambda identifier, sequence: (identifier + 1, sequence) if sequence % 2 else None
+    result = ping(prober, timeout=0.2)
+    assert (result.transmitted, result.received) == (3, 0)
+
+
+def test_missing_replies_time_out(prober):
+    prober._sock.answer = lambda identifier, sequence: None if sequence == 2 else (identifier, sequence)
+    started = time.monotonic()
+    result = ping(prober, timeout=0.3)
+    assert time.monotonic() - started >= 0.25
+    assert (result.transmitted, result.received) == (3, 2)
+    assert round(result.packet_loss, 1) == 33.3
+    assert not prober._pending
+
+
+def test_sequence_wraps_at_16_bits(prober):
+    prober._sequence = 0xFFFE
+    result = ping(prober)
+    assert prober._sock.sent == [0xFFFF, 0, 1]
+    assert result.received == 3
+
+
+def test_ping_result_stats():
+    result = PingResult("localhost", "127.0.0.1", transmitted=4, received=2, rtts=[1.0, 3.0])
+    assert result.to_dict()["packet_loss"] == 50.0
+    assert (result.rtt_min, result.rtt_avg, result.rtt_max, result.rtt_stddev) == (1.0, 2.0, 3.0, 1.0)
+    assert PingResult("localhost", "127.0.0.1").packet_loss == 100.0
+
+
+def test_checksum_of_a_request_verifies():
+    assert icmp.checksum(icmp.build_echo_request(IDENTIFIER, 7)) == 0
+
+
+@pytest.mark.parametrize(
+    "options, expected", [({}, True), ({"max_packet_loss": 20}, False), ({"max_packet_loss": 80}, True)]
+)
+def test_any_reply_passes_unless_max_packet_loss_is_set(options, expected):
+    check = PingCheck("localhost", options=options)
+    one_reply = PingResult("localhost", "127.0.0.1", transmitted=5, received=1, rtts=[1.0])
+    assert check._is_probe_success(one_reply) is expected
+    assert check._is_probe_success(PingResult("localhost", "127.0.0.1", transmitted=5, received=0)) is False
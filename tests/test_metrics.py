@@ -0,0 +1,84 @@
+import asyncio
+
+from apscheduler.events import JobSubmissionEvent
+
+from watchtower.adaptive import AdaptivePolicy
+from watchtower.checks import PingCheck
+from watchtower.metrics import EngineStats
+from watchtower.models import Check, Host
+
+
+def run_at(stats, test, monkeypatch, when):
+    monkeypatch.setattr("watchtower.metrics.time.monotonic", lambda: when)
+    stats.run_started(test)
+
+
+def test_adaptive_checks_are_measured_against_their_current_interval(monkeypatch):
+    stats = EngineStats()
+    test = PingCheck("192.0.2.1", interval=10)
+    test.adaptive = AdaptivePolicy(enabled=True).interval_for(test)
+    test.adaptive.current = 80
+    for i in range(4):
+        run_at(stats, test, monkeypatch, i * 80.0)
+    assert stats.missed_runs == 0
+
+
+def test_late_runs_count_as_missed(monkeypatch):
+    stats = EngineStats()
+    test = PingCheck("192.0.2.1", interval=10)
+    run_at(stats, test, monkeypatch, 0.0)
+    run_at(stats, test, monkeypatch, 35.0)
+    assert stats.missed_runs == 2
+
+
+def test_queue_depth_counts_jobs(make_suite):
+    checks = [Check(type="ping"), Check(type="tcp", options={"port": 80}), Check(type="dns")]
+    suite = make_suite([Host("web", "Web", "192.0.2.1", checks)], coalesce=True)
+    stats = suite.engine_stats
+    (batch,) = suite.batches.values()
+    stats.job_submitted(JobSubmissionEvent(0, batch.test_id, None, []))
+    assert stats.queue_depth(suite.scheduler) == 1
+    suite.run_batch(batch)
+    assert stats.queue_depth(suite.scheduler) == 0
+    assert stats.started == stats.finished == 3
+
+
+def test_skipped_runs_leave_the_queue(make_suite):
+    suite = make_suite([Host("web", "Web", "192.0.2.1", [Check(type="ping")])])
+    (test, group), = suite.tests.values()
+    test.suppressed = True
+    for _ in range(100):
+        suite.engine_stats.job_submitted()
+        suite.run_test(test, group)
+    assert suite.engine_stats.queue_depth(suite.scheduler) == 0
+
+
+def test_removed_checks_are_forgotten(make_suite):
+    suite = make_suite([Host("web", "Web", "192.0.2.1", [Check(type="ping")])])
+    (test, group), = suite.tests.values()
+    suite.run_test(test, group)
+    suite.remove_test(test.test_id)
+    assert suite.engine_stats._last_started == {}
+
+
+def test_skipped_run_is_not_counted_again_by_the_next_run(monkeypatch):
+    stats = EngineStats()
+    test = PingCheck("192.0.2.1", interval=10)
+    run_at(stats, test, monkeypatch, 0.0)
+    monkeypatch.setattr("watchtower.metrics.time.monotonic", lambda: 10.0)
+    stats.run_skipped(test)
+    run_at(stats, test, monkeypatch, 20.0)
+    assert stats.missed_runs == 1
+
+
+def test_async_jobs_are_counted(make_suite):
+    suite = make_suite(
+        [Host("web", "Web", "192.0.2.1", [Check(type="ping"), Check(type="tcp", options={"port": 80})])],
+        coalesce=True,
+    )
+    (batch,) = suite.batches.values()
+    asyncio.run(suite.run_batch_async(batch))
+    (test, group), _ = batch.checks
+    asyncio.run(suite.run_test_async(test, group))
+    assert suite.engine_stats.jobs_started == 2
+    assert suite.engine_stats.started == 3
@@ -0,0 +1,62 @@
+import asyncio
+import threading
+
+from watchtower.ratelimit import ProbeLimiter, TokenBucket, next_slot, spread_offset
+
+
+def test_spread_offset_is_stable_and_in_range():
+    assert spread_offset("web01", 60) == spread_offset("web01", 60)
+    assert 0 <= spread_offset("web01", 60) < 60
+    assert 1000 < next_slot("web01", 60, now=1000.0) <= 1060
+
+
+def test_token_bucket_burst_then_wait():
+    bucket = TokenBucket(rate=10, burst=2)
+    assert bucket.try_acquire() == 0
+    assert bucket.try_acquire() == 0
+    assert bucket.try_acquire() > 0
+    assert not bucket.acquire(0)
+
+
+def test_slot_caps_concurrency_per_target():
+    limiter = ProbeLimiter(max_per_target=1)
+    with limiter.slot("a", 1) as first:
+        assert first
+        with limiter.slot("a", 0.05) as second:
+            assert not second
+        with limiter.slot("b", 0.05) as other:
+            assert other
+    with limiter.slot("a", 0.05) as again:
+        assert again
+
+
+def test_skipped_slot_does_not_hold_the_lock():
+    limiter = ProbeLimiter(max_per_target=1)
+    result = []
+    with limiter.slot("a", 1):
+        with limiter.slot("a", 0) as skipped:
+            assert not skipped
+            # Another thread must still get a slot for another target meanwhile
+            thread = threading.Thread(target=lambda: result.append(limiter.slot("b", 1).__enter__()))
+            thread.start()
+            thread.join(1)
+    assert result == [True]
+
+
+def test_global_timeout_refunds_the_target_token():
+    limiter = ProbeLimiter(rate=0.001, rate_per_target=0.001)
+    limiter.bucket.tokens = 0
+    with limiter.slot("a", 0) as acquired:
+        assert not acquired
+    assert limiter._target_buckets["a"].tokens >= 1
+
+
+def test_async_slot_caps_concurrency_per_target():
+    limiter = ProbeLimiter(max_per_target=1)
+
+    async def run():
+        async with limiter.async_slot("a", 1) as first:
+            async with limiter.async_slot("a", 0.05) as second:
+                return first, second
+
+    assert asyncio.run(run()) == (True, False)
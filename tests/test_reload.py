@@ -0,0 +1,61 @@
+from watchtower.models import Check, Config, Host
+
+
+def hosts(web_interval=60, api=True):
+    configured = [
+        Host(
+            "web",
+            "Web",
+            "web.example.com",
+            [Check(type="ping"), Check(type="tcp", interval=web_interval, options={"port": 443})],
+        ),
+    ]
+    if api:
+        configured.append(Host("api", "Web", "api.example.com", [Check(type="ping")]))
+    return configured
+
+
+def find_id(suite, target, check_class):
+    (found,) = [
+        test_id for test_id, (test, _) in suite.tests.items()
+        if test.target == target and type(test).__name__ == check_class
+    ]
+    return found
+
+
+def test_unchanged_config_touches_nothing(make_suite):
+    suite = make_suite(hosts())
+    tests = dict(suite.tests)
+    summary = suite.reload(Config(config_version=2, hosts=hosts()))
+    assert summary == {"added": 0, "removed": 0, "changed": 0, "unchanged": 3}
+    assert all(suite.tests[test_id][0] is test for test_id, (test, _) in tests.items())
+
+
+def test_test_ids_are_stable(make_suite):
+    first, second = make_suite(hosts()), make_suite(hosts())
+    assert set(first.tests) == set(second.tests)
+
+
+def test_changed_check_is_rebuilt_with_its_last_result(make_suite):
+    suite = make_suite(hosts(), {"web.example.com": False})
+    tcp_id = find_id(suite, "web.example.com", "TcpCheck")
+    old, group = suite.tests[tcp_id]
+    suite.run_test(old, group)
+
+    summary = suite.reload(Config(config_version=2, hosts=hosts(web_interval=30)))
+    assert summary == {"added": 0, "removed": 0, "changed": 1, "unchanged": 2}
+    new, _ = suite.tests[tcp_id]
+    assert new is not old and new.interval == 30
+    assert new.last_run_successful is False and new.last_run_time == old.last_run_time
+    assert suite.scheduler.get_job(tcp_id) is not None
+
+
+def test_removed_and_added_checks_are_scheduled(make_suite):
+    suite = make_suite(hosts(api=False))
+    assert suite.reload(Config(config_version=2, hosts=hosts()))["added"] == 1
+    api_id = find_id(suite, "api.example.com", "PingCheck")
+    assert suite.scheduler.get_job(api_id) is not None
+
+    assert suite.reload(Config(config_version=3, hosts=hosts(api=False)))["removed"] == 1
+    assert api_id not in suite.tests and suite.scheduler.get_job(api_id) is None
+    assert suite.groups.get("Web").counts.total == 2
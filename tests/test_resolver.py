@@ -0,0 +1,116 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from watchtower.exceptions import ResolutionError
+from watchtower.resolver import Answer, DnsCache, Resolver
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr("watchtower.resolver.time.monotonic", lambda: now[0])
+    return now
+
+
+def test_answers_expire_with_their_ttl(clock):
+    cache = DnsCache(max_ttl=100)
+    cache.put("short", Answer(["192.0.2.1"], 30))
+    cache.put("long", Answer(["192.0.2.2"], 3600))
+    clock[0] += 29
+    assert cache.get("short").records == ["192.0.2.1"]
+    clock[0] += 1
+    assert cache.get("short") is None
+    # Capped at max_ttl
+    clock[0] += 70
+    assert cache.get("long") is None
+    assert (cache.hits, cache.misses) == (1, 2)
+
+
+def test_oldest_answers_are_evicted(clock):
+    cache = DnsCache(max_entries=2)
+    for name in ("a", "b", "c"):
+        cache.put(name, Answer([name], 60))
+    assert len(cache) == 2 and cache.get("a") is None and cache.get("c") is not None
+
+
+def test_concurrent_misses_share_one_lookup():
+    cache = DnsCache()
+    calls = []
+    started = threading.Barrier(5)
+
+    def lookup():
+        calls.append(1)
+        time.sleep(0.1)
+        return Answer(["192.0.2.1"], 60)
+
+    def fetch():
+        started.wait()
+        results.append(cache.fetch("web", lookup, timeout=5).records)
+
+    results = []
+    threads = [threading.Thread(target=fetch) for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(calls) == 1
+    assert results == [["192.0.2.1"]] * 5
+
+
+def test_concurrent_async_misses_share_one_lookup():
+    cache = DnsCache()
+    calls = []
+
+    async def lookup():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return Answer(["192.0.2.1"], 60)
+
+    async def run():
+        return await asyncio.gather(*(cache.fetch_async("web", lookup) for _ in range(5)))
+
+    assert [answer.records for answer in asyncio.run(run())] == [["192.0.2.1"]] * 5
+    assert len(calls) == 1
+
+
+def queries(resolver, answers):
+    """Makes the resolver answer from ``answers`` in turn, returns the list of queried names"""
+    queried = []
+
+    def query(name, record_type):
+        queried.append(name)
+        return answers.pop(0)
+
+    resolver._query = query
+    return queried
+
+
+def test_failures_are_cached_for_the_negative_ttl(clock):
+    resolver = Resolver(cache=DnsCache(negative_ttl=30))
+    queried = queries(resolver, [Answer([], 30, "NXDOMAIN"), Answer(["192.0.2.1"], 60)])
+    for _ in range(2):
+        with pytest.raises(ResolutionError):
+            resolver.resolve("missing.example.com")
+    assert len(queried) == 1
+    clock[0] += 30
+    assert resolver.resolve("missing.example.com").records == ["192.0.2.1"]
+
+
+def test_timeouts_are_not_cached():
+    resolver = Resolver(cache=DnsCache())
+    queried = queries(resolver, [None, Answer(["192.0.2.1"], 60)])
+    with pytest.raises(ResolutionError):
+        resolver.resolve("slow.example.com")
+    assert resolver.resolve("slow.example.com").records == ["192.0.2.1"]
+    assert len(queried) == 2
+
+
+def test_uncached_queries_refresh_the_address_cache():
+    resolver = Resolver(cache=DnsCache())
+    queries(resolver, [Answer(["192.0.2.7"], 60)])
+    resolver.resolve("web.example.com", use_cache=False)
+    assert resolver.lookup_address("web.example.com") == "192.0.2.7"
+    assert resolver.lookup_address("192.0.2.9") == "192.0.2.9"
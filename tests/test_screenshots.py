@@ -0,0 +1,55 @@
+import os
+
+import pytest
+
+from watchtower.screenshots import ScreenshotStore, digest
+
+FIRST = b"first capture"
+SECOND = b"second capture"
+
+
+def test_unchanged_capture_is_counted_not_stored(tmp_path, monkeypatch):
+    store = ScreenshotStore(str(tmp_path))
+    store.add("web", digest(FIRST), FIRST, timestamp=100)
+    writes = []
+    monkeypatch.setattr(store, "_write_object", lambda *args: writes.append(args) or {})
+    entry = store.add("web", digest(FIRST), timestamp=200)
+    assert writes == []
+    assert entry["captures"] == 2 and entry["first_seen"] == 100 and entry["last_seen"] == 200
+    assert len(store.history("web")) == 1
+
+
+def test_identical_captures_share_one_object(tmp_path):
+    store = ScreenshotStore(str(tmp_path))
+    store.add("web", digest(FIRST), FIRST)
+    store.add("api", digest(FIRST), FIRST)
+    objects = [name for _, _, files in os.walk(tmp_path / "objects") for name in files if name.endswith(".png")]
+    assert [name for name in objects if not name.endswith(".thumb.png")] == [f"{digest(FIRST)}.png"]
+
+
+def test_new_capture_needs_its_image(tmp_path):
+    store = ScreenshotStore(str(tmp_path))
+    store.add("web", digest(FIRST), FIRST)
+    with pytest.raises(ValueError):
+        store.add("web", digest(SECOND))
+
+
+def test_expired_objects_are_deleted_once_unreferenced(tmp_path):
+    store = ScreenshotStore(str(tmp_path), retention=1)
+    store.add("web", digest(FIRST), FIRST)
+    store.add("api", digest(FIRST), FIRST)
+    store.add("web", digest(SECOND), SECOND)
+    assert os.path.exists(store.path(digest(FIRST)))
+    store.add("api", digest(SECOND), SECOND)
+    assert not os.path.exists(store.path(digest(FIRST)))
+    assert [entry["digest"] for entry in store.history("web")] == [digest(SECOND)]
+
+
+def test_indexes_are_reloaded(tmp_path):
+    store = ScreenshotStore(str(tmp_path))
+    store.add("web", digest(FIRST), FIRST)
+    store.add("web", digest(FIRST))
+    store.flush()
+    reopened = ScreenshotStore(str(tmp_path))
+    assert reopened.latest_digest("web") == digest(FIRST)
+    assert reopened.history("web")[0]["captures"] == 2
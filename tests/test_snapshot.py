@@ -0,0 +1,28 @@
+from watchtower.snapshot import ChangeFeed, ScoreboardSnapshot
+
+
+def bump(snapshot):
+    with snapshot._changed:
+        snapshot.version += 1
+        snapshot._changed.notify_all()
+
+
+def test_feed_coalesces_changes_per_interval():
+    snapshot = ScoreboardSnapshot()
+    feed = ChangeFeed(snapshot, interval=0.3)
+    assert feed.subscribe()
+    bump(snapshot)
+    assert feed.wait(0, 2) == 1
+    # Changes during the interval go out as one push
+    for _ in range(5):
+        bump(snapshot)
+    assert feed.wait(1, 0.05) == 1
+    assert feed.wait(1, 2) == 6
+
+
+def test_feed_caps_subscribers():
+    feed = ChangeFeed(ScoreboardSnapshot(), max_subscribers=2)
+    assert feed.subscribe() and feed.subscribe()
+    assert not feed.subscribe()
+    feed.unsubscribe()
+    assert feed.subscribe()
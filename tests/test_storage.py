@@ -0,0 +1,75 @@
+import os
+
+import pytest
+
+from watchtower.storage import RECORD, ROLLUP_SUFFIX, SEGMENT_SUFFIX, ResultStore
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1_000_000.0]
+    monkeypatch.setattr("watchtower.storage.time.time", lambda: now[0])
+    return now
+
+
+def fill(store, clock, count, step=10):
+    """Appends alternating results for checks a and b, ``step`` seconds apart"""
+    for i in range(count):
+        store.append("a", i % 2 == 0, latency=float(i), detail=f"run {i}")
+        store.append("b", True)
+        clock[0] += step
+    store.flush()
+
+
+def test_query_returns_the_latest_records_oldest_first(tmp_path, clock):
+    store = ResultStore(str(tmp_path), segment_seconds=100)
+    fill(store, clock, 50)
+    assert len([f for f in os.listdir(tmp_path) if f.endswith(SEGMENT_SUFFIX)]) == 5
+    results = store.query("a", limit=3)
+    assert [r["detail"] for r in results] == ["run 47", "run 48", "run 49"]
+    assert results[-1] == {"timestamp": 1_000_490.0, "result": False, "latency": 49.0, "detail": "run 49"}
+
+
+def test_query_time_window(tmp_path, clock):
+    store = ResultStore(str(tmp_path), segment_seconds=100)
+    fill(store, clock, 50)
+    results = store.query("a", since=1_000_100.0, until=1_000_200.0)
+    assert [r["detail"] for r in results] == [f"run {i}" for i in range(10, 21)]
+    assert [r["detail"] for r in store.query("a", until=1_000_200.0, limit=2)] == ["run 19", "run 20"]
+
+
+def test_query_unknown_check(tmp_path, clock):
+    store = ResultStore(str(tmp_path))
+    fill(store, clock, 3)
+    assert store.query("missing") == []
+
+
+def test_compaction_rolls_up_expired_segments(tmp_path, clock):
+    store = ResultStore(str(tmp_path), segment_seconds=100, raw_retention=200, rollup_retention=10_000)
+    fill(store, clock, 50)
+    store.compact()
+    segments = [f for f in os.listdir(tmp_path) if f.endswith(SEGMENT_SUFFIX)]
+    rollups = [f for f in os.listdir(tmp_path) if f.endswith(ROLLUP_SUFFIX)]
+    assert len(segments) == 2 and len(rollups) == 3
+    minutes = [rollup for rollup in store.iter_rollups() if rollup[1] == "a"]
+    assert sum(runs for _, _, runs, *_ in minutes) == 30
+    assert sum(failures for _, _, _, failures, *_ in minutes) == 15
+    # Raw history only covers what is left
+    assert store.query("a", limit=100)[0]["detail"] == "run 30"
+
+
+def test_index_survives_reopen(tmp_path, clock):
+    fill(ResultStore(str(tmp_path)), clock, 2)
+    assert len(ResultStore(str(tmp_path)).query("b")) == 2
+
+
+def test_torn_record_is_truncated_on_open(tmp_path, clock):
+    fill(ResultStore(str(tmp_path), segment_seconds=100), clock, 2)
+    (segment,) = [tmp_path / f for f in os.listdir(tmp_path) if f.endswith(SEGMENT_SUFFIX)]
+    with open(segment, "ab") as segment_file:
+        segment_file.write(b"\x01" * (RECORD.size // 2))
+    store = ResultStore(str(tmp_path), segment_seconds=100)
+    assert segment.stat().st_size % RECORD.size == 0
+    store.append("a", True, detail="after crash")
+    store.flush()
+    assert [r["detail"] for r in store.query("a")] == ["run 0", "run 1", "after crash"]
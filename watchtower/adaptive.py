@@ -0,0 +1,136 @@
+import math
+import threading
+from datetime import datetime, timedelta, timezone
+
+from apscheduler.triggers.base import BaseTrigger
+
+from watchtower.logging_config import logger
+
+# Passing runs in a row before a stable check's interval grows, and by how much
+DEFAULT_BACKOFF_AFTER = 10
+DEFAULT_BACKOFF_FACTOR = 2
+# Longest interval as a multiple of the configured one
+DEFAULT_MAX_FACTOR = 8
+# Re-check cadence of a failing check as a fraction of the configured interval
+DEFAULT_FAST_FACTOR = 0.25
+MIN_FAST_INTERVAL = 1
+
+
+class AdaptivePolicy:
+    """Suite wide adaptive scheduling settings and the probe budget shared by all checks.
+
+    ``budget`` caps the planned probes per second over every adaptive check.
+    Checks can always run at their configured interval, only speeding up a
+    failing check is limited: it gets the shortest interval the remaining
+    budget allows. Backing off stable checks frees budget.
+    """
+
+    def __init__(
+        self,
+        enabled: bool = False,
+        budget: float = None,
+        max_factor: float = DEFAULT_MAX_FACTOR,
+        fast_factor: float = DEFAULT_FAST_FACTOR,
+        backoff_after: int = DEFAULT_BACKOFF_AFTER,
+        backoff_factor: float = DEFAULT_BACKOFF_FACTOR,
+    ):
+        self.enabled = enabled
+        self.budget = budget
+        self.max_factor = max_factor
+        self.fast_factor = fast_factor
+        self.backoff_after = backoff_after
+        self.backoff_factor = backoff_factor
+        self.rate = 0.0
+        self._lock = threading.Lock()
+
+    def interval_for(self, check):
+        """Returns an AdaptiveInterval for the check, or None when it runs at a fixed interval"""
+        if not check.options.get("adaptive", self.enabled):
+            return None
+        base = check.interval
+        schedule = AdaptiveInterval(
+            self,
+            base,
+            max_interval=check.options.get("max_interval", base * self.max_factor),
+            fast_interval=check.options.get("fast_interval", max(base * self.fast_factor, MIN_FAST_INTERVAL)),
+        )
+        with self._lock:
+            self.rate += 1 / base
+        return schedule
+
+    def release(self, schedule: "AdaptiveInterval"):
+        with self._lock:
+            self.rate -= 1 / schedule.current
+
+    def _retime(self, current: float, requested: float) -> float:
+        """Moves a check from ``current`` to ``requested`` seconds, as far as the budget allows"""
+        with self._lock:
+            others = self.rate - 1 / current
+            if self.budget and requested < current and others + 1 / requested > self.budget:
+                remaining = self.budget - others
+                allowed = 1 / remaining if remaining > 0 else current
+                requested = min(current, max(requested, allowed))
+            self.rate = others + 1 / requested
+            return requested
+
+
+class AdaptiveInterval:
+    """Current interval of one adaptive check, updated with every result"""
+
+    __slots__ = ("policy", "base", "max_interval", "fast_interval", "current", "streak")
+
+    def __init__(self, policy: AdaptivePolicy, base: float, max_interval: float, fast_interval: float):
+        self.policy = policy
+        self.base = base
+        self.max_interval = max(max_interval, base)
+        self.fast_interval = min(fast_interval, base)
+        self.current = base
+        self.streak = 0
+
+    def update(self, result, state) -> bool:
+        """Adjusts the interval after a run, returns True when it got shorter"""
+        if result is False or state is False:
+            # Confirm or clear the failure quickly
+            self.streak = 0
+            requested = self.fast_interval
+        elif state is True:
+            self.streak += 1
+            requested = max(self.current, self.base)
+            if self.streak >= self.policy.backoff_after:
+                self.streak = 0
+                requested = min(requested * self.policy.backoff_factor, self.max_interval)
+        else:
+            return False
+        if requested == self.current:
+            return False
+        previous, self.current = self.current, self.policy._retime(self.current, requested)
+        if self.current != previous:
+            logger.debug("Adaptive interval %ss -> %ss", previous, self.current)
+        return self.current < previous
+
+
+class AdaptiveTrigger(BaseTrigger):
+    """Fires every ``schedule.current`` seconds, re-read after each run"""
+
+    def __init__(self, schedule: AdaptiveInterval, start_date: datetime = None):
+        self.schedule = schedule
+        self.start_date = start_date
+        self.timezone = timezone.utc
+
+    def get_next_fire_time(self, previous_fire_time, now):
+        interval = timedelta(seconds=self.schedule.current)
+        if previous_fire_time is not None:
+            return previous_fire_time + interval
+        if self.start_date is None:
+            return now + interval
+        if self.start_date >= now:
+            return self.start_date
+        # Asked again after a missed run, the next slot on the spread grid
+        return self.start_date + math.ceil((now - self.start_date) / interval) * interval
+
+    def __str__(self):
+        return f"adaptive[{self.schedule.current}s]"
+
+
+def next_run(schedule: AdaptiveInterval) -> datetime:
+    return datetime.now(timezone.utc) + timedelta(seconds=schedule.current)
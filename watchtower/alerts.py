@@ -0,0 +1,446 @@
+import asyncio
+import json
+import math
+import os
+import random
+import shlex
+import smtplib
+import threading
+from collections import Counter
+from datetime import datetime
+from email.message import EmailMessage
+
+from watchtower import httppool
+from watchtower.logging_config import logger
+from watchtower.ratelimit import TokenBucket
+
+DEFAULT_BATCH_WINDOW = 10
+DEFAULT_QUEUE_SIZE = 10000
+DEFAULT_RATE_PER_MINUTE = 6
+DEFAULT_BURST = 3
+DEFAULT_MAX_RETRIES = 5
+RETRY_BASE_DELAY = 2
+RETRY_MAX_DELAY = 60
+SEND_TIMEOUT = 30
+# Alerts listed one per line in text digests, the JSON payload always has all of them
+MAX_LISTED = 50
+
+
+def state_name(state) -> str:
+    return {True: "up", False: "down"}.get(state, "pending")
+
+
+class Alert:
+    """One confirmed transition of a check, with the context a notification needs"""
+
+    __slots__ = ("test_id", "group", "name", "target", "previous_state", "state", "flapping", "timestamp")
+
+    def __init__(self, test_id, group, name, target, previous_state, state, flapping, timestamp):
+        self.test_id = test_id
+        self.group = group
+        self.name = name
+        self.target = target
+        self.previous_state = previous_state
+        self.state = state
+        self.flapping = flapping
+        self.timestamp = timestamp
+
+    @property
+    def status(self) -> str:
+        return "flapping" if self.flapping else state_name(self.state)
+
+    def to_dict(self) -> dict:
+        return {
+            "test_id": self.test_id,
+            "group": self.group,
+            "name": self.name,
+            "target": self.target,
+            "previous_state": self.previous_state,
+            "state": self.state,
+            "status": self.status,
+            "flapping": self.flapping,
+            "timestamp": self.timestamp,
+        }
+
+
+class Digest:
+    """Alerts sent together as one message"""
+
+    def __init__(self, alerts: list, dropped: int = 0):
+        self.alerts = sorted(alerts, key=lambda alert: (alert.status != "down", alert.group, alert.name))
+        self.dropped = dropped
+        self.counts = Counter(alert.status for alert in self.alerts)
+        self.groups = Counter(alert.group for alert in self.alerts)
+
+    @property
+    def subject(self) -> str:
+        counts = ", ".join(f"{count} {status}" for status, count in sorted(self.counts.items()))
+        plural = "s" if len(self.groups) != 1 else ""
+        return f"[WatchTower] {counts} in {len(self.groups)} group{plural}"
+
+    def text(self) -> str:
+        lines = [self.subject, ""]
+        for alert in self.alerts[:MAX_LISTED]:
+            time = datetime.fromtimestamp(alert.timestamp).strftime("%Y-%m-%d %H:%M:%S")
+            lines.append(f"{alert.status.upper():9} {alert.group} / {alert.name} on {alert.target} at {time}")
+        if len(self.alerts) > MAX_LISTED:
+            lines.append(f"... and {len(self.alerts) - MAX_LISTED} more")
+        if self.dropped:
+            lines.append(f"{self.dropped} alerts were dropped because the alert queue was full")
+        return "\n".join(lines) + "\n"
+
+    def to_dict(self) -> dict:
+        return {
+            "subject": self.subject,
+            "counts": dict(self.counts),
+            "groups": dict(self.groups),
+            "dropped": self.dropped,
+            "alerts": [alert.to_dict() for alert in self.alerts],
+        }
+
+
+class Notifier:
+    """Base class of alert sinks, ``send`` delivers one Digest or raises.
+
+    Each notifier is rate limited on its own (``rate_per_minute`` messages,
+    bursts of ``burst``). Alerts arriving while it waits for its turn are
+    merged into its next message.
+    """
+
+    kind = "notifier"
+
+    def __init__(
+        self,
+        rate_per_minute: float = DEFAULT_RATE_PER_MINUTE,
+        burst: int = DEFAULT_BURST,
+        max_retries: int = DEFAULT_MAX_RETRIES,
+    ):
+        self.bucket = TokenBucket(rate_per_minute / 60, burst)
+        self.max_retries = max_retries
+        self.sent = 0
+        self.failed = 0
+        self.suppressed = 0
+        self.dropped = 0
+        self.last_error = None
+
+    def __str__(self):
+        return self.kind
+
+    async def send(self, digest: Digest):
+        raise NotImplementedError("Subclasses must implement the send() method.")
+
+
+class WebhookNotifier(Notifier):
+    """POSTs the digest as JSON to ``url``"""
+
+    kind = "webhook"
+
+    def __init__(self, url: str, headers: dict = None, **kwargs):
+        super().__init__(**kwargs)
+        self.url = url
+        self.headers = headers or {}
+
+    def __str__(self):
+        return f"webhook {self.url}"
+
+    async def send(self, digest: Digest):
+        response = await httppool.get_async_client().post(
+            self.url, json=digest.to_dict(), headers=self.headers, timeout=SEND_TIMEOUT
+        )
+        response.raise_for_status()
+
+
+class SmtpNotifier(Notifier):
+    """Emails the digest as plain text"""
+
+    kind = "smtp"
+
+    def __init__(
+        self,
+        host: str,
+        sender: str,
+        recipients: list,
+        port: int = 25,
+        username: str = None,
+        password: str = None,
+        starttls: bool = False,
+        **kwargs,
+    ):
+        super().__init__(**kwargs)
+        self.host = host
+        self.port = port
+        self.sender = sender
+        self.recipients = recipients
+        self.username = username
+        self.password = password
+        self.starttls = starttls
+
+    def __str__(self):
+        return f"smtp {self.host}:{self.port}"
+
+    def _send(self, message: EmailMessage):
+        with smtplib.SMTP(self.host, self.port, timeout=SEND_TIMEOUT) as smtp:
+            if self.starttls:
+                smtp.starttls()
+            if self.username:
+                smtp.login(self.username, self.password or "")
+            smtp.send_message(message)
+
+    async def send(self, digest: Digest):
+        message = EmailMessage()
+        message["Subject"] = digest.subject
+        message["From"] = self.sender
+        message["To"] = ", ".join(self.recipients)
+        message.set_content(digest.text())
+        await asyncio.to_thread(self._send, message)
+
+
+class CommandNotifier(Notifier):
+    """Runs ``command`` with the digest as JSON on stdin and its subject in WATCHTOWER_ALERT_SUBJECT"""
+
+    kind = "command"
+
+    def __init__(self, command: str, **kwargs):
+        super().__init__(**kwargs)
+        self.command = command
+
+    def __str__(self):
+        return f"command {self.command}"
+
+    async def send(self, digest: Digest):
+        process = await asyncio.create_subprocess_exec(
+            *shlex.split(self.command),
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.DEVNULL,
+            stderr=asyncio.subprocess.PIPE,
+            env=dict(os.environ, WATCHTOWER_ALERT_SUBJECT=digest.subject),
+        )
+        try:
+            _, stderr = await asyncio.wait_for(
+                process.communicate(json.dumps(digest.to_dict()).encode("utf-8")), SEND_TIMEOUT
+            )
+        except asyncio.TimeoutError:
+            process.kill()
+            await process.wait()
+            raise
+        if process.returncode:
+            raise RuntimeError(f"exited with {process.returncode}: {stderr.decode(errors='replace').strip()[:200]}")
+
+
+class AlertDispatcher:
+    """Turns confirmed state transitions into batched notifications.
+
+    Transitions are handed over without blocking: ``submit`` only queues them
+    for the dispatcher's own event loop thread, and drops (and counts) them
+    when ``queue_size`` are already waiting. Transitions arriving within
+    ``batch_window`` seconds of each other are sent as one Digest. Pending
+    alerts are keyed by test_id, so a notifier waiting for its rate limit
+    holds at most ``queue_size`` checks (dropping and counting the rest) and
+    only sends each check's net change. A check whose state ends where it
+    started, or where the last alert sent for it left it, is not sent at all. Failures of checks suppressed
+    behind a down host are left to that host's own alert.
+    """
+
+    def __init__(
+        self,
+        notifiers: list,
+        batch_window: float = DEFAULT_BATCH_WINDOW,
+        queue_size: int = DEFAULT_QUEUE_SIZE,
+    ):
+        self.notifiers = notifiers
+        self.batch_window = batch_window
+        self.queue_size = queue_size
+        self.dropped = 0
+        self.suite = None
+        self._queued = 0
+        self._queue_dropped = 0
+        self._lock = threading.Lock()
+        self._loop = None
+        self._inbox = None
+        self._tasks = []
+        # notifier -> {test_id: (previous state before the first pending alert, latest alert)}
+        self._pending = {notifier: {} for notifier in notifiers}
+        self._pending_dropped = {notifier: 0 for notifier in notifiers}
+        self._wakeup = {}
+        self._sending = set()
+        self._last_sent = {notifier: {} for notifier in notifiers}
+        self._dropped_reported = {notifier: 0 for notifier in notifiers}
+
+    def attach(self, suite):
+        """Subscribes to the suite's confirmed transitions"""
+        self.suite = suite
+        suite.subscribe(self.on_transition)
+
+    def on_transition(self, state):
+        if state.previous_state is None and state.latest_state is True and not state.flapping:
+            # A check's first result after startup or a reload is not news
+            return
+        entry = self.suite.tests.get(state.test_id)
+        if entry is None:
+            return
+        test, group = entry
+        definition = self.suite.definitions.get(state.test_id)
+        name = definition.display_name if definition else test.name
+        self.submit(
+            Alert(
+                state.test_id, group.name, name, test.target,
+                state.previous_state, state.latest_state, state.flapping, state.timestamp,
+            )
+        )
+
+    def submit(self, alert: Alert):
+        """Queues an alert from any thread, never blocks"""
+        with self._lock:
+            if self._loop is None or self._queued >= self.queue_size:
+                self.dropped += 1
+                self._queue_dropped += 1
+                return
+            self._queued += 1
+        self._loop.call_soon_threadsafe(self._inbox.put_nowait, alert)
+
+    def start(self):
+        self._loop = asyncio.new_event_loop()
+        self._inbox = asyncio.Queue()
+        self._wakeup = {notifier: asyncio.Event() for notifier in self.notifiers}
+        threading.Thread(target=self._loop.run_forever, name="watchtower-alerts", daemon=True).start()
+        asyncio.run_coroutine_threadsafe(self._start_tasks(), self._loop).result()
+        logger.info("Alert dispatcher started with %s", ", ".join(map(str, self.notifiers)) or "no notifiers")
+
+    async def _start_tasks(self):
+        self._tasks = [asyncio.create_task(self._collect())]
+        self._tasks += [asyncio.create_task(self._deliver(notifier)) for notifier in self.notifiers]
+
+    def stop(self, timeout: float = 10):
+        """Sends what is already queued (waiting at most ``timeout`` seconds), then stops"""
+        if self._loop is None:
+            return
+        future = asyncio.run_coroutine_threadsafe(self._drain(timeout), self._loop)
+        try:
+            future.result(timeout + 1)
+        except Exception:
+            logger.warning("Alert dispatcher did not drain within %ss", timeout)
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._loop = None
+
+    async def _drain(self, timeout: float):
+        self.batch_window = 0
+        deadline = self._loop.time() + timeout
+        while self._loop.time() < deadline and (
+            self._queued or self._sending or any(self._pending.values())
+        ):
+            await asyncio.sleep(0.05)
+        for task in self._tasks:
+            task.cancel()
+
+    async def _collect(self):
+        while True:
+            batch = [await self._inbox.get()]
+            deadline = self._loop.time() + self.batch_window
+            while (remaining := deadline - self._loop.time()) > 0:
+                try:
+                    batch.append(await asyncio.wait_for(self._inbox.get(), remaining))
+                except asyncio.TimeoutError:
+                    break
+            while not self._inbox.empty():
+                batch.append(self._inbox.get_nowait())
+            with self._lock:
+                self._queued -= len(batch)
+            for notifier in self.notifiers:
+                for alert in batch:
+                    self._add_pending(notifier, alert)
+                self._wakeup[notifier].set()
+
+    def _add_pending(self, notifier: Notifier, alert: Alert):
+        pending = self._pending[notifier]
+        entry = pending.get(alert.test_id)
+        if entry is not None:
+            pending[alert.test_id] = (entry[0], alert)
+        elif len(pending) < self.queue_size:
+            pending[alert.test_id] = (alert.previous_state, alert)
+        else:
+            notifier.dropped += 1
+            self._pending_dropped[notifier] += 1
+            with self._lock:
+                self.dropped += 1
+
+    def _behind_down_host(self, test_id: str) -> bool:
+        entry = self.suite.tests.get(test_id) if self.suite else None
+        return entry is not None and entry[0].suppressed
+
+    def _net_changes(self, notifier: Notifier, pending: dict) -> list:
+        """Returns the pending alerts that are a net change, skipping ones already notified"""
+        last_sent = self._last_sent[notifier]
+        changes = []
+        for test_id, (first_previous, alert) in pending.items():
+            if alert.state is False and self._behind_down_host(test_id):
+                # Failed just before its parent host was confirmed down, its recovery is not news either
+                last_sent.setdefault(test_id, (True, False))
+                notifier.suppressed += 1
+                continue
+            if (alert.state, alert.flapping) != last_sent.get(test_id, (first_previous, False)):
+                changes.append(alert)
+        return changes
+
+    async def _deliver(self, notifier: Notifier):
+        while True:
+            await self._wakeup[notifier].wait()
+            self._sending.add(notifier)
+            try:
+                await notifier.bucket.acquire_async(math.inf)
+                # Everything that piled up while waiting for the rate limit goes in one message
+                self._wakeup[notifier].clear()
+                pending, self._pending[notifier] = self._pending[notifier], {}
+                changes = self._net_changes(notifier, pending)
+                queue_dropped = self._queue_dropped - self._dropped_reported[notifier]
+                dropped = queue_dropped + self._pending_dropped[notifier]
+                if not changes and not dropped:
+                    continue
+                self._dropped_reported[notifier] += queue_dropped
+                self._pending_dropped[notifier] = 0
+                if await self._send(notifier, Digest(changes, dropped)):
+                    for alert in changes:
+                        self._last_sent[notifier][alert.test_id] = (alert.state, alert.flapping)
+            finally:
+                self._sending.discard(notifier)
+
+    async def _send(self, notifier: Notifier, digest: Digest) -> bool:
+        for attempt in range(notifier.max_retries + 1):
+            try:
+                await notifier.send(digest)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                notifier.last_error = f"{type(e).__name__}: {e}"
+                if attempt == notifier.max_retries:
+                    break
+                delay = min(RETRY_BASE_DELAY * 2**attempt, RETRY_MAX_DELAY) * random.uniform(0.5, 1)
+                logger.warning(
+                    "Sending alert via %s failed (%s), retrying in %.0fs", notifier, notifier.last_error, delay
+                )
+                await asyncio.sleep(delay)
+            else:
+                notifier.sent += 1
+                logger.info("Sent alert via %s: %s", notifier, digest.subject)
+                return True
+        notifier.failed += 1
+        logger.error("Giving up on alert via %s: %s", notifier, notifier.last_error)
+        return False
+
+    def status(self) -> dict:
+        return {
+            "queued": self._queued,
+            "dropped": self.dropped,
+            "batch_window": self.batch_window,
+            "notifiers": [
+                {
+                    "notifier": str(notifier),
+                    "pending": len(self._pending[notifier]),
+                    "sent": notifier.sent,
+                    "failed": notifier.failed,
+                    "suppressed": notifier.suppressed,
+                    "dropped": notifier.dropped,
+                    "last_error": notifier.last_error,
+                }
+                for notifier in self.notifiers
+            ],
+        }
@@ -0,0 +1,78 @@
+import socket
+
+from watchtower import resolver
+from watchtower.checks import DnsCheck, SchedulableCheck
+from watchtower.logging_config import logger
+
+
+class HostBatch:
+    """Checks sharing a target and interval, run together as a single job.
+
+    The target is resolved once per run, by the batch's DnsCheck when it has one,
+    and the address is handed to the checks that probe it.
+    """
+
+    def __init__(self, target: str, interval: int):
+        self.target = target
+        self.interval = interval
+        self.test_id = f"batch:{target}:{interval}"
+        self.options = {}
+        self.checks = []
+        # Nothing to resolve for an IP literal, its checks are never gated on DNS
+        self.literal_address = target if resolver.is_ip_address(target) else None
+
+    def __len__(self):
+        return len(self.checks)
+
+    def add(self, check: SchedulableCheck, group):
+        self.checks.append((check, group))
+
+    def remove(self, check: SchedulableCheck):
+        self.checks = [(other, group) for other, group in self.checks if other is not check]
+
+    @property
+    def dns_checks(self):
+        return [(check, group) for check, group in self.checks if isinstance(check, DnsCheck)]
+
+    def probe_checks(self, address):
+        """Splits the non-DNS checks into (runnable, unresolved) given the batch's address"""
+        runnable, unresolved = [], []
+        for check, group in self.checks:
+            if isinstance(check, DnsCheck):
+                continue
+            if check.uses_address and address is None:
+                unresolved.append((check, group))
+            else:
+                runnable.append((check, group))
+        return runnable, unresolved
+
+    @property
+    def suppressed(self) -> bool:
+        return all(check.suppressed for check, _ in self.checks)
+
+    @property
+    def needs_address(self) -> bool:
+        return any(check.uses_address for check, _ in self.checks)
+
+    def resolve(self):
+        """Resolves the target without a DnsCheck, returns None when it does not resolve"""
+        try:
+            return resolver.get_resolver().lookup_address(self.target)
+        except socket.gaierror:
+            return None
+
+    async def resolve_async(self):
+        try:
+            return await resolver.get_resolver().lookup_address_async(self.target)
+        except socket.gaierror:
+            return None
+
+    def share_address(self, address):
+        for check, _ in self.checks:
+            if check.uses_address:
+                check._resolved_address = address
+
+    def unresolved(self, check: SchedulableCheck):
+        check.extended_results = f"Could not resolve {self.target}"
+        logger.debug("Skipping %s on %s, target did not resolve", check.name, self.target)
+        return False
@@ -0,0 +1,307 @@
+import hashlib
+import multiprocessing
+import os
+import signal
+import threading
+import time
+from contextlib import contextmanager
+
+from watchtower.logging_config import logger
+
+DEFAULT_POOL_SIZE = 4
+DEFAULT_MAX_USES = 50
+DEFAULT_PAGE_LOAD_TIMEOUT = 30
+# Extra time a worker gets to answer beyond the page load timeout, and to start its browser
+RESPONSE_GRACE = 10
+STARTUP_TIMEOUT = 30
+
+NAVIGATION_TIMING_SCRIPT = (
+    "const entry = performance.getEntriesByType('navigation')[0];"
+    "return entry ? entry.toJSON() : null;"
+)
+
+
+def navigation_timings(entry: dict) -> dict:
+    """Converts a PerformanceNavigationTiming entry into millisecond timings"""
+    if not entry:
+        return {}
+    return {
+        "dns_ms": round(entry["domainLookupEnd"] - entry["domainLookupStart"], 3),
+        "connect_ms": round(entry["connectEnd"] - entry["connectStart"], 3),
+        "ttfb_ms": round(entry["responseStart"] - entry["requestStart"], 3),
+        "dom_content_loaded_ms": round(entry["domContentLoadedEventEnd"], 3),
+        "load_ms": round(entry["loadEventEnd"], 3),
+    }
+
+
+def create_driver(browser: str):
+    """Starts a headless selenium WebDriver for "chrome" or "firefox" """
+    from selenium import webdriver
+
+    match browser.lower():
+        case "chrome":
+            from selenium.webdriver.chrome.options import Options
+
+            options = Options()
+            options.add_argument("--headless")
+            return webdriver.Chrome(options=options)
+        case "firefox":
+            from selenium.webdriver.firefox.options import Options
+
+            options = Options()
+            options.add_argument("--headless")
+            return webdriver.Firefox(options=options)
+    raise ValueError(f"Unsupported browser: '{browser}'")
+
+
+def failure(error: str) -> dict:
+    return {"ok": False, "error": error, "timings": {}}
+
+
+def _error_message(error: Exception) -> str:
+    message = (getattr(error, "msg", None) or str(error)).strip().splitlines()
+    return f"{type(error).__name__}: {message[0] if message else ''}"
+
+
+def _load_page(driver, job: dict) -> dict:
+    result = {"ok": False, "error": None, "timings": {}, "recycle": False}
+    try:
+        driver.set_page_load_timeout(job["timeout"])
+        started = time.perf_counter()
+        driver.get(job["url"])
+        result["timings"]["page_load_ms"] = round((time.perf_counter() - started) * 1000, 3)
+        result["timings"].update(navigation_timings(driver.execute_script(NAVIGATION_TIMING_SCRIPT)))
+        if job.get("screenshot"):
+            png = driver.get_screenshot_as_png()
+            result["screenshot_digest"] = hashlib.sha256(png).hexdigest()
+            # Unchanged captures are not sent back, the parent already has them
+            if result["screenshot_digest"] != job.get("previous_digest"):
+                result["screenshot"] = png
+        result["ok"] = True
+    except Exception as e:
+        from selenium.common.exceptions import TimeoutException
+
+        result["error"] = _error_message(e)
+        # A page that timed out leaves the session usable, anything else may not have
+        result["recycle"] = not isinstance(e, TimeoutException)
+    return result
+
+
+def _worker_main(conn, browser: str, driver_factory):
+    """Browser worker process, loads one page per job received on ``conn``"""
+    if hasattr(os, "setpgrp"):
+        # Own process group, so a hung worker is killed together with its driver and browser
+        os.setpgrp()
+    driver = None
+    try:
+        while True:
+            try:
+                job = conn.recv()
+            except EOFError:
+                break
+            if job is None:
+                break
+            if driver is None:
+                try:
+                    driver = driver_factory(browser)
+                except Exception as e:
+                    conn.send(dict(failure(f"Could not start {browser}: {_error_message(e)}"), recycle=True))
+                    break
+            conn.send(_load_page(driver, job))
+    finally:
+        if driver is not None:
+            try:
+                driver.quit()
+            except Exception:
+                pass
+
+
+class BrowserWorker:
+    """Parent side handle of one browser worker process"""
+
+    def __init__(self, context, browser: str, driver_factory):
+        self.browser = browser
+        self.uses = 0
+        self.healthy = True
+        self.conn, child_conn = context.Pipe()
+        self.process = context.Process(
+            target=_worker_main,
+            args=(child_conn, browser, driver_factory),
+            name=f"watchtower-browser-{browser}",
+            daemon=True,
+        )
+        self.process.start()
+        child_conn.close()
+
+    def load(self, job: dict) -> dict:
+        """Sends a page load to the worker, giving up on (and retiring) it when it stops answering"""
+        timeout = job["timeout"] + RESPONSE_GRACE + (STARTUP_TIMEOUT if not self.uses else 0)
+        self.uses += 1
+        try:
+            self.conn.send(job)
+            if not self.conn.poll(timeout):
+                self.healthy = False
+                return failure(f"Browser did not respond within {timeout}s")
+            result = self.conn.recv()
+        except (EOFError, OSError) as e:
+            self.healthy = False
+            return failure(f"Browser worker exited: {str(e) or type(e).__name__}")
+        if result.pop("recycle", False):
+            self.healthy = False
+        return result
+
+    def close(self, timeout: float = 5):
+        if self.healthy and self.process.is_alive():
+            try:
+                self.conn.send(None)
+                self.process.join(timeout)
+            except OSError:
+                pass
+        if self.process.is_alive():
+            try:
+                if hasattr(os, "killpg"):
+                    os.killpg(self.process.pid, signal.SIGKILL)
+                else:
+                    self.process.kill()
+            except ProcessLookupError:
+                # Not in its own process group yet
+                self.process.kill()
+            self.process.join(timeout)
+            if self.process.is_alive():
+                logger.warning("Browser worker %s did not exit after being killed", self.process.pid)
+        self.conn.close()
+
+
+class BrowserPool:
+    """Bounded pool of browser worker processes, checked out by one BrowserCheck at a time.
+
+    Each worker owns a single WebDriver session in its own process, so checks
+    never share a session and a hung page only ties up its own worker. Workers
+    are retired after ``max_uses`` page loads, after a crash or unexpected
+    driver error, and when they miss their deadline.
+    """
+
+    def __init__(self, size: int = DEFAULT_POOL_SIZE, max_uses: int = DEFAULT_MAX_USES, driver_factory=create_driver):
+        self.size = size
+        self.max_uses = max_uses
+        self.driver_factory = driver_factory
+        self._context = multiprocessing.get_context("spawn")
+        self._idle = []
+        self._count = 0
+        self._closed = False
+        self._available = threading.Condition()
+
+    def _acquire(self, browser: str, timeout: float):
+        deadline = time.monotonic() + timeout
+        retired = None
+        with self._available:
+            while not self._closed:
+                for i, worker in enumerate(self._idle):
+                    if worker.browser == browser:
+                        return self._idle.pop(i)
+                if self._count < self.size:
+                    self._count += 1
+                    break
+                if self._idle:
+                    # All slots taken by idle workers of another browser, replace one
+                    retired = self._idle.pop(0)
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return None
+                self._available.wait(remaining)
+            else:
+                return None
+        if retired:
+            self._retire(retired)
+        try:
+            return BrowserWorker(self._context, browser, self.driver_factory)
+        except Exception:
+            with self._available:
+                self._count -= 1
+                self._available.notify()
+            raise
+
+    def _release(self, worker: BrowserWorker):
+        recycle = self._closed or not worker.healthy or worker.uses >= self.max_uses
+        with self._available:
+            if recycle:
+                self._count -= 1
+            else:
+                self._idle.append(worker)
+            self._available.notify()
+        if recycle:
+            self._retire(worker)
+
+    def _retire(self, worker: BrowserWorker):
+        logger.debug("Retiring %s browser worker after %s uses", worker.browser, worker.uses)
+        threading.Thread(target=worker.close, name="watchtower-browser-retire", daemon=True).start()
+
+    @contextmanager
+    def checkout(self, browser: str, timeout: float):
+        """Yields a BrowserWorker, or None when none became available within timeout"""
+        worker = self._acquire(browser, timeout)
+        try:
+            yield worker
+        finally:
+            if worker:
+                self._release(worker)
+
+    def load(
+        self,
+        browser: str,
+        url: str,
+        timeout: float = DEFAULT_PAGE_LOAD_TIMEOUT,
+        screenshot: bool = False,
+        previous_digest: str = None,
+    ) -> dict:
+        """Loads url in a pooled browser, returns {"ok", "error", "timings"}.
+
+        With ``screenshot`` the result also has the capture's "screenshot_digest"
+        and, unless it equals ``previous_digest``, the PNG bytes as "screenshot".
+        """
+        with self.checkout(browser, timeout) as worker:
+            if worker is None:
+                return failure(f"No {browser} worker available within {timeout}s")
+            return worker.load(
+                {"url": url, "timeout": timeout, "screenshot": screenshot, "previous_digest": previous_digest}
+            )
+
+    def shutdown(self):
+        with self._available:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            self._count -= len(idle)
+            self._available.notify_all()
+        for worker in idle:
+            worker.close()
+
+
+_pool = None
+_pool_args = {}
+_pool_lock = threading.Lock()
+
+
+def configure_pool(**kwargs):
+    """Sets BrowserPool arguments (size, max_uses) used when the shared pool is created"""
+    _pool_args.update(kwargs)
+
+
+def pool_args() -> dict:
+    return dict(_pool_args)
+
+
+def get_pool() -> BrowserPool:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = BrowserPool(**_pool_args)
+        return _pool
+
+
+def shutdown_pool():
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool:
+        pool.shutdown()
@@ -1,19 +1,44 @@
-from datetime import datetime
+import asyncio
+from contextlib import contextmanager, suppress
 import json
+import time
 from abc import ABC, abstractmethod
 from uuid import uuid4
 
-from selenium import webdriver
+from watchtower import browserpool, httppool, icmp, resolver
+from watchtower.exceptions import ResolutionError
+from watchtower.health import HealthState
+from watchtower.stats import LatencyHistogram
 
 import platform
 import re
 import subprocess
 import socket
-import requests
-import os
+import httpx
 
 
 class SchedulableCheck(ABC):
+    scoreboard_fields = (
+        "test_id",
+        "name",
+        "target",
+        "interval",
+        "options",
+        "last_run_successful",
+        "last_run_time",
+        "last_run_duration",
+        "extended_results",
+        "extended",
+        "timings",
+        "suppressed",
+    )
+    # Attributes run() sets besides its return value, copied back from worker processes
+    outcome_fields = ("extended_results", "extended", "stdout", "timings")
+    # Whether run() probes the resolved address, HostBatch resolves it once for these
+    uses_address = False
+    # Whether run() can be rebuilt from a CheckDescriptor in a worker process
+    process_safe = True
+
     def __init__(self, target: str, interval: int = 60, options: dict = None):
         self.name = self.__class__.__name__
         self.interval = interval
@@ -21,18 +46,59 @@ class SchedulableCheck(ABC):
         self.target = target
         self.last_run_successful = None
         self.last_run_time = None
+        self.last_run_duration = None
         self.stdout = None
         self.test_id = str(uuid4())
         self.extended_results = ""
         self.extended = ""
+        self.timings = {}
+        self.latency = LatencyHistogram()
+        self.health = HealthState()
+        # AdaptiveInterval when the suite schedules the check adaptively
+        self.adaptive = None
+        # Set while a host this check's host depends on is down
+        self.suppressed = False
+        self._resolved_address = None
+
+    def resolve_address(self) -> str:
+        """Returns the target's IPv4 address from its host batch or the shared DNS cache"""
+        if self._resolved_address:
+            return self._resolved_address
+        with self.timed("resolve_ms"):
+            return self._resolver().lookup_address(self.target)
+
+    async def resolve_address_async(self) -> str:
+        if self._resolved_address:
+            return self._resolved_address
+        with self.timed("resolve_ms"):
+            return await self._resolver().lookup_address_async(self.target)
+
+    def _resolver(self) -> resolver.Resolver:
+        return resolver.get_resolver(
+            self.options.get("nameservers"), self.options.get("timeout", resolver.DEFAULT_TIMEOUT)
+        )
+
+    @contextmanager
+    def timed(self, name: str):
+        """Records the wall time of the block in milliseconds as timings[name]"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.timings[name] = round((time.perf_counter() - started) * 1000, 3)
 
     @abstractmethod
     def run(self):
         raise NotImplementedError("Subclasses must implement the run() method.")
 
+    async def async_run(self):
+        """Runs the check on the event loop, falls back to run() in an executor thread"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, self.run)
+
     def to_dict(self, include_private=False):
         filtered_dict = {
-            key: value
+            key: value.to_dict() if hasattr(value, "to_dict") else value
             for key, value in self.__dict__.items()
             if include_private or not key.startswith("_")
         }
@@ -41,8 +107,31 @@ class SchedulableCheck(ABC):
     def to_json(self, include_private=False):
         return json.dumps(self.to_dict(include_private))
 
+    def to_scoreboard_dict(self):
+        scoreboard = {key: getattr(self, key, None) for key in self.scoreboard_fields}
+        scoreboard["latency"] = self.latency.to_dict()
+        scoreboard.update(self.health.to_dict())
+        if self.adaptive:
+            scoreboard["current_interval"] = self.adaptive.current
+        return scoreboard
+
 
 class PingCheck(SchedulableCheck):
+    """Pings the target with the native ICMP prober, or the system ping binary.
+
+    Options: count, timeout, packet_interval, method ("auto", "icmp" or
+    "subprocess") and max_packet_loss (percent). Any reply passes unless
+    max_packet_loss is set, whichever method is used.
+    """
+
+    scoreboard_fields = SchedulableCheck.scoreboard_fields + ("ping_stats",)
+    outcome_fields = SchedulableCheck.outcome_fields + ("ping_stats",)
+    uses_address = True
+
+    def __init__(self, target: str, interval: int = 60, options: dict = None):
+        super().__init__(target=target, interval=interval, options=options)
+        self.ping_stats = {}
+
     def _is_ping_success(self, result: str) -> bool:
         self.stdout = result.stdout.decode("UTF-8")
         packet_loss = re.search("\d+\.\d+% packet loss", self.stdout)
@@ -50,28 +139,94 @@ class PingCheck(SchedulableCheck):
         if packet_loss:
             self.extended_results = packet_loss.group(0)
 
-        result.stdout.decode("UTF-8")
+        rtt = re.search(r"= ([\d.]+)/([\d.]+)/([\d.]+)/([\d.]+) ms", self.stdout)
+        self.timings["rtt_ms"] = [float(t) for t in re.findall(r"time=([\d.]+) ms", self.stdout)]
+        self.ping_stats = {
+            "packet_loss": float(packet_loss.group(0).split("%")[0]) if packet_loss else None,
+            "rtt_min": float(rtt.group(1)) if rtt else None,
+            "rtt_avg": float(rtt.group(2)) if rtt else None,
+            "rtt_max": float(rtt.group(3)) if rtt else None,
+            "rtt_stddev": float(rtt.group(4)) if rtt else None,
+        }
 
-        return True if result.returncode == 0 else False
+        return result.returncode == 0 and self._within_loss(self.ping_stats["packet_loss"])
 
-    def _do_ping(self) -> str:
+    def _within_loss(self, packet_loss) -> bool:
+        max_packet_loss = self.options.get("max_packet_loss")
+        return max_packet_loss is None or packet_loss is None or packet_loss <= max_packet_loss
+
+    def _ping_command(self) -> list:
         count_flag = f"-n" if platform.system().lower() == "windows" else f"-c"
         wait_flag = f"-w" if platform.system().lower() == "windows" else f"-w"
         timeout = self.options.get("timeout", 5)
         count = self.options.get("count", 5)
+        return ["ping", count_flag, f"{count}", wait_flag, str(timeout), self.target]
 
-        result = subprocess.run(
-            ["ping", count_flag, f"{count}", wait_flag, str(timeout), self.target],
-            capture_output=True,
-        )
+    def _do_ping(self) -> str:
+        result = subprocess.run(self._ping_command(), capture_output=True)
         return result
 
+    def _native_prober(self):
+        if self.options.get("method", "auto") == "subprocess":
+            return None
+        return icmp.get_prober()
+
+    def _probe_args(self):
+        return {
+            "count": self.options.get("count", 5),
+            "timeout": self.options.get("timeout", 5),
+            "interval": self.options.get("packet_interval", 0.2),
+        }
+
+    def _is_probe_success(self, result: icmp.PingResult) -> bool:
+        self.stdout = None
+        self.ping_stats = result.to_dict()
+        self.timings["rtt_ms"] = [round(rtt, 3) for rtt in result.rtts]
+        self.extended_results = f"{result.packet_loss:.1f}% packet loss"
+        return result.received > 0 and self._within_loss(result.packet_loss)
+
+    def _resolve_failed(self):
+        self.ping_stats = {}
+        self.extended_results = f"Could not resolve {self.target}"
+        return False
+
     def run(self):
+        prober = self._native_prober()
+        if prober:
+            try:
+                address = self.resolve_address()
+            except socket.gaierror:
+                return self._resolve_failed()
+            return self._is_probe_success(
+                prober.ping(self.target, address, **self._probe_args())
+            )
         result = self._do_ping()
         return self._is_ping_success(result)
 
+    async def async_run(self):
+        prober = self._native_prober()
+        if prober:
+            try:
+                address = await self.resolve_address_async()
+            except socket.gaierror:
+                return self._resolve_failed()
+            result = await prober.async_ping(self.target, address, **self._probe_args())
+            return self._is_probe_success(result)
+
+        command = self._ping_command()
+        process = await asyncio.create_subprocess_exec(
+            *command,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+        )
+        stdout, stderr = await process.communicate()
+        result = subprocess.CompletedProcess(command, process.returncode, stdout, stderr)
+        return self._is_ping_success(result)
+
 
 class TcpCheck(SchedulableCheck):
+    uses_address = True
+
     def _validate_options(self):
         if not self.options.get("port"):
             raise Exception("TcpCheck is missing require option: 'port'")
@@ -83,10 +238,12 @@ class TcpCheck(SchedulableCheck):
         timeout = self.options.get("timeout", 5)
 
         client_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        client_socket.settimeout(self.timeout)
+        client_socket.settimeout(timeout)
         try:
             self.extended_results = ""
-            client_socket.connect((self.target, self.port))
+            address = self.resolve_address()
+            with self.timed("connect_ms"):
+                client_socket.connect((address, port))
             return True
         except socket.timeout:
             self.extended_results = "Connection timed out."
@@ -100,29 +257,92 @@ class TcpCheck(SchedulableCheck):
         finally:
             client_socket.close()
 
+    async def async_run(self):
+        self._validate_options()
+
+        port = self.options.get("port")
+        timeout = self.options.get("timeout", 5)
+
+        try:
+            self.extended_results = ""
+            address = await self.resolve_address_async()
+            with self.timed("connect_ms"):
+                _, writer = await asyncio.wait_for(
+                    asyncio.open_connection(address, port), timeout
+                )
+        except asyncio.TimeoutError:
+            self.extended_results = "Connection timed out."
+            return False
+        except ConnectionRefusedError:
+            self.extended_results = "Connection refused (server may not be available)."
+            return False
+        except Exception as e:
+            self.extended_results = f"Socket error: {e}"
+            return False
+        writer.close()
+        with suppress(OSError):
+            await writer.wait_closed()
+        return True
+
 
 class DnsCheck(SchedulableCheck):
-    # TODO: Ability to select another resolver
+    """Queries the target's records, always asking the resolver rather than the cache.
+
+    Options: record_type ("A", "AAAA", "MX" or "CNAME", default "A"),
+    nameservers (list of addresses, default the system's) and timeout. A
+    successful A query also refreshes the address other checks of the host use.
+    """
+
+    outcome_fields = SchedulableCheck.outcome_fields + ("address", "records")
+
+    def __init__(self, target: str, interval: int = 60, options: dict = None):
+        super().__init__(target=target, interval=interval, options=options)
+        self.address = None
+        self.records = []
+
+    @property
+    def resolves_address(self) -> bool:
+        """Whether this check looks up the address other checks of its host probe"""
+        return self.options.get("record_type", "A").upper() == "A" and not self.options.get("nameservers")
 
     def _validate_options(self):
-        pass
+        if self.options.get("record_type", "A").upper() not in resolver.RECORD_TYPES:
+            raise Exception(f"DnsCheck record_type must be one of: {resolver.RECORD_TYPES}")
+
+    def _record_answer(self, record_type: str, answer: resolver.Answer) -> bool:
+        self.records = answer.records
+        self.address = answer.records[0] if record_type == "A" else None
+        if record_type == "A":
+            self.extended = f"DNS resolution for {self.target} succeeded. IP address: {self.address}"
+        else:
+            self.extended = f"DNS {record_type} lookup for {self.target} succeeded: {', '.join(answer.records)}"
+        return True
+
+    def _record_failure(self, error: Exception) -> bool:
+        self.records = []
+        self.address = None
+        self.extended = f"DNS resolution for {self.target} failed. {error}"
+        return False
 
     def run(self):
         self._validate_options()
-        timeout = self.options.get("timeout", 5)
+        record_type = self.options.get("record_type", "A").upper()
+        try:
+            with self.timed("resolve_ms"):
+                answer = self._resolver().resolve(self.target, record_type, use_cache=False)
+        except ResolutionError as e:
+            return self._record_failure(e)
+        return self._record_answer(record_type, answer)
 
+    async def async_run(self):
+        self._validate_options()
+        record_type = self.options.get("record_type", "A").upper()
         try:
-            ip_address = socket.gethostbyname(self.target)
-            self.extended = (
-                f"DNS resolution for {self.target} succeeded. IP address: {ip_address}"
-            )
-            return True
-        except socket.gaierror:
-            self.extended = f"DNS resolution for {self.target} failed. Could not resolve the domain."
-            return False
-        except Exception as e:
-            self.extended = "Error:", e
-            return False
+            with self.timed("resolve_ms"):
+                answer = await self._resolver().resolve_async(self.target, record_type, use_cache=False)
+        except ResolutionError as e:
+            return self._record_failure(e)
+        return self._record_answer(record_type, answer)
 
 
 class SpeedTestCheck(SchedulableCheck):
@@ -137,76 +357,138 @@ class SpeedTestCheck(SchedulableCheck):
 
 
 class HttpStatusCheck(SchedulableCheck):
-    def run(self):
-        timeout = self.options.get("timeout", 5)
-        expected_status_codes = self.options.get("expected_status_codes", [200])
-        try:
-            r = requests.get(self.target, timeout=timeout)
-        except requests.exceptions.ConnectionError:
-            return False
-        self.extended_results = f"HTTP Status Code: {r.status_code}"
-        if r.status_code in expected_status_codes:
-            return True
-        else:
-            return False
+    """Requests the target URL through the shared keep-alive connection pool.
 
+    Options: timeout, expected_status_codes (default [200]), method ("GET" or
+    "HEAD"), read_body (default True, False stops after the headers),
+    expect_content (a string or list of strings the body must contain),
+    max_body_bytes (default 1 MiB), http2, verify_tls and follow_redirects.
+    """
 
-class WebDriverFactory:
-    def __init__(self):
-        self.chrome_driver = None
-        self.firefox_driver = None
+    DEFAULT_MAX_BODY_BYTES = 1024 * 1024
 
-    def get_driver(self, browser="chrome", options={}):
-        match browser.lower():
-            case "chrome":
-                if not self.chrome_driver:
-                    from selenium.webdriver.chrome.options import Options
+    def _client(self, get_client):
+        return get_client(
+            http2=self.options.get("http2", False), verify=self.options.get("verify_tls", True)
+        )
+
+    def _request_args(self) -> dict:
+        return {
+            "method": self.options.get("method", "GET").upper(),
+            "url": self.target,
+            "timeout": self.options.get("timeout", 5),
+            "follow_redirects": self.options.get("follow_redirects", True),
+        }
 
-                    options = Options()
-                    options.add_argument("--headless")
-                    self.chrome_driver = webdriver.Chrome(options=options)
-                return self.chrome_driver
-            case "firefox":
-                if not self.firefox_driver:
-                    from selenium.webdriver.firefox.options import Options
+    def _scanner(self, method: str):
+        """Returns a BodyScanner when the body should be read, None to stop after the headers"""
+        expected = self.options.get("expect_content") or []
+        if isinstance(expected, str):
+            expected = [expected]
+        if method == "HEAD" or not (expected or self.options.get("read_body", True)):
+            return None
+        return httppool.BodyScanner(
+            [text.encode("utf-8") for text in expected],
+            self.options.get("max_body_bytes", self.DEFAULT_MAX_BODY_BYTES),
+        )
 
-                    options = Options()
-                    options.add_argument("--headless")
-                    self.firefox_driver = webdriver.Firefox(options=options)
-                return self.firefox_driver
+    def _evaluate(self, r: httpx.Response, scanner) -> bool:
+        self.extended_results = f"HTTP Status Code: {r.status_code}"
+        if r.status_code not in self.options.get("expected_status_codes", [200]):
+            return False
+        if scanner and scanner.missing:
+            missing = ", ".join(repr(text.decode("utf-8")) for text in scanner.missing)
+            self.extended_results += f", content not found: {missing}"
+            if scanner.truncated:
+                self.extended_results += f" (in first {scanner.read} bytes)"
+            return False
+        return True
 
+    def run(self):
+        request = self._request_args()
+        scanner = self._scanner(request["method"])
+        try:
+            started = time.perf_counter()
+            with self._client(httppool.get_client).stream(**request) as r:
+                self.timings["ttfb_ms"] = round((time.perf_counter() - started) * 1000, 3)
+                if scanner:
+                    with self.timed("body_ms"):
+                        for chunk in r.iter_bytes():
+                            if scanner.feed(chunk):
+                                break
+        except httpx.HTTPError as e:
+            self.extended_results = f"Request failed: {e}"
+            return False
+        return self._evaluate(r, scanner)
 
-webdriver_factory = WebDriverFactory()
+    async def async_run(self):
+        request = self._request_args()
+        scanner = self._scanner(request["method"])
+        try:
+            started = time.perf_counter()
+            async with self._client(httppool.get_async_client).stream(**request) as r:
+                self.timings["ttfb_ms"] = round((time.perf_counter() - started) * 1000, 3)
+                if scanner:
+                    with self.timed("body_ms"):
+                        async for chunk in r.aiter_bytes():
+                            if scanner.feed(chunk):
+                                break
+        except httpx.HTTPError as e:
+            self.extended_results = f"Request failed: {e}"
+            return False
+        return self._evaluate(r, scanner)
 
 
 class BrowserCheck(SchedulableCheck):
+    """Loads the target in a headless browser checked out from the shared worker pool.
+
+    Options: browser ("chrome" or "firefox"), timeout (page load, seconds) and
+    screenshots (default True). Captures go to the suite's ScreenshotStore, on
+    a worker node they are kept in ``screenshot`` for the coordinator to store.
+    """
+
+    outcome_fields = SchedulableCheck.outcome_fields + ("screenshot",)
+    # The page loads in a browser worker process already, and captures need the suite's store and pool
+    process_safe = False
+
     def __init__(self, target: str, interval=60, options={}):
         super().__init__(target=target, interval=interval, options=options)
         self.target = target
-        self.timeout = options.get("timeout") or 5
-        self.screenshot_dir = options.get("screenshot_dir") or "./screenshots/"
-        self.browser = options.get("browser") or "chrome"
+        self.timeout = self.options.get("timeout") or browserpool.DEFAULT_PAGE_LOAD_TIMEOUT
+        self.browser = self.options.get("browser") or "chrome"
+        self.screenshot_store = None
+        # Set on worker nodes, (digest, png) of the last capture, png None when unchanged
+        self.forward_screenshots = False
+        self.screenshot = None
+        self._forwarded_digest = None
 
     def run(self):
-        driver = webdriver_factory.get_driver(self.browser)
-        current_datetime = datetime.now()
-
-        domain_pattern = r"^[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$"
-        domain_match = re.findall(domain_pattern, self.target)
-        if domain_match:
-            domain = domain_match.group(0)
-            screenshot_filename = f"{domain}.png"
-        else:
-            screenshot_filename = (
-                f"{current_datetime.strftime('%Y-%m-%d-%H-%M-%S')}.png"
-            )
-
-        screenshot_full_path = os.path.join(self.screenshot_dir, screenshot_filename)
-        self.extended_results = f"saved screenshot to {screenshot_full_path}"
-
-        try:
-            driver.get(self.target)
-            driver.save_screenshot(screenshot_full_path)
-            return True
-        except:
+        store = self.screenshot_store
+        capture = self.options.get("screenshots", True) and (store is not None or self.forward_screenshots)
+        previous_digest = store.latest_digest(self.test_id) if store else self._forwarded_digest
+        result = browserpool.get_pool().load(
+            self.browser,
+            self.target,
+            self.timeout,
+            screenshot=capture,
+            previous_digest=previous_digest if capture else None,
+        )
+        self.timings.update(result["timings"])
+        self.screenshot = None
+        if not result["ok"]:
+            self.extended_results = result["error"]
             return False
+        self.extended_results = ""
+        image_digest = result.get("screenshot_digest")
+        if image_digest and store:
+            self.store_screenshot(store, image_digest, result.get("screenshot"))
+        elif image_digest:
+            self.screenshot = (image_digest, result.get("screenshot"))
+            self._forwarded_digest = image_digest
+        return True
+
+    def store_screenshot(self, store, image_digest: str, png: bytes = None):
+        entry = store.add(self.test_id, image_digest, png)
+        self.extended_results = f"screenshot {entry['digest'][:12]}"
+        if entry["captures"] == 1 and entry.get("diff") is not None:
+            self.extended_results += f", {entry['diff']:.0%} changed"
@@ -1,5 +1,6 @@
+import json
 import requests
-from dataclasses import dataclass
+from dataclasses import dataclass, fields
 from typing import List, Optional, Dict
 
 @dataclass
@@ -10,26 +11,35 @@ class Check:
     last_run_time: str
     name: str
     options: Dict
-    stdout: Optional[str]
     extended_results: Optional[str]
     extended: Optional[str]
     target: str
+    stdout: Optional[str] = None
+    last_run_duration: Optional[float] = None
+    timings: Optional[Dict] = None
+    latency: Optional[Dict] = None
+    ping_stats: Optional[Dict] = None
+    state: Optional[bool] = None
+    flapping: bool = False
+    suppressed: bool = False
 
     def __str__(self):
-        return f"Check(id={self.id}, name={self.name}, target={self.target})"
+        return f"Check(id={self.test_id}, name={self.name}, target={self.target})"
     
     @classmethod
     def from_dict(cls, check_dict):
-        return cls(**check_dict)    
+        known_fields = {f.name for f in fields(cls)}
+        return cls(**{k: v for k, v in check_dict.items() if k in known_fields})
 
 @dataclass
 class Group:
     failing_checks: List[str]
     name: str
     checks: List[Check]
+    counts: Optional[Dict] = None
 
     def __str__(self):
-        return f"Group(group_name={self.group_name}, checks={len(self.checks)} checks)"
+        return f"Group(group_name={self.name}, checks={len(self.checks)} checks)"
     
     @classmethod
     def from_dict(cls, check_dict):
@@ -40,6 +50,7 @@ class Group:
 @dataclass
 class DashboardResponse:
     groups: List[Group]
+    totals: Optional[Dict] = None
 
     def __str__(self):
         return f"ApiResponse(groups={len(self.groups)} groups)"
@@ -51,12 +62,42 @@ class DashboardResponse:
         results_dict.pop("groups")
         return cls(groups=group_list, **results_dict)
 
+    def apply_changes(self, changes: dict):
+        """Applies a /api/scoreboard/changes delta in place"""
+        groups = {group.name: group for group in self.groups}
+        for group_data in changes.get("groups", []):
+            group = groups.get(group_data["name"])
+            if group is None:
+                group = groups[group_data["name"]] = Group(
+                    name=group_data["name"], failing_checks=[], checks=[]
+                )
+                self.groups.append(group)
+            group.failing_checks = group_data["failing_checks"]
+            group.counts = group_data.get("counts")
+        if "totals" in changes:
+            self.totals = changes["totals"]
+
+        for change in changes.get("checks", []):
+            group = groups[change["group"]]
+            check = Check.from_dict(change["check"])
+            for i, existing in enumerate(group.checks):
+                if existing.test_id == check.test_id:
+                    group.checks[i] = check
+                    break
+            else:
+                group.checks.append(check)
+
 
 
 class Client:
     def __init__(self, url="http://127.0.0.1:5000"):
         self.url = url
         self.data = []
+        self.session = requests.Session()
+        self.scoreboard = None
+        self.scoreboard_etag = None
+        self.epoch = None
+        self.version = 0
 
     def fetch_data(self, path:str):
         response = requests.get(f"{self.url}{path}")
@@ -64,6 +105,56 @@ class Client:
         self.data = json_data
         return json_data
     
-    def fetch_scoreboard(self) -> dict:
-        return DashboardResponse.from_dict(self.fetch_data(path="/api/scoreboard"))
+    def fetch_scoreboard(self) -> DashboardResponse:
+        headers = {"If-None-Match": self.scoreboard_etag} if self.scoreboard_etag else {}
+        response = self.session.get(f"{self.url}/api/scoreboard", headers=headers)
+        if response.status_code == 304 and self.scoreboard:
+            return self.scoreboard
+        response.raise_for_status()
+        self.data = response.json()
+        self.scoreboard = DashboardResponse.from_dict(self.data)
+        self.scoreboard_etag = response.headers.get("ETag")
+        self.epoch, _, version = self.scoreboard_etag.strip('"').partition("-")
+        self.version = int(version)
+        return self.scoreboard
+
+    def fetch_changes(self) -> DashboardResponse:
+        """Updates the local scoreboard with the checks changed since the last fetch"""
+        if self.scoreboard is None:
+            return self.fetch_scoreboard()
+
+        response = self.session.get(
+            f"{self.url}/api/scoreboard/changes",
+            params={"since": self.version, "epoch": self.epoch},
+        )
+        response.raise_for_status()
+        return self.apply_changes(response.json())
+
+    def stream_changes(self, timeout=60):
+        """Subscribes to /api/stream and yields the local scoreboard after each update"""
+        if self.scoreboard is None:
+            self.fetch_scoreboard()
+        yield self.scoreboard
+
+        headers = {"Accept": "text/event-stream", "Last-Event-ID": f"{self.epoch}-{self.version}"}
+        with self.session.get(
+            f"{self.url}/api/stream", headers=headers, stream=True, timeout=timeout
+        ) as response:
+            response.raise_for_status()
+            data = []
+            for line in response.iter_lines(decode_unicode=True):
+                if line.startswith("data:"):
+                    data.append(line[5:].strip())
+                elif not line and data:
+                    yield self.apply_changes(json.loads("\n".join(data)))
+                    data = []
+
+    def apply_changes(self, changes: dict) -> DashboardResponse:
+        if changes["full"]:
+            self.scoreboard_etag = None
+            return self.fetch_scoreboard()
+        self.scoreboard.apply_changes(changes)
+        self.version = changes["version"]
+        self.scoreboard_etag = f'"{self.epoch}-{self.version}"'
+        return self.scoreboard
 
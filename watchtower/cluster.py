@@ -0,0 +1,509 @@
+import argparse
+import atexit
+import hashlib
+import multiprocessing
+import os
+import socket
+import threading
+import time
+from bisect import bisect, insort
+from collections import namedtuple
+from multiprocessing.connection import AuthenticationError, Client, Listener
+
+from apscheduler.schedulers.background import BackgroundScheduler
+from watchtower import browserpool
+from watchtower.engine import AsyncScheduler, DEFAULT_MAX_CONCURRENCY
+from watchtower.executors import CheckExecutors, apply_outcome, build_check, describe, outcome_fields
+from watchtower.logging_config import logger
+from watchtower.models import Host
+from watchtower.ratelimit import ProbeLimiter
+from watchtower.testcases import TestSuite
+
+DEFAULT_RING_REPLICAS = 128
+# Joins and leaves within this many seconds are rebalanced together
+REBALANCE_DELAY = 1.0
+RECONNECT_DELAY = 2.0
+
+# What a worker needs to schedule one check of a host
+ShardedCheck = namedtuple("ShardedCheck", ("host_name", "group", "target", "descriptor"))
+
+
+def host_key(host: Host) -> str:
+    return f"{host.group}|{host.name}|{host.target}"
+
+
+def parse_address(value: str):
+    host, _, port = value.rpartition(":")
+    return (host or "127.0.0.1", int(port))
+
+
+def worker_settings(suite: TestSuite) -> dict:
+    """The coordinator's scheduling, limits and executors, applied by every worker"""
+    limiter = suite.limiter
+    return {
+        "spread": suite.spread,
+        "jitter": suite.jitter,
+        "coalesce": suite.coalesce,
+        "limiter": (limiter.max_per_target, limiter.rate, limiter.rate_per_target) if limiter else None,
+        "executor_modes": suite.executors.modes,
+        "thread_workers": suite.executors.thread_workers,
+        "process_workers": suite.executors.process_workers,
+        "browser_pool": browserpool.pool_args(),
+        "screenshots": suite.screenshot_store is not None,
+    }
+
+
+class HashRing:
+    """Consistent hash ring, each node owns ``replicas`` points on a 64-bit circle.
+
+    Adding or removing a node only moves the keys between its points and their
+    neighbours, roughly 1/N of all keys.
+    """
+
+    def __init__(self, replicas: int = DEFAULT_RING_REPLICAS):
+        self.replicas = replicas
+        self.nodes = set()
+        self._points = []
+        self._owners = {}
+
+    def __len__(self):
+        return len(self.nodes)
+
+    @staticmethod
+    def _hash(key: str) -> int:
+        return int.from_bytes(hashlib.sha1(key.encode("utf-8")).digest()[:8], "big")
+
+    def add(self, node: str):
+        self.nodes.add(node)
+        for i in range(self.replicas):
+            point = self._hash(f"{node}#{i}")
+            self._owners[point] = node
+            insort(self._points, point)
+
+    def remove(self, node: str):
+        self.nodes.discard(node)
+        points = {self._hash(f"{node}#{i}") for i in range(self.replicas)}
+        self._points = [point for point in self._points if point not in points]
+        for point in points:
+            self._owners.pop(point, None)
+
+    def node_for(self, key: str):
+        if not self._points:
+            return None
+        index = bisect(self._points, self._hash(key)) % len(self._points)
+        return self._owners[self._points[index]]
+
+
+class Coordinator:
+    """Shards the suite's hosts over connected worker nodes and records their results.
+
+    Workers connect over an authenticated multiprocessing connection, no broker
+    is involved. Every host (with all of its checks) is owned by the worker the
+    hash ring picks for it. When workers join or leave, only hosts whose owner
+    changed are removed from the old and sent to the new worker. Results stream
+    back over the same connection into ``TestSuite.record_result``, along with
+    browser screenshots. Workers get the suite's settings when they join, and
+    are told to skip checks behind a down host.
+    """
+
+    def __init__(
+        self,
+        suite: TestSuite,
+        address=("127.0.0.1", 0),
+        authkey: bytes = None,
+        local_workers: int = 0,
+        worker_engine: str = "thread",
+        replicas: int = DEFAULT_RING_REPLICAS,
+    ):
+        self.suite = suite
+        self.address = address
+        self.authkey = authkey or os.urandom(32)
+        self.local_workers = local_workers
+        self.worker_engine = worker_engine
+        self.ring = HashRing(replicas)
+        self.workers = {}
+        self.shards = {}
+        self.owners = {}
+        self._host_keys = {}
+        self._processes = []
+        self._listener = None
+        self._rebalance_timer = None
+        self._stopping = False
+        self._lock = threading.RLock()
+
+    def start(self):
+        self._listener = Listener(self.address, authkey=self.authkey)
+        self.address = self._listener.address
+        threading.Thread(target=self._accept_loop, name="watchtower-coordinator", daemon=True).start()
+        logger.info("Coordinator listening on %s:%s", *self.address)
+        self._processes = [self._spawn_local(i) for i in range(self.local_workers)]
+        if self._processes:
+            # Runs before multiprocessing's own exit handler, which would wait on the workers forever
+            atexit.register(self.stop)
+
+    def _spawn_local(self, i: int):
+        # Not daemonic, a worker needs child processes of its own for the browser pool
+        process = multiprocessing.get_context("spawn").Process(
+            target=run_worker,
+            args=(self.address, self.authkey, f"local-{i}", self.worker_engine, None, False),
+            name=f"watchtower-worker-{i}",
+        )
+        process.start()
+        return process
+
+    def stop(self):
+        self._stopping = True
+        if self._rebalance_timer:
+            self._rebalance_timer.cancel()
+        if self._listener:
+            self._listener.close()
+        with self._lock:
+            for conn in self.workers.values():
+                self._send(conn, ("stop", None))
+        for process in self._processes:
+            process.join(5)
+            if process.is_alive():
+                process.terminate()
+                process.join(5)
+            if process.is_alive():
+                process.kill()
+                process.join()
+
+    def _accept_loop(self):
+        while True:
+            try:
+                conn = self._listener.accept()
+            except AuthenticationError as e:
+                logger.warning("Rejected worker connection: %s", e)
+                continue
+            except OSError:
+                break
+            threading.Thread(target=self._serve, args=(conn,), name="watchtower-worker-link", daemon=True).start()
+
+    def _serve(self, conn):
+        worker_id = None
+        try:
+            kind, name = conn.recv()
+            if kind != "hello":
+                return
+            conn.send(("configure", worker_settings(self.suite)))
+            worker_id = self._join(name, conn)
+            while True:
+                kind, payload = conn.recv()
+                if kind == "result":
+                    self._record(worker_id, *payload)
+        except (EOFError, OSError):
+            pass
+        finally:
+            if worker_id:
+                self._leave(worker_id)
+            conn.close()
+
+    def _join(self, name: str, conn) -> str:
+        with self._lock:
+            worker_id = name
+            while worker_id in self.workers:
+                worker_id = f"{name}~{os.urandom(2).hex()}"
+            self.workers[worker_id] = conn
+            self.ring.add(worker_id)
+            self._schedule_rebalance()
+        logger.info("Worker %s joined, %s connected", worker_id, len(self.workers))
+        return worker_id
+
+    def _leave(self, worker_id: str):
+        with self._lock:
+            self.workers.pop(worker_id, None)
+            self.ring.remove(worker_id)
+            # Its hosts are unowned until the rebalance, even if a worker of the same name rejoins
+            self.owners = {key: owner for key, owner in self.owners.items() if owner != worker_id}
+            self._schedule_rebalance()
+        logger.warning("Worker %s left, %s connected", worker_id, len(self.workers))
+        local = worker_id.startswith("local-") and worker_id[6:].isdigit() and int(worker_id[6:])
+        if local is not False and local < len(self._processes) and not self._stopping:
+            # Replace a crashed local worker, its hosts come back to it on the next rebalance
+            self._processes[local].join(1)
+            self._processes[local] = self._spawn_local(local)
+
+    def _schedule_rebalance(self):
+        if self._rebalance_timer:
+            self._rebalance_timer.cancel()
+        self._rebalance_timer = threading.Timer(REBALANCE_DELAY, self._rebalance)
+        self._rebalance_timer.daemon = True
+        self._rebalance_timer.start()
+
+    def _rebalance(self):
+        """Moves the hosts whose ring owner changed, leaves every other host where it runs"""
+        with self._lock:
+            adds, removes = {}, {}
+            for key, checks in self.shards.items():
+                owner = self.ring.node_for(key)
+                previous = self.owners.get(key)
+                if owner == previous:
+                    continue
+                if previous in self.workers:
+                    removes.setdefault(previous, []).extend(checks.keys())
+                if owner:
+                    self.owners[key] = owner
+                    adds.setdefault(owner, []).extend(checks.values())
+                else:
+                    self.owners.pop(key, None)
+            for worker_id, test_ids in removes.items():
+                self._send(self.workers[worker_id], ("remove", test_ids))
+            for worker_id, checks in adds.items():
+                self._add(worker_id, checks)
+        moved = sum(len(checks) for checks in adds.values())
+        if moved:
+            logger.info("Rebalanced %s checks over %s workers", moved, len(self.workers))
+
+    def _send(self, conn, message):
+        try:
+            conn.send(message)
+        except OSError as e:
+            logger.warning("Could not send to worker: %s", e)
+
+    def _add(self, worker_id: str, checks: list):
+        self._send(self.workers[worker_id], ("add", checks))
+        suppressed = {}
+        for sharded in checks:
+            entry = self.suite.tests.get(sharded.descriptor.test_id)
+            if entry and entry[0].suppressed:
+                suppressed[sharded.descriptor.test_id] = True
+        if suppressed:
+            self._send(self.workers[worker_id], ("suppress", suppressed))
+
+    def suppress(self, tests: list):
+        """Tells the workers running ``tests`` to skip or resume them, following ``test.suppressed``"""
+        with self._lock:
+            updates = {}
+            for test in tests:
+                owner = self.owners.get(self._host_keys.get(test.test_id))
+                if owner in self.workers:
+                    updates.setdefault(owner, {})[test.test_id] = test.suppressed
+            for worker_id, states in updates.items():
+                self._send(self.workers[worker_id], ("suppress", states))
+
+    def assign(self, host: Host, check):
+        if check.options.get("adaptive"):
+            logger.warning("Check %s on %s: adaptive intervals are not supported on workers", check.name, check.target)
+        key = host_key(host)
+        sharded = ShardedCheck(host.name, host.group, host.target, describe(check))
+        with self._lock:
+            self.shards.setdefault(key, {})[check.test_id] = sharded
+            self._host_keys[check.test_id] = key
+            owner = self.owners.get(key)
+            if owner is None:
+                owner = self.ring.node_for(key)
+                if owner is None:
+                    # No workers yet, the next rebalance hands the host out
+                    return
+                self.owners[key] = owner
+            if owner in self.workers:
+                self._add(owner, [sharded])
+
+    def unassign(self, check):
+        with self._lock:
+            key = self._host_keys.pop(check.test_id)
+            checks = self.shards[key]
+            del checks[check.test_id]
+            owner = self.owners.get(key)
+            if not checks:
+                del self.shards[key]
+                self.owners.pop(key, None)
+            if owner in self.workers:
+                self._send(self.workers[owner], ("remove", [check.test_id]))
+
+    def _record(self, worker_id: str, test_id: str, result, duration, fields: dict):
+        with self._lock:
+            key = self._host_keys.get(test_id)
+            if key is None or self.owners.get(key) != worker_id:
+                # A late result from a worker the check has moved away from
+                return
+        entry = self.suite.tests.get(test_id)
+        if entry is None:
+            return
+        test, group = entry
+        apply_outcome(test, (result, fields))
+        screenshot = getattr(test, "screenshot", None)
+        if screenshot and self.suite.screenshot_store:
+            test.screenshot = None
+            try:
+                test.store_screenshot(self.suite.screenshot_store, *screenshot)
+            except ValueError as e:
+                logger.warning("Screenshot of %s from worker %s: %s", test.target, worker_id, e)
+        self.suite.record_result(test, group, result, duration)
+
+    def status(self) -> dict:
+        with self._lock:
+            workers = {worker_id: {"hosts": 0, "checks": 0} for worker_id in self.workers}
+            unassigned = 0
+            for key, checks in self.shards.items():
+                owner = self.owners.get(key)
+                if owner in workers:
+                    workers[owner]["hosts"] += 1
+                    workers[owner]["checks"] += len(checks)
+                else:
+                    unassigned += len(checks)
+            return {
+                "address": f"{self.address[0]}:{self.address[1]}",
+                "workers": workers,
+                "unassigned_checks": unassigned,
+            }
+
+
+class WorkerSuite(TestSuite):
+    """TestSuite of a worker node, results are sent to the coordinator instead of recorded"""
+
+    def __init__(self, conn, forward_screenshots: bool = False, **kwargs):
+        super().__init__(**kwargs)
+        self.conn = conn
+        self.forward_screenshots = forward_screenshots
+        self._send_lock = threading.Lock()
+
+    @classmethod
+    def configured(cls, conn, scheduler, settings: dict) -> "WorkerSuite":
+        """Builds a worker suite from the coordinator's ``worker_settings``"""
+        browserpool.configure_pool(**settings["browser_pool"])
+        limiter = settings["limiter"]
+        return cls(
+            conn,
+            forward_screenshots=settings["screenshots"],
+            scheduler=scheduler,
+            spread=settings["spread"],
+            jitter=settings["jitter"],
+            coalesce=settings["coalesce"],
+            limiter=ProbeLimiter(*limiter) if limiter else None,
+            executors=CheckExecutors(
+                settings["executor_modes"],
+                thread_workers=settings["thread_workers"],
+                process_workers=settings["process_workers"],
+            ),
+        )
+
+    def add_test(self, host: Host, check):
+        if hasattr(check, "forward_screenshots"):
+            check.forward_screenshots = self.forward_screenshots
+        return super().add_test(host, check)
+
+    def record_result(self, test, group, test_result, duration=None):
+        test.last_run_successful = test_result
+        message = ("result", (test.test_id, test_result, duration, outcome_fields(test)))
+        with self._send_lock:
+            try:
+                self.conn.send(message)
+            except OSError:
+                pass
+        return test_result
+
+    def apply(self, kind: str, payload):
+        if kind == "add":
+            for sharded in payload:
+                host = Host(name=sharded.host_name, group=sharded.group, target=sharded.target, checks=[])
+                self.add_test(host, build_check(sharded.descriptor))
+        elif kind == "remove":
+            for test_id in payload:
+                if test_id in self.tests:
+                    self.remove_test(test_id)
+        elif kind == "suppress":
+            resumed = []
+            for test_id, suppressed in payload.items():
+                entry = self.tests.get(test_id)
+                if entry is None or entry[0].suppressed == suppressed:
+                    continue
+                entry[0].suppressed = suppressed
+                self.engine_stats.forget(test_id)
+                if not suppressed:
+                    resumed.append((0, *entry))
+            if resumed:
+                self._resume(resumed)
+
+
+def run_worker(
+    address,
+    authkey: bytes,
+    name: str = None,
+    engine: str = "thread",
+    max_concurrency: int = None,
+    reconnect: bool = True,
+):
+    """Runs checks assigned by the coordinator at ``address`` until told to stop"""
+    name = name or f"{socket.gethostname()}-{os.getpid()}"
+    while True:
+        try:
+            conn = Client(tuple(address), authkey=authkey)
+        except (OSError, AuthenticationError) as e:
+            if not reconnect:
+                raise
+            logger.warning("Could not connect to coordinator %s:%s: %s", *address, e)
+            time.sleep(RECONNECT_DELAY)
+            continue
+
+        try:
+            conn.send(("hello", name))
+            kind, settings = conn.recv()
+        except (EOFError, OSError):
+            kind = None
+        if kind != "configure":
+            conn.close()
+            if not reconnect:
+                return
+            time.sleep(RECONNECT_DELAY)
+            continue
+
+        if engine == "asyncio":
+            scheduler = AsyncScheduler(max_concurrency=max_concurrency or DEFAULT_MAX_CONCURRENCY)
+        else:
+            scheduler = BackgroundScheduler()
+        suite = WorkerSuite.configured(conn, scheduler, settings)
+        suite.start()
+        logger.info("Worker %s connected to coordinator %s:%s", name, *address)
+        try:
+            while True:
+                kind, payload = conn.recv()
+                if kind == "stop":
+                    return
+                suite.apply(kind, payload)
+        except (EOFError, OSError):
+            logger.warning("Lost connection to coordinator")
+        finally:
+            suite.stop()
+            conn.close()
+        if not reconnect:
+            return
+        time.sleep(RECONNECT_DELAY)
+
+
+def run():
+    parser = argparse.ArgumentParser(
+        prog="WatchTower Worker",
+        description="Runs the checks a WatchTower coordinator assigns to it.",
+    )
+    parser.add_argument("--coordinator", required=True, help="Coordinator address, HOST:PORT")
+    parser.add_argument(
+        "--cluster-key",
+        default=os.environ.get("WATCHTOWER_CLUSTER_KEY"),
+        help="Shared secret of the cluster. Default: $WATCHTOWER_CLUSTER_KEY",
+    )
+    parser.add_argument("--name", help="Worker name. Default: <hostname>-<pid>")
+    parser.add_argument(
+        "-e",
+        "--engine",
+        choices=["thread", "asyncio"],
+        default="thread",
+        help="Check execution engine. Default: thread",
+    )
+    parser.add_argument("--max-concurrency", type=int, help="Max in-flight checks with the asyncio engine.")
+    args = parser.parse_args()
+    if not args.cluster_key:
+        parser.error("--cluster-key or WATCHTOWER_CLUSTER_KEY is required")
+
+    run_worker(
+        parse_address(args.coordinator),
+        args.cluster_key.encode("utf-8"),
+        name=args.name,
+        engine=args.engine,
+        max_concurrency=args.max_concurrency,
+    )
+
+
+if __name__ == "__main__":
+    run()
@@ -1,42 +1,371 @@
+import glob
 import json
+import os
+import re
+import threading
+from watchtower.dependencies import topological_order
+from watchtower.health import parse_failures
 from watchtower.logging_config import logger
-from watchtower.models import Config, Host
+from watchtower.models import CHECK_TYPES, DEFAULT_GROUP, DEFAULT_INTERVAL, Check, Config, Host
+from watchtower.resolver import RECORD_TYPES
+from watchtower.util import gc_paused
 
 DEFAULT_CONF_FILENAME = "watchtower.json"
+DEFAULT_WATCH_INTERVAL = 5
+# Errors listed in the exception message, the full list is on the exception
+MAX_REPORTED_ERRORS = 20
+
+CONFIG_KEYS = frozenset(("config_version", "hosts", "include", "templates"))
+HOST_KEYS = frozenset(("name", "group", "target", "checks", "depends_on", "template", "range"))
+TEMPLATE_KEYS = frozenset(("name", "group", "target", "checks", "depends_on"))
+CHECK_KEYS = frozenset(("type", "enabled", "display_name", "interval", "options"))
+PLACEHOLDER = re.compile(r"\{i(?::([^}]*))?\}")
+# Options a check type cannot run without
+REQUIRED_OPTIONS = {"tcp": ("port",), "port": ("port",)}
+# Options restricted to a set of values per check type, matched case-insensitively
+OPTION_CHOICES = {
+    "ping": {"method": ("auto", "icmp", "subprocess")},
+    "dns": {"record_type": RECORD_TYPES},
+    "http_status": {"method": ("GET", "HEAD")},
+    "browser": {"browser": ("chrome", "firefox")},
+}
+
 
 class InvalidWatchTowerConfigException(Exception):
-    pass
+    def __init__(self, errors: list):
+        self.errors = errors
+        shown = errors[:MAX_REPORTED_ERRORS]
+        more = f"\n  ... and {len(errors) - len(shown)} more" if len(errors) > len(shown) else ""
+        super().__init__(f"{len(errors)} config error(s):\n  " + "\n  ".join(shown) + more)
 
 
-class AppConfig:
-    def __init__(self, conf_file=DEFAULT_CONF_FILENAME):
-        json_conf = self.load_json_from_file(conf_file)
-        logger.debug("Loaded json config from file: %s", json_conf)
+def expand(value: str, i: int) -> str:
+    """Substitutes ``{i}`` (or ``{i:03}`` with a format spec) in a host template field"""
+    return PLACEHOLDER.sub(lambda m: format(i, m.group(1) or ""), value)
+
+
+class ConfigLoader:
+    """Builds a Config from a JSON config file, validating every entry in one pass.
+
+    Errors are collected rather than raised one at a time, each prefixed with
+    its file and JSON path (``hosts[12].checks[0].interval``). Besides plain
+    hosts, a config may ``include`` other files (glob patterns, relative to the
+    including file) and define ``templates``: a host entry naming a template
+    inherits its group and checks, and with ``range: [first, last]`` expands to
+    one host per number, ``{i}`` in its name and target replaced by the number.
+    Check entries are shared by every host expanded from the same template.
+    ``depends_on`` names the hosts a host is reached through, every name must
+    be defined somewhere in the config and the dependencies must not form a
+    cycle. Host names must then be unique, dependencies refer to hosts by name.
+    """
+
+    def __init__(self):
+        self.errors = []
+        self.templates = {}
+        self.hosts = []
+        self.config_version = None
+        self._loading = []
+        self._dependencies = []
+        self._host_wheres = []
+
+    def load(self, conf_file: str) -> Config:
+        with gc_paused():
+            path = os.path.abspath(conf_file)
+            self._load_file(path, root=True)
+            self._check_dependencies(os.path.relpath(path))
+        if self.errors:
+            raise InvalidWatchTowerConfigException(self.errors)
+        return Config(config_version=self.config_version, hosts=self.hosts)
+
+    def _error(self, where: str, message: str):
+        self.errors.append(f"{where}: {message}")
+
+    def _load_file(self, path: str, root: bool = False):
+        name = os.path.relpath(path)
+        if path in self._loading:
+            return self._error(name, "include cycle through " + " -> ".join(map(os.path.relpath, self._loading)))
+        try:
+            with open(path, "rb") as conf_file:
+                data = json.load(conf_file)
+        except OSError as e:
+            return self._error(name, e.strerror or str(e))
+        except json.JSONDecodeError as e:
+            return self._error(f"{name}:{e.lineno}:{e.colno}", e.msg)
+        if not isinstance(data, dict):
+            return self._error(name, "expected an object at the top level")
+        self._unknown_keys(name, data, CONFIG_KEYS)
+
+        self._loading.append(path)
+        try:
+            if "config_version" in data:
+                if not isinstance(data["config_version"], int) or isinstance(data["config_version"], bool):
+                    self._error(f"{name}: config_version", "must be an integer")
+                elif root:
+                    self.config_version = data["config_version"]
+            elif root:
+                self._error(name, "missing required key 'config_version'")
+            templates = data.get("templates", {})
+            if not isinstance(templates, dict):
+                self._error(f"{name}: templates", "must be an object")
+                templates = {}
+            for template_name, template in templates.items():
+                self._template(f"{name}: templates.{template_name}", template_name, template)
+            for i, pattern in enumerate(self._list(f"{name}: include", data.get("include", []))):
+                self._include(f"{name}: include[{i}]", path, pattern)
+            for i, host in enumerate(self._list(f"{name}: hosts", data.get("hosts", []))):
+                self._host(f"{name}: hosts[{i}]", host)
+        finally:
+            self._loading.pop()
+
+    def _include(self, where: str, including: str, pattern):
+        if not isinstance(pattern, str):
+            return self._error(where, "must be a file path or glob pattern")
+        pattern = os.path.join(os.path.dirname(including), pattern)
+        paths = sorted(glob.glob(pattern)) if glob.has_magic(pattern) else [pattern]
+        if not paths:
+            logger.warning("%s: '%s' matched no files", where, pattern)
+        for path in paths:
+            self._load_file(os.path.abspath(path))
+
+    def _list(self, where: str, value) -> list:
+        if isinstance(value, list):
+            return value
+        self._error(where, "must be a list")
+        return []
+
+    def _unknown_keys(self, where: str, entry: dict, allowed: frozenset):
+        if allowed.issuperset(entry):
+            return
+        for key in entry.keys() - allowed:
+            self._error(where, f"unknown key '{key}', expected one of {', '.join(sorted(allowed))}")
 
-        self._config = self.load_config(json_conf)
-        logger.debug("Loaded json into Config model: %s", self._config)
+    def _string(self, where: str, entry: dict, key: str, required: bool = True):
+        value = entry.get(key)
+        if value is None:
+            if required:
+                self._error(where, f"missing required key '{key}'")
+            return None
+        if not isinstance(value, str) or not value:
+            self._error(f"{where}.{key}", "must be a non-empty string")
+            return None
+        return value
 
+    def _template(self, where: str, name: str, template):
+        if not isinstance(template, dict):
+            return self._error(where, "must be an object")
+        self._unknown_keys(where, template, TEMPLATE_KEYS)
+        if name in self.templates:
+            self._error(where, f"template '{name}' is already defined")
+        self.templates[name] = {
+            "name": self._string(where, template, "name", required=False),
+            "group": self._string(where, template, "group", required=False),
+            "target": self._string(where, template, "target", required=False),
+            "checks": self._checks(where, template.get("checks", [])),
+            "depends_on": self._depends_on(where, template),
+        }
+
+    def _host(self, where: str, entry):
+        if not isinstance(entry, dict):
+            return self._error(where, "must be an object")
+        self._unknown_keys(where, entry, HOST_KEYS)
+        template = {}
+        if "template" in entry:
+            template = self.templates.get(entry["template"])
+            if template is None:
+                return self._error(f"{where}.template", f"unknown template '{entry['template']}'")
+        name = self._string(where, entry, "name", required=False) or template.get("name")
+        target = self._string(where, entry, "target", required=False) or template.get("target")
+        group = self._string(where, entry, "group", required=False) or template.get("group") or DEFAULT_GROUP
+        checks = template.get("checks", []) + self._checks(where, entry.get("checks", []))
+        depends_on = self._depends_on(where, entry) if "depends_on" in entry else template.get("depends_on", [])
+        for key, value in (("name", name), ("target", target)):
+            if value is None and key not in entry:
+                self._error(where, f"missing required key '{key}'")
+        if name is None or target is None:
+            return
+
+        if "range" not in entry:
+            return self._add_host(
+                where, Host(name=name, group=group, target=target, checks=checks, depends_on=depends_on)
+            )
+        bounds = entry["range"]
+        if not (
+            isinstance(bounds, list)
+            and len(bounds) == 2
+            and all(isinstance(bound, int) and not isinstance(bound, bool) for bound in bounds)
+            and bounds[0] <= bounds[1]
+        ):
+            return self._error(f"{where}.range", "must be [first, last] integers with first <= last")
+        if not PLACEHOLDER.search(name) and not PLACEHOLDER.search(target):
+            return self._error(where, "a host with a range needs {i} in its name or target")
+        for i in range(bounds[0], bounds[1] + 1):
+            self._add_host(
+                where,
+                Host(
+                    name=expand(name, i),
+                    group=expand(group, i),
+                    target=expand(target, i),
+                    checks=checks,
+                    depends_on=[expand(parent, i) for parent in depends_on],
+                ),
+            )
+
+    def _add_host(self, where: str, host: Host):
+        self.hosts.append(host)
+        self._host_wheres.append(where)
+        if host.depends_on:
+            self._dependencies.append((where, host))
+
+    def _depends_on(self, where: str, entry: dict) -> list:
+        """Reads ``depends_on``, a host name or a list of them"""
+        value = entry.get("depends_on", [])
+        names = [value] if isinstance(value, str) else value
+        if not isinstance(names, list) or not all(isinstance(name, str) and name for name in names):
+            self._error(f"{where}.depends_on", "must be a host name or a list of host names")
+            return []
+        return names
+
+    def _check_dependencies(self, name: str):
+        """Checks that host names are unique, every dependency names a host and they form a DAG"""
+        if not self._dependencies:
+            return
+        names = set()
+        for where, host in zip(self._host_wheres, self.hosts):
+            if host.name in names:
+                self._error(
+                    f"{where}.name",
+                    f"host '{host.name}' is already defined, names must be unique when depends_on is used",
+                )
+            names.add(host.name)
+        parents = {}
+        for where, host in self._dependencies:
+            for parent in host.depends_on:
+                if parent not in names:
+                    self._error(f"{where}.depends_on", f"unknown host '{parent}'")
+                elif parent == host.name:
+                    self._error(f"{where}.depends_on", f"host '{parent}' cannot depend on itself")
+                else:
+                    parents.setdefault(host.name, set()).add(parent)
+        try:
+            topological_order(parents)
+        except ValueError as e:
+            self._error(name, str(e))
+
+    def _checks(self, where: str, entries) -> list:
+        checks = []
+        for i, entry in enumerate(self._list(f"{where}.checks", entries)):
+            check = self._check(f"{where}.checks[{i}]", entry)
+            if check:
+                checks.append(check)
+        return checks
+
+    def _check(self, where: str, entry):
+        if not isinstance(entry, dict):
+            return self._error(where, "must be an object")
+        errors = len(self.errors)
+        self._unknown_keys(where, entry, CHECK_KEYS)
+        check_type = entry.get("type")
+        if check_type is None:
+            self._error(where, "missing required key 'type'")
+        elif check_type not in CHECK_TYPES:
+            self._error(
+                f"{where}.type", f"unknown check type '{check_type}', expected one of {', '.join(sorted(CHECK_TYPES))}"
+            )
+        enabled = entry.get("enabled", True)
+        if not isinstance(enabled, bool):
+            self._error(f"{where}.enabled", "must be true or false")
+        display_name = self._string(where, entry, "display_name", required=False) or check_type
+        interval = entry.get("interval", DEFAULT_INTERVAL)
+        if isinstance(interval, bool) or not isinstance(interval, (int, float)) or interval <= 0:
+            self._error(f"{where}.interval", "must be a positive number of seconds")
+        options = entry.get("options", {})
+        if not isinstance(options, dict):
+            self._error(f"{where}.options", "must be an object")
+        elif check_type in CHECK_TYPES:
+            self._options(f"{where}.options", check_type, options)
+        if len(self.errors) > errors:
+            return None
+        return Check(type=check_type, enabled=enabled, display_name=display_name, interval=interval, options=options)
+
+    def _options(self, where: str, check_type: str, options: dict):
+        """Validates the options a check type reads, so a bad one fails the load rather than every run"""
+        for key in REQUIRED_OPTIONS.get(check_type, ()):
+            if key not in options:
+                self._error(where, f"missing required option '{key}' for {check_type} checks")
+        for key, choices in OPTION_CHOICES.get(check_type, {}).items():
+            value = options.get(key)
+            if value is not None and (not isinstance(value, str) or value.upper() not in map(str.upper, choices)):
+                self._error(f"{where}.{key}", f"must be one of {', '.join(choices)}")
+        port = options.get("port")
+        if port is not None and (isinstance(port, bool) or not isinstance(port, int) or not 1 <= port <= 65535):
+            self._error(f"{where}.port", "must be a port number between 1 and 65535")
+        timeout = options.get("timeout")
+        if timeout is not None and (isinstance(timeout, bool) or not isinstance(timeout, (int, float)) or timeout <= 0):
+            self._error(f"{where}.timeout", "must be a positive number of seconds")
+        codes = options.get("expected_status_codes")
+        if codes is not None and (not isinstance(codes, list) or not all(isinstance(code, int) for code in codes)):
+            self._error(f"{where}.expected_status_codes", "must be a list of status codes")
+        nameservers = options.get("nameservers")
+        if nameservers is not None and (
+            not isinstance(nameservers, list) or not all(isinstance(address, str) for address in nameservers)
+        ):
+            self._error(f"{where}.nameservers", "must be a list of addresses")
+        if "failures" in options:
+            try:
+                parse_failures(options["failures"])
+            except ValueError as e:
+                self._error(f"{where}.failures", str(e))
+
+
+class AppConfig:
+    def __init__(self, conf_file=DEFAULT_CONF_FILENAME):
+        self._config = self.load_config(conf_file)
+        logger.debug(
+            "Loaded config '%s': %s hosts, %s checks",
+            conf_file,
+            len(self._config.hosts),
+            sum(len(host.checks) for host in self._config.hosts),
+        )
 
     @property
     def config(self):
-        return self._config    
-    
-    def load_json_from_file(self, filename: str) -> None:
-        with open(filename, "r") as conf_file:
-            return json.load(conf_file)
-            
+        return self._config
+
+    def load_config(self, conf_file: str) -> Config:
+        return ConfigLoader().load(conf_file)
+
 
-    def load_config(self, json_config: dict):
-        return Config.from_dict(json_config)
-    
-    # def validate_config(self, conf: dict) -> bool:  
-        
+class ConfigWatcher:
+    """Polls a config file and calls ``on_change`` when its modification time or size changes"""
 
-    # def validate_test(self, test: dict):
+    def __init__(self, conf_file: str, on_change, interval: float = DEFAULT_WATCH_INTERVAL):
+        self.conf_file = conf_file
+        self.on_change = on_change
+        self.interval = interval
+        self._stopped = threading.Event()
+        self._signature = self._stat()
 
+    def _stat(self):
+        try:
+            stat = os.stat(self.conf_file)
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
 
+    def start(self):
+        threading.Thread(target=self._watch, name="watchtower-config-watch", daemon=True).start()
 
-    
+    def stop(self):
+        self._stopped.set()
 
-            
-        
+    def _watch(self):
+        while not self._stopped.wait(self.interval):
+            signature = self._stat()
+            if signature is None or signature == self._signature:
+                continue
+            self._signature = signature
+            logger.info("Config file '%s' changed", self.conf_file)
+            try:
+                self.on_change()
+            except Exception:
+                logger.exception("Reloading config after a change to '%s' failed", self.conf_file)
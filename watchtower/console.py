@@ -53,9 +53,9 @@ class WatchTowerClient(App):
         # yield Footer()
 
     def on_mount(self) -> None:
+        self.client = Client(self.api_url)
         self.fetch_scoreboard()
         self.update_time()
-        self.client = Client(self.api_url)
         self.title = "WATCHTOWER TERMINAL"
 
     async def populate_detail_tree(self, results):
@@ -98,6 +98,13 @@ class WatchTowerClient(App):
 
         status += "]"
         tree.add(f"{status}")
+        if results.totals:
+            totals = results.totals
+            tree.add(
+                f"[green]{totals['passing']} passing[/green]  "
+                f"[red]{totals['failing']} failing[/red]  "
+                f"[gray]{totals['pending']} pending[/gray]"
+            )
         return tree
 
     async def populate_table(self, results):
@@ -108,6 +115,7 @@ class WatchTowerClient(App):
             "Last Run",
             "Status",
             "Interval",
+            "Latency",
             "Details",
             title="System Status",
         )
@@ -119,6 +127,10 @@ class WatchTowerClient(App):
                     status = f"[bold red][FAIL][/bold red]"
                 else:
                     status = f"[bold gray][PENDING][/bold gray]"
+                if check.flapping:
+                    status += " [bold yellow][FLAPPING][/bold yellow]"
+                if check.suppressed:
+                    status += " [bold gray][SUPPRESSED][/bold gray]"
                 table.add_row(
                     group.name,
                     check.name,
@@ -126,6 +138,7 @@ class WatchTowerClient(App):
                     check.last_run_time,
                     str(status),
                     str(check.interval),
+                    f"{check.last_run_duration:.0f} ms" if check.last_run_duration is not None else "",
                     check.extended_results,
                 )
         return table
@@ -135,12 +148,35 @@ class WatchTowerClient(App):
             self.query_one("#log", Static).update, f"[bold red]{msg}[/bold red]"
         )
 
+    async def render_scoreboard(self, results) -> None:
+        # POPULATE TREE DETAIL VIEW
+        tree = await self.populate_detail_tree(results)
+
+        # POPULATE TREE SUMMARY VIEW
+        tree2 = await self.populate_summary_tree(results)
+
+        # POPULATE TABLE VIEW
+        table = await self.populate_table(results)
+
+        self.call_from_thread(self.query_one("#table", Status).update, table)
+        self.call_from_thread(self.query_one("#tree", Status).update, tree)
+        self.call_from_thread(self.query_one("#tree2", Status).update, tree2)
+
     @work(exclusive=False, thread=True)
     async def fetch_scoreboard(self) -> None:
-        """Fetch data from REST api."""
+        """Subscribe to the server's result stream, fall back to polling the REST api."""
+        rendered_version = None
         while True:
             try:
-                results = self.client.fetch_scoreboard()
+                for results in self.client.stream_changes():
+                    self.connected = True
+                    rendered_version = (self.client.epoch, self.client.version)
+                    await self.render_scoreboard(results)
+            except Exception as e:
+                logger.debug("Result stream unavailable, polling instead: %s", e)
+
+            try:
+                results = self.client.fetch_changes()
                 self.connected = True
             except Exception as e:
                 self.error(f"Failed to connect to server '{e}'")
@@ -148,18 +184,10 @@ class WatchTowerClient(App):
 
                 time.sleep(5)
                 continue
-            # POPULATE TREE DETAIL VIEW
-            tree = await self.populate_detail_tree(results)
-
-            # POPULATE TREE SUMMARY VIEW
-            tree2 = await self.populate_summary_tree(results)
-
-            # POPULATE TABLE VIEW
-            table = await self.populate_table(results)
 
-            self.call_from_thread(self.query_one("#table", Status).update, table)
-            self.call_from_thread(self.query_one("#tree", Status).update, tree)
-            self.call_from_thread(self.query_one("#tree2", Status).update, tree2)
+            if (self.client.epoch, self.client.version) != rendered_version:
+                rendered_version = (self.client.epoch, self.client.version)
+                await self.render_scoreboard(results)
 
             time.sleep(5)
 
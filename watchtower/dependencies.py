@@ -0,0 +1,148 @@
+import threading
+from collections import defaultdict
+
+from watchtower.logging_config import logger
+
+
+def topological_order(parents: dict) -> list:
+    """Orders host names so every host comes after the hosts it depends on.
+
+    ``parents`` maps a host name to the names it depends on. Raises ValueError
+    naming a cycle when the dependencies are not a DAG.
+    """
+    order = []
+    visited = {}
+    for root in parents:
+        if root in visited:
+            continue
+        # Iterative DFS towards the parents, long chains must not hit the recursion limit
+        visited[root] = False
+        stack = [(root, iter(parents[root]))]
+        while stack:
+            name, remaining = stack[-1]
+            for parent in remaining:
+                done = visited.get(parent)
+                if done is None:
+                    visited[parent] = False
+                    stack.append((parent, iter(parents.get(parent, ()))))
+                    break
+                if not done:
+                    path = [entry[0] for entry in stack]
+                    cycle = path[path.index(parent):] + [parent]
+                    raise ValueError("dependency cycle " + " -> ".join(cycle))
+            else:
+                stack.pop()
+                visited[name] = True
+                order.append(name)
+    return order
+
+
+class DependencyGraph:
+    """Host dependencies ("web01 depends on gw01") evaluated as a DAG.
+
+    A host is down when it has confirmed check states and all of them are
+    failing. A host is unreachable while a host it depends on, directly or
+    through others, is down or unreachable; its checks are suppressed rather
+    than run. Only a change to a parent host's down state walks the graph, so
+    recording a result is a couple of dict lookups.
+    """
+
+    def __init__(self):
+        self.parents = {}
+        self.order = []
+        self.depth = {}
+        self.down = set()
+        self.unreachable = set()
+        self._dependents = frozenset()
+        self._host_of = {}
+        self._tests = defaultdict(set)
+        self._states = {}
+        # host name -> [passing, failing] confirmed checks
+        self._counts = defaultdict(lambda: [0, 0])
+        self._lock = threading.Lock()
+
+    def configure(self, hosts) -> list:
+        """Replaces the dependencies with those of ``hosts``, returns the hosts whose reachability changed"""
+        parents = {}
+        for host in hosts:
+            if host.depends_on:
+                parents.setdefault(host.name, set()).update(host.depends_on)
+        order = topological_order(parents)
+        depth = {}
+        for name in order:
+            depth[name] = 1 + max((depth[parent] for parent in parents.get(name, ())), default=-1)
+        with self._lock:
+            self.parents, self.order, self.depth = parents, order, depth
+            self._dependents = frozenset(parent for names in parents.values() for parent in names)
+            return self._propagate()
+
+    def suppressed(self, host_name: str) -> bool:
+        return host_name in self.unreachable
+
+    def tests_of(self, host_name: str) -> list:
+        with self._lock:
+            return list(self._tests.get(host_name, ()))
+
+    def track(self, test_id: str, host_name: str, state) -> list:
+        """Adds a check of ``host_name`` with its confirmed state, returns the hosts whose reachability changed"""
+        with self._lock:
+            self._host_of[test_id] = host_name
+            self._tests[host_name].add(test_id)
+            return self._set(test_id, state)
+
+    def untrack(self, test_id: str) -> list:
+        with self._lock:
+            if test_id not in self._host_of:
+                return []
+            changed = self._set(test_id, None)
+            host_name = self._host_of.pop(test_id)
+            self._tests[host_name].discard(test_id)
+            if not self._tests[host_name]:
+                del self._tests[host_name]
+                self._counts.pop(host_name, None)
+            return changed
+
+    def record(self, test_id: str, state) -> list:
+        """Records a check's new confirmed state, returns the hosts whose reachability changed"""
+        with self._lock:
+            if test_id not in self._host_of:
+                return []
+            return self._set(test_id, state)
+
+    def _set(self, test_id: str, state) -> list:
+        host_name = self._host_of[test_id]
+        counts = self._counts[host_name]
+        previous = self._states.pop(test_id, None)
+        if previous is not None:
+            counts[previous is False] -= 1
+        if state is not None:
+            counts[state is False] += 1
+            self._states[test_id] = state
+        down = counts[1] > 0 and counts[0] == 0
+        if down == (host_name in self.down):
+            return []
+        if down:
+            self.down.add(host_name)
+        else:
+            self.down.discard(host_name)
+        if host_name not in self._dependents:
+            return []
+        logger.info("Host %s is %s", host_name, "down" if down else "up again")
+        return self._propagate()
+
+    def _propagate(self) -> list:
+        """Recomputes the unreachable hosts, returns the ones that changed in topological order"""
+        unreachable = set()
+        for name in self.order:
+            if any(parent in self.down or parent in unreachable for parent in self.parents.get(name, ())):
+                unreachable.add(name)
+        changed = [name for name in self.order if (name in unreachable) != (name in self.unreachable)]
+        self.unreachable = unreachable
+        return changed
+
+    def status(self) -> dict:
+        with self._lock:
+            return {
+                "down": sorted(self.down & self._dependents),
+                "unreachable": sorted(self.unreachable),
+            }
@@ -0,0 +1,142 @@
+import asyncio
+import threading
+from datetime import datetime, timedelta, timezone
+from uuid import uuid4
+
+from watchtower.logging_config import logger
+
+DEFAULT_MAX_CONCURRENCY = 1000
+
+
+class AsyncJob:
+    def __init__(self, func, trigger, args=(), job_id=None):
+        self.id = job_id or uuid4().hex
+        self.func = func
+        self.trigger = trigger
+        self.args = args
+        self.next_run_time = None
+        self._task = None
+
+
+class AsyncScheduler:
+    """Runs jobs as tasks on a single asyncio event loop in a background thread.
+
+    Drop-in alternative to APScheduler's BackgroundScheduler for the subset of its
+    API used by TestSuite. Coroutine functions are awaited directly, plain functions
+    are handed to the loop's default executor. At most ``max_concurrency`` jobs are
+    in flight at any time, the rest wait their turn on a semaphore.
+    """
+
+    def __init__(self, max_concurrency: int = DEFAULT_MAX_CONCURRENCY):
+        self.max_concurrency = max_concurrency
+        self.missed_runs = 0
+        self.queued = 0
+        self._jobs = {}
+        self._loop = None
+        self._thread = None
+        self._semaphore = None
+
+    @property
+    def running(self):
+        return self._loop is not None and self._loop.is_running()
+
+    @property
+    def in_flight(self):
+        if not self._semaphore:
+            return 0
+        return self.max_concurrency - self._semaphore._value
+
+    def start(self):
+        self._loop = asyncio.new_event_loop()
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        self._thread = threading.Thread(
+            target=self._loop.run_forever, name="watchtower-async-engine", daemon=True
+        )
+        self._thread.start()
+        self._loop.call_soon_threadsafe(self._spawn_all, list(self._jobs.values()))
+        logger.info(
+            "Async engine started with %s jobs, max concurrency %s",
+            len(self._jobs),
+            self.max_concurrency,
+        )
+
+    def shutdown(self, wait=True):
+        if not self.running:
+            return
+        future = asyncio.run_coroutine_threadsafe(self._cancel_all(), self._loop)
+        if wait:
+            future.result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        if wait:
+            self._thread.join()
+        self._loop = None
+
+    def add_job(self, func, trigger, args=(), id=None):
+        job = AsyncJob(func, trigger, args=args, job_id=id)
+        self._jobs[job.id] = job
+        if self.running:
+            self._loop.call_soon_threadsafe(self._spawn, job)
+        return job
+
+    def remove_job(self, job_id):
+        job = self._jobs.pop(job_id)
+        if job._task and self.running:
+            self._loop.call_soon_threadsafe(job._task.cancel)
+
+    def get_jobs(self):
+        return list(self._jobs.values())
+
+    def _spawn(self, job):
+        job._task = self._loop.create_task(self._job_loop(job))
+
+    def _spawn_all(self, jobs):
+        for job in jobs:
+            self._spawn(job)
+
+    async def _cancel_all(self):
+        tasks = [job._task for job in self._jobs.values() if job._task]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def _job_loop(self, job):
+        previous_fire_time = None
+        while True:
+            # DateTrigger has no timezone of its own, its run date is timezone aware
+            now = datetime.now(getattr(job.trigger, "timezone", timezone.utc))
+            next_fire_time = job.trigger.get_next_fire_time(previous_fire_time, now)
+            if next_fire_time is None:
+                # One-off job done
+                if self._jobs.get(job.id) is job:
+                    del self._jobs[job.id]
+                break
+            if next_fire_time < now - timedelta(seconds=1):
+                # The previous run overran its interval, skip to the next slot
+                self.missed_runs += 1
+                logger.warning("Job %s missed its run time, skipping ahead", job.id)
+                next_fire_time = job.trigger.get_next_fire_time(None, now)
+            job.next_run_time = next_fire_time
+
+            await asyncio.sleep(max((next_fire_time - now).total_seconds(), 0))
+            previous_fire_time = next_fire_time
+
+            self.queued += 1
+            try:
+                await self._semaphore.acquire()
+            finally:
+                self.queued -= 1
+            try:
+                await self._execute(job)
+            finally:
+                self._semaphore.release()
+
+    async def _execute(self, job):
+        try:
+            if asyncio.iscoroutinefunction(job.func):
+                await job.func(*job.args)
+            else:
+                await self._loop.run_in_executor(None, job.func, *job.args)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.exception("Job %s raised an exception", job.id)
@@ -1,6 +1,10 @@
-
+import socket
 
 
 class CheckNotFoundError(Exception):
     def __init__(self, msg):
-        super().__init__(msg)
\ No newline at end of file
+        super().__init__(msg)
+
+
+class ResolutionError(socket.gaierror):
+    """A name did not resolve. Subclasses gaierror so callers of the system resolver keep working"""
@@ -0,0 +1,136 @@
+import asyncio
+import multiprocessing
+import os
+import threading
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from watchtower.checks import SchedulableCheck
+from watchtower.logging_config import logger
+
+EXECUTOR_MODES = ("inline", "thread", "process")
+DEFAULT_THREAD_WORKERS = 32
+
+# Everything a worker process needs to rebuild and run a check, classes pickle by reference
+CheckDescriptor = namedtuple(
+    "CheckDescriptor", ("check_class", "test_id", "target", "interval", "options", "address")
+)
+
+
+def describe(check: SchedulableCheck) -> CheckDescriptor:
+    return CheckDescriptor(
+        type(check), check.test_id, check.target, check.interval, check.options, check._resolved_address
+    )
+
+
+def build_check(descriptor: CheckDescriptor) -> SchedulableCheck:
+    check = descriptor.check_class(
+        target=descriptor.target, interval=descriptor.interval, options=descriptor.options
+    )
+    check.test_id = descriptor.test_id
+    check._resolved_address = descriptor.address
+    return check
+
+
+def outcome_fields(check: SchedulableCheck) -> dict:
+    return {field: getattr(check, field) for field in check.outcome_fields}
+
+
+def run_descriptor(descriptor: CheckDescriptor):
+    """Runs a described check in a worker process, returns (result, outcome fields)"""
+    check = build_check(descriptor)
+    result = check.run()
+    return result, outcome_fields(check)
+
+
+def apply_outcome(check: SchedulableCheck, outcome):
+    result, fields = outcome
+    for field, value in fields.items():
+        setattr(check, field, value)
+    return result
+
+
+class CheckExecutors:
+    """Decides where each check runs, per check class or per check ``executor`` option.
+
+    "inline" runs the check in the scheduler's own thread (or on the asyncio
+    loop), "thread" hands ``run()`` to a shared thread pool and "process" ships
+    a CheckDescriptor to a pool of warm worker processes and copies the outcome
+    fields back onto the check, keeping CPU-heavy checks off the API's GIL.
+    Checks that are not ``process_safe`` run on the thread pool instead.
+    """
+
+    def __init__(self, modes: dict = None, thread_workers: int = DEFAULT_THREAD_WORKERS, process_workers: int = None):
+        self.modes = modes or {}
+        self.thread_workers = thread_workers
+        self.process_workers = process_workers or os.cpu_count() or 1
+        self._thread_pool = None
+        self._process_pool = None
+        self._lock = threading.Lock()
+
+    def mode(self, check: SchedulableCheck) -> str:
+        mode = check.options.get("executor") or self.modes.get(type(check), "inline")
+        if mode == "process" and not check.process_safe:
+            return "thread"
+        return mode
+
+    def _threads(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._thread_pool is None:
+                self._thread_pool = ThreadPoolExecutor(self.thread_workers, thread_name_prefix="watchtower-check")
+            return self._thread_pool
+
+    def _processes(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._process_pool is None:
+                self._process_pool = ProcessPoolExecutor(
+                    self.process_workers, mp_context=multiprocessing.get_context("spawn")
+                )
+                # Start every worker now rather than on demand during a burst of checks
+                for _ in range(self.process_workers):
+                    self._process_pool.submit(os.getpid)
+                logger.info("Started check process pool with %s workers", self.process_workers)
+            return self._process_pool
+
+    def _process_failed(self, check: SchedulableCheck, pool: ProcessPoolExecutor):
+        with self._lock:
+            if self._process_pool is pool:
+                self._process_pool = None
+        pool.shutdown(wait=False, cancel_futures=True)
+        logger.error("Check process pool broke while running %s on %s, restarting it", check.name, check.target)
+        check.extended_results = "Check worker process exited unexpectedly"
+        return False
+
+    def run(self, check: SchedulableCheck):
+        mode = self.mode(check)
+        if mode == "thread":
+            return self._threads().submit(check.run).result()
+        if mode == "process":
+            pool = self._processes()
+            try:
+                return apply_outcome(check, pool.submit(run_descriptor, describe(check)).result())
+            except BrokenProcessPool:
+                return self._process_failed(check, pool)
+        return check.run()
+
+    async def run_async(self, check: SchedulableCheck):
+        mode = self.mode(check)
+        if mode == "thread":
+            return await asyncio.wrap_future(self._threads().submit(check.run))
+        if mode == "process":
+            pool = self._processes()
+            try:
+                outcome = await asyncio.wrap_future(pool.submit(run_descriptor, describe(check)))
+            except BrokenProcessPool:
+                return self._process_failed(check, pool)
+            return apply_outcome(check, outcome)
+        return await check.async_run()
+
+    def shutdown(self):
+        with self._lock:
+            pools = (self._thread_pool, self._process_pool)
+            self._thread_pool = self._process_pool = None
+        for pool in pools:
+            if pool:
+                pool.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,130 @@
+DEFAULT_FAILURES = 1
+DEFAULT_WINDOW = 1
+DEFAULT_RECOVERIES = 1
+DEFAULT_FLAP_WINDOW = 21
+# A check starts flapping when this share of consecutive results differ, and stops below the low mark
+FLAP_HIGH = 0.5
+FLAP_LOW = 0.25
+HISTORY_BITS = 64
+HISTORY_MASK = (1 << HISTORY_BITS) - 1
+
+
+def parse_failures(value) -> tuple:
+    """Parses a failure threshold, "N/M" (N failures in the last M results) or N (N in a row)"""
+    if isinstance(value, int) and not isinstance(value, bool):
+        failures, window = value, value
+    else:
+        failures, _, window = str(value).partition("/")
+        failures, window = int(failures), int(window or failures)
+    if not 1 <= failures <= window <= HISTORY_BITS:
+        raise ValueError(f"invalid failure threshold '{value}', expected N/M with 1 <= N <= M <= {HISTORY_BITS}")
+    return failures, window
+
+
+class HealthPolicy:
+    """Thresholds for confirming a check's state from its raw results.
+
+    A check goes down after ``failures`` failed results among the last
+    ``window``, and back up after ``recoveries`` passing results in a row.
+    With a ``flap_window`` it is flapping while too many of its last results
+    alternate, and its confirmed state is held until it settles.
+    """
+
+    __slots__ = ("failures", "window", "recoveries", "flap_window")
+
+    def __init__(
+        self,
+        failures: int = DEFAULT_FAILURES,
+        window: int = DEFAULT_WINDOW,
+        recoveries: int = DEFAULT_RECOVERIES,
+        flap_window: int = DEFAULT_FLAP_WINDOW,
+    ):
+        if not 1 <= recoveries <= HISTORY_BITS or not 0 <= flap_window <= HISTORY_BITS:
+            raise ValueError(f"recoveries and flap_window must be at most {HISTORY_BITS}")
+        self.failures = failures
+        self.window = window
+        self.recoveries = recoveries
+        self.flap_window = flap_window
+
+    def with_options(self, options: dict) -> "HealthPolicy":
+        """Returns the policy with a check's ``failures``, ``recoveries`` and ``flap_window`` options applied"""
+        if not ("failures" in options or "recoveries" in options or "flap_window" in options):
+            return self
+        failures, window = (
+            parse_failures(options["failures"]) if "failures" in options else (self.failures, self.window)
+        )
+        return HealthPolicy(
+            failures,
+            window,
+            int(options.get("recoveries", self.recoveries)),
+            int(options.get("flap_window", self.flap_window)),
+        )
+
+
+class HealthState:
+    """Confirmed state of one check, fed every raw result.
+
+    The last 64 results are kept as bits of a single int (1 for a failure),
+    so threshold and flapping checks are a mask and a popcount.
+    """
+
+    __slots__ = ("policy", "state", "flapping", "history", "observed", "successes")
+
+    def __init__(self, policy: HealthPolicy = None):
+        self.policy = policy or HealthPolicy()
+        self.state = None
+        self.flapping = False
+        self.history = 0
+        self.observed = 0
+        self.successes = 0
+
+    def failures(self, window: int) -> int:
+        return (self.history & ((1 << window) - 1)).bit_count()
+
+    def flap_ratio(self) -> float:
+        """Share of the last flap_window results that differ from the one before them"""
+        window = self.policy.flap_window
+        if window < 2 or self.observed < window:
+            return 0.0
+        changes = ((self.history ^ (self.history >> 1)) & ((1 << (window - 1)) - 1)).bit_count()
+        return changes / (window - 1)
+
+    def observe(self, result) -> bool:
+        """Records a raw result, returns True when the confirmed state or flapping changed"""
+        if result is not True and result is not False:
+            return False
+        policy = self.policy
+        self.history = ((self.history << 1) | (not result)) & HISTORY_MASK
+        self.observed += 1
+        self.successes = self.successes + 1 if result else 0
+
+        flapping = self.flapping
+        ratio = self.flap_ratio()
+        if ratio >= FLAP_HIGH:
+            flapping = True
+        elif ratio < FLAP_LOW:
+            flapping = False
+
+        state = self.state
+        if not flapping:
+            # Only a failure can confirm one, older failures still in the window must not undo a recovery
+            if not result and state is not False and self.failures(policy.window) >= policy.failures:
+                state = False
+            elif state is None and result:
+                state = True
+            elif state is False and self.successes >= policy.recoveries:
+                state = True
+        changed = state is not self.state or flapping != self.flapping
+        self.state, self.flapping = state, flapping
+        return changed
+
+    def copy_from(self, other: "HealthState"):
+        """Takes over another check's history, keeping this state's policy"""
+        self.state = other.state
+        self.flapping = other.flapping
+        self.history = other.history
+        self.observed = other.observed
+        self.successes = other.successes
+
+    def to_dict(self) -> dict:
+        return {"state": self.state, "flapping": self.flapping}
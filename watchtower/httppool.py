@@ -0,0 +1,93 @@
+import asyncio
+import importlib.util
+import threading
+import weakref
+
+import httpx
+
+from watchtower.logging_config import logger
+
+MAX_CONNECTIONS = 200
+MAX_KEEPALIVE_CONNECTIONS = 100
+# Longer than the usual check interval, so the next run finds its connection warm
+KEEPALIVE_EXPIRY = 90
+
+HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+
+_clients = {}
+_async_clients = weakref.WeakKeyDictionary()
+_lock = threading.Lock()
+_http2_warned = False
+
+
+def _client_args(http2: bool, verify: bool) -> dict:
+    global _http2_warned
+    if http2 and not HTTP2_AVAILABLE:
+        if not _http2_warned:
+            _http2_warned = True
+            logger.warning("HTTP/2 requested but the 'h2' package is not installed, using HTTP/1.1")
+        http2 = False
+    return {
+        "http2": http2,
+        "verify": verify,
+        "limits": httpx.Limits(
+            max_connections=MAX_CONNECTIONS,
+            max_keepalive_connections=MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=KEEPALIVE_EXPIRY,
+        ),
+    }
+
+
+def get_client(http2: bool = False, verify: bool = True) -> httpx.Client:
+    """Returns the shared keep-alive client for the given protocol and TLS settings"""
+    key = (http2, verify)
+    with _lock:
+        client = _clients.get(key)
+        if client is None:
+            client = _clients[key] = httpx.Client(**_client_args(http2, verify))
+        return client
+
+
+def get_async_client(http2: bool = False, verify: bool = True) -> httpx.AsyncClient:
+    """Like get_client, one pool per event loop since connections are bound to their loop"""
+    loop = asyncio.get_running_loop()
+    key = (http2, verify)
+    with _lock:
+        clients = _async_clients.setdefault(loop, {})
+        client = clients.get(key)
+        if client is None:
+            client = clients[key] = httpx.AsyncClient(**_client_args(http2, verify))
+        return client
+
+
+def close():
+    """Closes the shared sync clients, async clients go away with their loop"""
+    with _lock:
+        for client in _clients.values():
+            client.close()
+        _clients.clear()
+
+
+class BodyScanner:
+    """Looks for expected byte strings in a streamed body, reading at most ``limit`` bytes"""
+
+    def __init__(self, expected, limit: int):
+        self.missing = list(expected)
+        self.limit = limit
+        self.read = 0
+        self.truncated = False
+        self._tail = b""
+
+    def feed(self, chunk: bytes) -> bool:
+        """Scans the next chunk, returns True once the cap is reached and reading should stop"""
+        if self.read + len(chunk) > self.limit:
+            chunk = chunk[: self.limit - self.read]
+            self.truncated = True
+        self.read += len(chunk)
+        if self.missing:
+            # Keep enough of the previous chunk to match strings that span two chunks
+            window = self._tail + chunk
+            self.missing = [expected for expected in self.missing if expected not in window]
+            keep = max((len(expected) for expected in self.missing), default=1) - 1
+            self._tail = window[-keep:] if keep else b""
+        return self.truncated
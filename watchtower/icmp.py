@@ -0,0 +1,251 @@
+import asyncio
+import math
+import os
+import select
+import socket
+import struct
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import List, Optional
+
+from watchtower.logging_config import logger
+
+ICMP_ECHO_REQUEST = 8
+ICMP_ECHO_REPLY = 0
+PAYLOAD_SIZE = 56
+
+
+def checksum(data: bytes) -> int:
+    if len(data) % 2:
+        data += b"\x00"
+    total = sum(struct.unpack(f"!{len(data) // 2}H", data))
+    total = (total >> 16) + (total & 0xFFFF)
+    total += total >> 16
+    return ~total & 0xFFFF
+
+
+def build_echo_request(identifier: int, sequence: int) -> bytes:
+    payload = struct.pack("!d", time.time()).ljust(PAYLOAD_SIZE, b"\x00")
+    header = struct.pack("!BBHHH", ICMP_ECHO_REQUEST, 0, 0, identifier, sequence)
+    header = struct.pack(
+        "!BBHHH", ICMP_ECHO_REQUEST, 0, checksum(header + payload), identifier, sequence
+    )
+    return header + payload
+
+
+@dataclass
+class PingResult:
+    target: str
+    address: str
+    transmitted: int = 0
+    received: int = 0
+    rtts: List[float] = field(default_factory=list)
+
+    @property
+    def packet_loss(self) -> float:
+        if not self.transmitted:
+            return 100.0
+        return (self.transmitted - self.received) / self.transmitted * 100
+
+    @property
+    def rtt_min(self) -> Optional[float]:
+        return min(self.rtts) if self.rtts else None
+
+    @property
+    def rtt_max(self) -> Optional[float]:
+        return max(self.rtts) if self.rtts else None
+
+    @property
+    def rtt_avg(self) -> Optional[float]:
+        return sum(self.rtts) / len(self.rtts) if self.rtts else None
+
+    @property
+    def rtt_stddev(self) -> Optional[float]:
+        if not self.rtts:
+            return None
+        avg = self.rtt_avg
+        return math.sqrt(sum((rtt - avg) ** 2 for rtt in self.rtts) / len(self.rtts))
+
+    def to_dict(self):
+        return {
+            "address": self.address,
+            "transmitted": self.transmitted,
+            "received": self.received,
+            "packet_loss": round(self.packet_loss, 1),
+            "rtt_min": self.rtt_min,
+            "rtt_avg": self.rtt_avg,
+            "rtt_max": self.rtt_max,
+            "rtt_stddev": self.rtt_stddev,
+        }
+
+
+class _PingSession:
+    def __init__(self, target, address, count):
+        self.result = PingResult(target=target, address=address)
+        self.count = count
+        self.done = threading.Event()
+        self._loop = None
+        self._future = None
+
+    def add_reply(self, rtt_ms):
+        self.result.received += 1
+        self.result.rtts.append(rtt_ms)
+        if self.result.received >= self.count:
+            self.finish()
+
+    def finish(self):
+        self.done.set()
+        if self._future is not None:
+            self._loop.call_soon_threadsafe(self._set_future)
+
+    def _set_future(self):
+        if not self._future.done():
+            self._future.set_result(self.result)
+
+
+class IcmpProber:
+    """Sends ICMP echo requests for any number of targets over one shared socket.
+
+    Prefers an unprivileged ICMP datagram socket and falls back to a raw socket.
+    Replies are read by a single receiver thread and matched to their request by
+    identifier and sequence number. IPv4 only.
+    """
+
+    def __init__(self):
+        self._sock, self._raw = self._open_socket()
+        self._identifier = self._sock_identifier()
+        self._sequence = 0
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._receiver = threading.Thread(
+            target=self._receive_loop, name="watchtower-icmp-receiver", daemon=True
+        )
+        self._receiver.start()
+
+    @staticmethod
+    def _open_socket():
+        try:
+            sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_ICMP)
+            return sock, False
+        except OSError:
+            sock = socket.socket(socket.AF_INET, socket.SOCK_RAW, socket.IPPROTO_ICMP)
+            return sock, True
+
+    def _sock_identifier(self):
+        if self._raw:
+            return os.getpid() & 0xFFFF
+        # The kernel rewrites the identifier of datagram ICMP sockets to the local port
+        self._sock.bind(("", 0))
+        return self._sock.getsockname()[1]
+
+    def _next_sequence(self):
+        with self._lock:
+            self._sequence = (self._sequence + 1) & 0xFFFF
+            return self._sequence
+
+    def _send(self, session):
+        sequence = self._next_sequence()
+        with self._lock:
+            self._pending[(self._identifier, sequence)] = (session, time.perf_counter())
+        session.result.transmitted += 1
+        try:
+            self._sock.sendto(
+                build_echo_request(self._identifier, sequence), (session.result.address, 0)
+            )
+        except OSError as e:
+            logger.debug("ICMP send to %s failed: %s", session.result.address, e)
+            session.result.transmitted -= 1
+            with self._lock:
+                self._pending.pop((self._identifier, sequence), None)
+        return sequence
+
+    def _receive_loop(self):
+        while True:
+            readable, _, _ = select.select([self._sock], [], [], 1)
+            if not readable:
+                continue
+            try:
+                packet, (address, _) = self._sock.recvfrom(1024)
+            except OSError:
+                continue
+            received_at = time.perf_counter()
+            if self._raw:
+                packet = packet[(packet[0] & 0x0F) * 4 :]
+            if len(packet) < 8:
+                continue
+            icmp_type, _, _, identifier, sequence = struct.unpack("!BBHHH", packet[:8])
+            if icmp_type != ICMP_ECHO_REPLY:
+                continue
+            with self._lock:
+                pending = self._pending.get((identifier, sequence))
+                if pending is None or pending[0].result.address != address:
+                    continue
+                del self._pending[(identifier, sequence)]
+            session, sent_at = pending
+            session.add_reply((received_at - sent_at) * 1000)
+
+    def _forget(self, sequences):
+        with self._lock:
+            for sequence in sequences:
+                self._pending.pop((self._identifier, sequence), None)
+
+    def ping_many(self, targets: dict, count=5, timeout=5, interval=0.2) -> dict:
+        """Pings {target: address} concurrently, returns {target: PingResult}"""
+        sessions = {
+            target: _PingSession(target, address, count) for target, address in targets.items()
+        }
+        sequences = []
+        started = time.monotonic()
+        for i in range(count):
+            if i:
+                time.sleep(interval)
+            for session in sessions.values():
+                sequences.append(self._send(session))
+
+        deadline = started + timeout
+        for session in sessions.values():
+            session.done.wait(max(deadline - time.monotonic(), 0))
+        self._forget(sequences)
+        return {target: session.result for target, session in sessions.items()}
+
+    def ping(self, target, address, count=5, timeout=5, interval=0.2) -> PingResult:
+        return self.ping_many({target: address}, count, timeout, interval)[target]
+
+    async def async_ping(self, target, address, count=5, timeout=5, interval=0.2) -> PingResult:
+        session = _PingSession(target, address, count)
+        session._loop = asyncio.get_running_loop()
+        session._future = session._loop.create_future()
+        sequences = []
+        started = time.monotonic()
+        for i in range(count):
+            if i:
+                await asyncio.sleep(interval)
+            sequences.append(self._send(session))
+
+        try:
+            await asyncio.wait_for(
+                asyncio.shield(session._future), max(started + timeout - time.monotonic(), 0)
+            )
+        except asyncio.TimeoutError:
+            pass
+        self._forget(sequences)
+        return session.result
+
+
+_prober = None
+_prober_unavailable = False
+_prober_lock = threading.Lock()
+
+
+def get_prober() -> Optional[IcmpProber]:
+    """Returns the shared IcmpProber or None when ICMP sockets are not permitted"""
+    global _prober, _prober_unavailable
+    with _prober_lock:
+        if _prober is None and not _prober_unavailable:
+            try:
+                _prober = IcmpProber()
+            except OSError as e:
+                _prober_unavailable = True
+                logger.warning("Native ICMP unavailable, falling back to system ping: %s", e)
+        return _prober
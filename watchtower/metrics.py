@@ -0,0 +1,219 @@
+import threading
+import time
+
+from watchtower.logging_config import logger
+from watchtower.stats import LatencyHistogram
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+CHECK_FAMILIES = (
+    ("watchtower_check_up", "gauge", "Whether the last run of the check passed (1) or failed (0), NaN while pending."),
+    ("watchtower_check_runs_total", "counter", "Number of completed check runs by result."),
+    ("watchtower_check_duration_seconds", "histogram", "Duration of check runs."),
+)
+
+
+def escape_label(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def format_labels(labels: dict) -> str:
+    return ",".join(f'{key}="{escape_label(value)}"' for key, value in labels.items())
+
+
+def format_value(value) -> str:
+    if value is None:
+        return "NaN"
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def render_histogram(name: str, labels: str, histogram: LatencyHistogram, scale: float = 0.001) -> list:
+    """Renders a millisecond LatencyHistogram as a Prometheus histogram in seconds"""
+    prefix = f"{labels}," if labels else ""
+    lines = [
+        f'{name}_bucket{{{prefix}le="{format_value(bound * scale if bound != float("inf") else bound)}"}} {count}'
+        for bound, count in histogram.cumulative_counts()
+    ]
+    suffix = f"{{{labels}}}" if labels else ""
+    lines.append(f"{name}_sum{suffix} {format_value(histogram.sum * scale)}")
+    lines.append(f"{name}_count{suffix} {histogram.count}")
+    return lines
+
+
+def render_family(name: str, kind: str, help_text: str, lines) -> str:
+    return f"# HELP {name} {help_text}\n# TYPE {name} {kind}\n" + "".join(
+        f"{line}\n" for line in lines
+    )
+
+
+class EngineStats:
+    """Counters describing the scheduler and the result pipeline itself"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.submitted = 0
+        self.jobs_started = 0
+        self.started = 0
+        self.finished = 0
+        self.missed_runs = 0
+        self.lateness = LatencyHistogram()
+        self.class_durations = {}
+        self._last_started = {}
+
+    def job_submitted(self, event=None):
+        with self._lock:
+            self.submitted += 1
+
+    def job_started(self):
+        """A submitted job began, whether it then runs a check, a whole host batch or skips"""
+        with self._lock:
+            self.jobs_started += 1
+
+    def forget(self, test_id: str):
+        with self._lock:
+            self._last_started.pop(test_id, None)
+
+    def run_started(self, test):
+        now = time.monotonic()
+        with self._lock:
+            self.started += 1
+            last_started = self._last_started.get(test.test_id)
+            self._last_started[test.test_id] = now
+        if last_started is not None:
+            # The interval the check is actually scheduled on, adaptive checks drift from the configured one
+            interval = test.adaptive.current if test.adaptive else test.interval
+            late = max(now - last_started - interval, 0)
+            self.lateness.observe(late * 1000)
+            if interval and late >= interval:
+                with self._lock:
+                    self.missed_runs += int(late // interval)
+
+    def run_skipped(self, test):
+        logger.debug("Skipped run of %s on %s, probe limits not met in time", test.name, test.target)
+        with self._lock:
+            self.missed_runs += 1
+            # Counted here, the next run must not count the same gap as lateness
+            self._last_started[test.test_id] = time.monotonic()
+
+    def run_finished(self, test, duration):
+        with self._lock:
+            self.finished += 1
+            histogram = self.class_durations.get(test.name)
+            if histogram is None:
+                histogram = self.class_durations[test.name] = LatencyHistogram()
+        if duration is not None:
+            histogram.observe(duration)
+
+    def queue_depth(self, scheduler) -> int:
+        queued = getattr(scheduler, "queued", None)
+        if queued is not None:
+            return queued
+        # Per job rather than per check, a host batch is one job running several checks
+        return max(self.submitted - self.jobs_started, 0)
+
+    def render(self, scheduler, snapshot) -> str:
+        families = [
+            render_family(
+                "watchtower_scheduler_jobs", "gauge", "Number of scheduled check jobs.",
+                [f"watchtower_scheduler_jobs {len(scheduler.get_jobs())}"],
+            ),
+            render_family(
+                "watchtower_scheduler_queue_depth", "gauge", "Check runs that are due but have not started.",
+                [f"watchtower_scheduler_queue_depth {self.queue_depth(scheduler)}"],
+            ),
+            render_family(
+                "watchtower_scheduler_in_flight", "gauge", "Check runs currently executing.",
+                [f"watchtower_scheduler_in_flight {max(self.started - self.finished, 0)}"],
+            ),
+            render_family(
+                "watchtower_scheduler_missed_runs_total",
+                "counter",
+                "Check runs skipped by probe limits or started more than one interval late.",
+                [f"watchtower_scheduler_missed_runs_total {self.missed_runs}"],
+            ),
+            render_family(
+                "watchtower_scheduler_lateness_seconds",
+                "histogram",
+                "Delay between consecutive runs of a check beyond its interval.",
+                render_histogram("watchtower_scheduler_lateness_seconds", "", self.lateness),
+            ),
+            render_family(
+                "watchtower_run_duration_seconds", "histogram", "Duration of check runs per check class.",
+                [
+                    line
+                    for name, histogram in sorted(self.class_durations.items())
+                    for line in render_histogram(
+                        "watchtower_run_duration_seconds", format_labels({"check": name}), histogram
+                    )
+                ],
+            ),
+            render_family(
+                "watchtower_scoreboard_serialize_seconds", "histogram", "Time spent encoding the scoreboard document.",
+                render_histogram("watchtower_scoreboard_serialize_seconds", "", snapshot.encode_time),
+            ),
+        ]
+        return "".join(families)
+
+
+class MetricsRegistry:
+    """Per-check Prometheus series, re-rendered only for checks that recorded a result.
+
+    Each check's lines are cached per metric family, so a scrape re-renders the
+    checks that changed since the previous scrape and joins the cached rest.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._checks = {}
+        self._dirty = set()
+        self._fragments = {name: {} for name, _, _ in CHECK_FAMILIES}
+
+    def register(self, test, group):
+        with self._lock:
+            self._checks[test.test_id] = [test, group.name, 0, 0]
+            self._dirty.add(test.test_id)
+
+    def unregister(self, test_id: str):
+        with self._lock:
+            self._checks.pop(test_id, None)
+            self._dirty.discard(test_id)
+            for fragments in self._fragments.values():
+                fragments.pop(test_id, None)
+
+    def observe(self, test, result):
+        with self._lock:
+            entry = self._checks.get(test.test_id)
+            if entry is None:
+                return
+            if result is True:
+                entry[2] += 1
+            elif result is False:
+                entry[3] += 1
+            self._dirty.add(test.test_id)
+
+    def _render_check(self, test_id):
+        test, group_name, passes, failures = self._checks[test_id]
+        labels = format_labels(
+            {"test_id": test_id, "group": group_name, "target": test.target, "check": test.name}
+        )
+        up = None if test.last_run_successful is None else int(bool(test.last_run_successful))
+        self._fragments["watchtower_check_up"][test_id] = f"watchtower_check_up{{{labels}}} {format_value(up)}"
+        self._fragments["watchtower_check_runs_total"][test_id] = (
+            f'watchtower_check_runs_total{{{labels},result="pass"}} {passes}\n'
+            f'watchtower_check_runs_total{{{labels},result="fail"}} {failures}'
+        )
+        self._fragments["watchtower_check_duration_seconds"][test_id] = "\n".join(
+            render_histogram("watchtower_check_duration_seconds", labels, test.latency)
+        )
+
+    def render(self) -> str:
+        with self._lock:
+            for test_id in self._dirty:
+                self._render_check(test_id)
+            self._dirty.clear()
+            return "".join(
+                render_family(name, kind, help_text, self._fragments[name].values())
+                for name, kind, help_text in CHECK_FAMILIES
+            )
@@ -2,52 +2,43 @@ from dataclasses import dataclass, field
 from typing import List
 from enum import Enum
 
+DEFAULT_INTERVAL = 60
+DEFAULT_GROUP = "Ungrouped"
+
+
 class CheckTypes(Enum):
     PING = "ping"
     DNS = "dns"
     PORT = "port"
+    TCP = "tcp"
     HTTP_STATUS = "http_status"
     BROWSER = "browser"
+    SPEEDTEST = "speedtest"
 
 
-def validate_test_type(value):
-    if not isinstance(value, CheckTypes):
-        raise ValueError(f"Invalid test type: {value}")
-    return value
+CHECK_TYPES = frozenset(check_type.value for check_type in CheckTypes)
 
-@dataclass
+
+@dataclass(slots=True)
 class Check:
-    type: str = field(metadata={'validate': validate_test_type})
-    enabled: bool
-    display_name: str
-    interval: int
+    type: str
+    enabled: bool = True
+    display_name: str = None
+    interval: int = DEFAULT_INTERVAL
     options: dict = field(default_factory=dict)
 
-    @classmethod
-    def from_dict(cls, check_dict):
-        return cls(**check_dict)
 
-@dataclass
+@dataclass(slots=True)
 class Host:
     name: str
     group: str
     target: str
     checks: List[Check]
+    # Names of the hosts this one is reached through
+    depends_on: List[str] = field(default_factory=list)
 
-    @classmethod
-    def from_dict(cls, target_dict):
-        checks_data = target_dict.pop("checks", [])
-        checks_list = [Check.from_dict(check_data) for check_data in checks_data]
-        return cls(checks=checks_list, **target_dict)
 
-@dataclass
+@dataclass(slots=True)
 class Config:
     config_version: int
     hosts: List[Host]
-
-    @classmethod
-    def from_dict(cls, config_dict):
-        hosts_data = config_dict.get("hosts", [])
-        host_list = [Host.from_dict(hosts_data) for hosts_data in hosts_data]
-        config_dict.pop("hosts")
-        return cls(hosts=host_list, **config_dict)
\ No newline at end of file
@@ -0,0 +1,159 @@
+import asyncio
+import hashlib
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+
+
+def spread_offset(key: str, interval: float) -> float:
+    """Returns a stable offset in [0, interval) derived from ``key``"""
+    digest = hashlib.sha1(key.encode("utf-8")).digest()
+    return int.from_bytes(digest[:8], "big") / 2**64 * interval
+
+
+def next_slot(key: str, interval: float, now: float = None) -> float:
+    """Returns the next wall clock time at which ``key`` fires when spread over ``interval``"""
+    now = now or time.time()
+    start = now - now % interval + spread_offset(key, interval)
+    return start if start > now else start + interval
+
+
+class TokenBucket:
+    """Thread-safe token bucket, ``rate`` tokens per second with bursts up to ``burst``"""
+
+    def __init__(self, rate: float, burst: float = None):
+        self.rate = rate
+        self.capacity = burst or max(rate, 1)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def try_acquire(self) -> float:
+        """Takes a token, returns 0 on success or the seconds until one is available"""
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return 0
+            return (1 - self.tokens) / self.rate
+
+    def refund(self):
+        """Returns a token taken for a probe that did not run"""
+        with self._lock:
+            self.tokens = min(self.capacity, self.tokens + 1)
+
+    def acquire(self, timeout: float) -> bool:
+        deadline = time.monotonic() + timeout
+        while True:
+            wait = self.try_acquire()
+            if not wait:
+                return True
+            if time.monotonic() + wait > deadline:
+                return False
+            time.sleep(wait)
+
+    async def acquire_async(self, timeout: float) -> bool:
+        deadline = time.monotonic() + timeout
+        while True:
+            wait = self.try_acquire()
+            if not wait:
+                return True
+            if time.monotonic() + wait > deadline:
+                return False
+            await asyncio.sleep(wait)
+
+
+class ProbeLimiter:
+    """Caps probes per target (concurrency and rate) and across all targets (rate).
+
+    ``slot`` is used from scheduler threads, ``async_slot`` from the asyncio
+    engine. Both yield False when the caps could not be met within the timeout,
+    in which case the caller should skip the run.
+    """
+
+    def __init__(self, max_per_target: int = None, rate: float = None, rate_per_target: float = None):
+        self.max_per_target = max_per_target
+        self.rate = rate
+        self.rate_per_target = rate_per_target
+        self.bucket = TokenBucket(rate) if rate else None
+        self._target_buckets = {}
+        self._in_flight = {}
+        self._async_semaphores = {}
+        self._lock = threading.Lock()
+        self._released = threading.Condition(self._lock)
+
+    def _target_bucket(self, target):
+        if not self.rate_per_target:
+            return None
+        with self._lock:
+            bucket = self._target_buckets.get(target)
+            if bucket is None:
+                bucket = self._target_buckets[target] = TokenBucket(self.rate_per_target)
+            return bucket
+
+    def _acquire_rate(self, target, deadline) -> bool:
+        target_bucket = self._target_bucket(target)
+        if target_bucket and not target_bucket.acquire(max(deadline - time.monotonic(), 0)):
+            return False
+        if self.bucket and not self.bucket.acquire(max(deadline - time.monotonic(), 0)):
+            # The probe is skipped, the target must not be charged for it
+            if target_bucket:
+                target_bucket.refund()
+            return False
+        return True
+
+    async def _acquire_rate_async(self, target, deadline) -> bool:
+        target_bucket = self._target_bucket(target)
+        if target_bucket and not await target_bucket.acquire_async(max(deadline - time.monotonic(), 0)):
+            return False
+        if self.bucket and not await self.bucket.acquire_async(max(deadline - time.monotonic(), 0)):
+            if target_bucket:
+                target_bucket.refund()
+            return False
+        return True
+
+    @contextmanager
+    def slot(self, target: str, timeout: float):
+        deadline = time.monotonic() + timeout
+        if self.max_per_target:
+            with self._released:
+                acquired = self._released.wait_for(
+                    lambda: self._in_flight.get(target, 0) < self.max_per_target, timeout
+                )
+                if acquired:
+                    self._in_flight[target] = self._in_flight.get(target, 0) + 1
+            # Yielded outside the lock, the caller's body must not block other targets
+            if not acquired:
+                yield False
+                return
+        try:
+            yield self._acquire_rate(target, deadline)
+        finally:
+            if self.max_per_target:
+                with self._released:
+                    self._in_flight[target] -= 1
+                    self._released.notify_all()
+
+    @asynccontextmanager
+    async def async_slot(self, target: str, timeout: float):
+        deadline = time.monotonic() + timeout
+        semaphore = None
+        if self.max_per_target:
+            semaphore = self._async_semaphores.get(target)
+            if semaphore is None:
+                semaphore = self._async_semaphores[target] = asyncio.Semaphore(self.max_per_target)
+            try:
+                await asyncio.wait_for(semaphore.acquire(), timeout)
+                acquired = True
+            except asyncio.TimeoutError:
+                acquired = False
+            if not acquired:
+                yield False
+                return
+        try:
+            yield await self._acquire_rate_async(target, deadline)
+        finally:
+            if semaphore:
+                semaphore.release()
@@ -0,0 +1,280 @@
+import asyncio
+import ipaddress
+import socket
+import threading
+import time
+from typing import List, Optional, Tuple
+
+import dns.asyncresolver
+import dns.exception
+import dns.resolver
+
+from watchtower.exceptions import ResolutionError
+from watchtower.logging_config import logger
+
+RECORD_TYPES = ("A", "AAAA", "MX", "CNAME")
+DEFAULT_TIMEOUT = 5.0
+# Answers from the system resolver carry no TTL
+SYSTEM_TTL = 60
+NEGATIVE_TTL = 30
+MAX_TTL = 3600
+DEFAULT_CACHE_SIZE = 10000
+
+
+class Answer:
+    __slots__ = ("records", "ttl", "expires", "error")
+
+    def __init__(self, records: List[str], ttl: float, error: str = None):
+        self.records = records
+        self.ttl = ttl
+        self.expires = time.monotonic() + ttl
+        self.error = error
+
+
+class DnsCache:
+    """TTL-respecting answer cache shared by every Resolver.
+
+    Keys are (name, record type, nameservers), addresses looked up for other
+    checks are kept under the "address" type. Failed lookups are cached for
+    ``negative_ttl`` seconds, timeouts are not cached. Concurrent misses for the
+    same key wait for the first lookup instead of querying the resolver again.
+    """
+
+    def __init__(
+        self, max_entries: int = DEFAULT_CACHE_SIZE, max_ttl: float = MAX_TTL, negative_ttl: float = NEGATIVE_TTL
+    ):
+        self.max_entries = max_entries
+        self.max_ttl = max_ttl
+        self.negative_ttl = negative_ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries = {}
+        self._pending = {}
+        self._pending_async = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key) -> Optional[Answer]:
+        with self._lock:
+            answer = self._entries.get(key)
+            if answer is not None and answer.expires <= time.monotonic():
+                del self._entries[key]
+                answer = None
+            if answer is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            return answer
+
+    def put(self, key, answer: Answer):
+        answer.expires = time.monotonic() + min(answer.ttl, self.max_ttl)
+        with self._lock:
+            self._entries.pop(key, None)
+            self._entries[key] = answer
+            if len(self._entries) > self.max_entries:
+                self._evict()
+
+    def _evict(self):
+        now = time.monotonic()
+        for key in [key for key, answer in self._entries.items() if answer.expires <= now]:
+            del self._entries[key]
+        while len(self._entries) > self.max_entries:
+            # Insertion ordered, so this drops the least recently stored answer
+            del self._entries[next(iter(self._entries))]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def fetch(self, key, lookup, timeout: float) -> Answer:
+        """Returns the cached answer for key, calling ``lookup`` once across threads on a miss"""
+        answer = self.get(key)
+        if answer is not None:
+            return answer
+        with self._lock:
+            event = self._pending.get(key)
+            leader = event is None
+            if leader:
+                event = self._pending[key] = threading.Event()
+        if not leader:
+            event.wait(timeout)
+            answer = self.get(key)
+            if answer is not None:
+                return answer
+        try:
+            return self.store(key, lookup())
+        finally:
+            if leader:
+                with self._lock:
+                    del self._pending[key]
+                event.set()
+
+    async def fetch_async(self, key, lookup) -> Answer:
+        answer = self.get(key)
+        if answer is not None:
+            return answer
+        task = self._pending_async.get(key)
+        if task is None:
+            task = self._pending_async[key] = asyncio.ensure_future(lookup())
+            task.add_done_callback(lambda _: self._pending_async.pop(key, None))
+        return self.store(key, await asyncio.shield(task))
+
+    def store(self, key, answer: Optional[Answer]) -> Optional[Answer]:
+        if answer is not None:
+            self.put(key, answer)
+        return answer
+
+
+shared_cache = DnsCache()
+
+
+class Resolver:
+    """Resolves names through dnspython, against the system's or the given nameservers.
+
+    ``resolve`` answers A, AAAA, MX and CNAME queries and raises ResolutionError
+    when the name does not resolve. ``lookup_address`` is what non-DNS checks use:
+    an IPv4 address from the shared cache, falling back to the system resolver
+    (which also consults /etc/hosts) when the default nameservers have no answer.
+    """
+
+    def __init__(self, nameservers: Tuple[str, ...] = None, timeout: float = DEFAULT_TIMEOUT, cache: DnsCache = None):
+        self.nameservers = tuple(nameservers) if nameservers else None
+        self.timeout = timeout
+        self.cache = cache if cache is not None else shared_cache
+        self._resolver = self._configure(dns.resolver.Resolver)
+        self._async_resolver = self._configure(dns.asyncresolver.Resolver)
+
+    def _configure(self, resolver_class):
+        try:
+            resolver = resolver_class(configure=not self.nameservers)
+        except dns.resolver.NoResolverConfiguration:
+            logger.warning("No system DNS configuration found, using the system resolver only")
+            resolver = resolver_class(configure=False)
+        if self.nameservers:
+            resolver.nameservers = list(self.nameservers)
+        resolver.lifetime = self.timeout
+        return resolver
+
+    def _key(self, name: str, record_type: str):
+        return (name.lower().rstrip("."), record_type, self.nameservers)
+
+    def _answer(self, answer) -> Answer:
+        return Answer([rdata.to_text() for rdata in answer], answer.rrset.ttl)
+
+    def _failure(self, name: str, record_type: str, error: dns.exception.DNSException) -> Optional[Answer]:
+        if isinstance(error, dns.exception.Timeout):
+            return None
+        return Answer([], self.cache.negative_ttl, f"{record_type} lookup for {name} failed: {error}")
+
+    def _query(self, name: str, record_type: str) -> Optional[Answer]:
+        try:
+            return self._answer(self._resolver.resolve(name, record_type, search=True))
+        except dns.exception.DNSException as e:
+            return self._failure(name, record_type, e)
+
+    async def _query_async(self, name: str, record_type: str) -> Optional[Answer]:
+        try:
+            return self._answer(await self._async_resolver.resolve(name, record_type, search=True))
+        except dns.exception.DNSException as e:
+            return self._failure(name, record_type, e)
+
+    def _result(self, name: str, record_type: str, answer: Optional[Answer]) -> Answer:
+        if answer is None:
+            raise ResolutionError(socket.EAI_AGAIN, f"{record_type} lookup for {name} timed out after {self.timeout}s")
+        if answer.error:
+            raise ResolutionError(socket.EAI_NONAME, answer.error)
+        return answer
+
+    def _refresh(self, name: str, record_type: str, answer: Optional[Answer]) -> Optional[Answer]:
+        self.cache.store(self._key(name, record_type), answer)
+        if record_type == "A" and answer is not None and not answer.error:
+            self.cache.store(self._key(name, "address"), answer)
+        return answer
+
+    def resolve(self, name: str, record_type: str = "A", use_cache: bool = True) -> Answer:
+        """Resolves name, ``use_cache=False`` always queries but still refreshes the cache"""
+        if record_type in ("A", "AAAA") and is_ip_address(name):
+            return Answer([name], MAX_TTL)
+        if use_cache:
+            key = self._key(name, record_type)
+            answer = self.cache.fetch(key, lambda: self._query(name, record_type), self.timeout)
+        else:
+            answer = self._refresh(name, record_type, self._query(name, record_type))
+        return self._result(name, record_type, answer)
+
+    async def resolve_async(self, name: str, record_type: str = "A", use_cache: bool = True) -> Answer:
+        if record_type in ("A", "AAAA") and is_ip_address(name):
+            return Answer([name], MAX_TTL)
+        if use_cache:
+            key = self._key(name, record_type)
+            answer = await self.cache.fetch_async(key, lambda: self._query_async(name, record_type))
+        else:
+            answer = self._refresh(name, record_type, await self._query_async(name, record_type))
+        return self._result(name, record_type, answer)
+
+    def _system_answer(self, addresses) -> Answer:
+        return Answer(list(dict.fromkeys(address[4][0] for address in addresses)), SYSTEM_TTL)
+
+    def _system_lookup(self, name: str) -> Answer:
+        try:
+            return self._system_answer(socket.getaddrinfo(name, None, family=socket.AF_INET))
+        except socket.gaierror as e:
+            return Answer([], self.cache.negative_ttl, f"A lookup for {name} failed: {e}")
+
+    async def _system_lookup_async(self, name: str) -> Answer:
+        loop = asyncio.get_running_loop()
+        try:
+            return self._system_answer(await loop.getaddrinfo(name, None, family=socket.AF_INET))
+        except socket.gaierror as e:
+            return Answer([], self.cache.negative_ttl, f"A lookup for {name} failed: {e}")
+
+    def _address_lookup(self, name: str) -> Answer:
+        answer = self._query(name, "A")
+        if self.nameservers or (answer is not None and not answer.error):
+            return answer
+        return self._system_lookup(name)
+
+    async def _address_lookup_async(self, name: str) -> Answer:
+        answer = await self._query_async(name, "A")
+        if self.nameservers or (answer is not None and not answer.error):
+            return answer
+        return await self._system_lookup_async(name)
+
+    def lookup_address(self, name: str) -> str:
+        """Returns an IPv4 address for name, served from the shared cache while its TTL lasts"""
+        if is_ip_address(name):
+            return name
+        key = self._key(name, "address")
+        answer = self.cache.fetch(key, lambda: self._address_lookup(name), self.timeout)
+        return self._result(name, "A", answer).records[0]
+
+    async def lookup_address_async(self, name: str) -> str:
+        if is_ip_address(name):
+            return name
+        key = self._key(name, "address")
+        answer = await self.cache.fetch_async(key, lambda: self._address_lookup_async(name))
+        return self._result(name, "A", answer).records[0]
+
+
+def is_ip_address(name: str) -> bool:
+    try:
+        ipaddress.ip_address(name)
+    except ValueError:
+        return False
+    return True
+
+
+_resolvers = {}
+_resolvers_lock = threading.Lock()
+
+
+def get_resolver(nameservers: List[str] = None, timeout: float = DEFAULT_TIMEOUT) -> Resolver:
+    """Returns a Resolver for the nameservers and timeout, shared between checks"""
+    key = (tuple(nameservers) if nameservers else None, timeout)
+    with _resolvers_lock:
+        resolver = _resolvers.get(key)
+        if resolver is None:
+            resolver = _resolvers[key] = Resolver(nameservers, timeout)
+        return resolver
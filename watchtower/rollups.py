@@ -0,0 +1,143 @@
+import re
+import threading
+import time
+from array import array
+
+MINUTE = 60
+HOUR = 3600
+DAY = 24 * HOUR
+MAX_WINDOW = 31 * DAY
+
+WINDOW_PATTERN = re.compile(r"^(\d+)([mhd])$")
+WINDOW_UNITS = {"m": MINUTE, "h": HOUR, "d": DAY}
+
+
+def parse_window(window: str) -> int:
+    """Parses '90m', '24h', '7d' or '30d' into seconds"""
+    match = WINDOW_PATTERN.match(window or "")
+    if not match:
+        raise ValueError(f"Invalid window: '{window}'. Expected e.g. '24h', '7d' or '30d'")
+    seconds = int(match.group(1)) * WINDOW_UNITS[match.group(2)]
+    if not 0 < seconds <= MAX_WINDOW:
+        raise ValueError(f"Window must be between 1m and {MAX_WINDOW // DAY}d")
+    return seconds
+
+
+class BucketSeries:
+    """Run and failure counters in a ring of fixed width time buckets.
+
+    Only the index of the newest bucket is stored. Buckets skipped over when time
+    advances are zeroed, so any bucket within ``size`` of the newest one is valid.
+    """
+
+    __slots__ = ("width", "size", "runs", "failures", "last")
+
+    def __init__(self, width: int, size: int, typecode: str = "H"):
+        self.width = width
+        self.size = size
+        self.runs = array(typecode, bytes(array(typecode).itemsize * size))
+        self.failures = array(typecode, bytes(array(typecode).itemsize * size))
+        self.last = None
+
+    def add(self, timestamp: float, runs: int = 1, failures: int = 0):
+        bucket = int(timestamp // self.width)
+        if self.last is None:
+            self.last = bucket
+        elif bucket > self.last:
+            for skipped in range(self.last + 1, min(bucket, self.last + self.size) + 1):
+                self.runs[skipped % self.size] = 0
+                self.failures[skipped % self.size] = 0
+            self.last = bucket
+        elif bucket <= self.last - self.size:
+            return
+
+        i = bucket % self.size
+        limit = 2 ** (self.runs.itemsize * 8) - 1
+        self.runs[i] = min(self.runs[i] + runs, limit)
+        self.failures[i] = min(self.failures[i] + failures, limit)
+
+    def totals(self, since: float, now: float):
+        """Returns (runs, failures) for the buckets overlapping [since, now]"""
+        if self.last is None:
+            return 0, 0
+        first = max(int(since // self.width), self.last - self.size + 1)
+        last = min(int(now // self.width), self.last)
+        runs = failures = 0
+        for bucket in range(first, last + 1):
+            runs += self.runs[bucket % self.size]
+            failures += self.failures[bucket % self.size]
+        return runs, failures
+
+
+class Rollup:
+    """Per-minute rollups for the last hour and per-hour rollups for the last 31 days"""
+
+    __slots__ = ("minutes", "hours")
+
+    def __init__(self, typecode: str = "H"):
+        self.minutes = BucketSeries(MINUTE, HOUR // MINUTE, typecode)
+        self.hours = BucketSeries(HOUR, MAX_WINDOW // HOUR + 1, typecode)
+
+    def add(self, timestamp: float, runs: int = 1, failures: int = 0):
+        self.minutes.add(timestamp, runs, failures)
+        self.hours.add(timestamp, runs, failures)
+
+    def summary(self, window: int, now: float = None) -> dict:
+        now = now or time.time()
+        series = self.minutes if window <= HOUR else self.hours
+        runs, failures = series.totals(now - window, now)
+        return {
+            "runs": runs,
+            "failures": failures,
+            "uptime": round((runs - failures) / runs * 100, 4) if runs else None,
+        }
+
+
+class RollupIndex:
+    """Uptime rollups per check, per group and for the whole fleet, updated on every result"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checks = {}
+        self.groups = {}
+        self.fleet = Rollup("L")
+
+    def record(self, test_id: str, group_name: str, result, timestamp: float = None, runs: int = 1):
+        if result is None:
+            return
+        self.add(test_id, group_name, timestamp or time.time(), runs, 0 if result else runs)
+
+    def add(self, test_id: str, group_name: str, timestamp: float, runs: int, failures: int):
+        with self._lock:
+            check = self.checks.get(test_id)
+            if check is None:
+                check = self.checks[test_id] = Rollup()
+            group = self.groups.get(group_name)
+            if group is None:
+                group = self.groups[group_name] = Rollup("L")
+            for rollup in (check, group, self.fleet):
+                rollup.add(timestamp, runs, failures)
+
+    def check_uptime(self, test_id: str, window: int) -> dict:
+        with self._lock:
+            rollup = self.checks.get(test_id)
+            return rollup.summary(window) if rollup else None
+
+    def group_sla(self, group_name: str, window: int) -> dict:
+        with self._lock:
+            rollup = self.groups.get(group_name)
+            return rollup.summary(window) if rollup else None
+
+    def fleet_sla(self, window: int) -> dict:
+        with self._lock:
+            return self.fleet.summary(window)
+
+    def load(self, result_store, group_names: dict, until: float):
+        """Seeds the rollups from persisted results older than ``until``"""
+        since = until - MAX_WINDOW
+        for minute, test_id, runs, failures, *_ in result_store.iter_rollups(since):
+            if test_id in group_names and minute < until:
+                self.add(test_id, group_names[test_id], minute, runs, failures)
+        for timestamp, test_id, result, *_ in result_store.iter_records(since, until):
+            if test_id in group_names:
+                self.record(test_id, group_names[test_id], result, timestamp)
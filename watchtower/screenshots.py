@@ -0,0 +1,169 @@
+import hashlib
+import io
+import json
+import os
+import threading
+import time
+from collections import Counter
+
+from watchtower.logging_config import logger
+
+try:
+    from PIL import Image
+except ImportError:  # Thumbnails and perceptual diffs are optional
+    Image = None
+
+DEFAULT_RETENTION = 50
+THUMBNAIL_WIDTH = 320
+OBJECTS_DIR = "objects"
+INDEX_DIR = "index"
+
+
+def digest(png: bytes) -> str:
+    return hashlib.sha256(png).hexdigest()
+
+
+def dhash(image) -> int:
+    """64-bit difference hash, similar looking captures differ in few bits"""
+    pixels = list(image.convert("L").resize((9, 8)).getdata())
+    bits = 0
+    for row in range(8):
+        for col in range(8):
+            bits = (bits << 1) | (pixels[row * 9 + col] > pixels[row * 9 + col + 1])
+    return bits
+
+
+class ScreenshotStore:
+    """Content-addressed store of browser check screenshots.
+
+    Images are stored once per SHA-256 digest under ``objects/``, so a capture
+    identical to an earlier one costs no disk write. Each check has an index of
+    its last ``retention`` distinct captures (a new entry only when the image
+    changes), objects no longer referenced by any index are deleted. With Pillow
+    installed, a thumbnail is written next to each object and every entry gets a
+    perceptual diff score (0 same, 1 entirely different) against the previous one.
+    """
+
+    def __init__(self, root: str, retention: int = DEFAULT_RETENTION):
+        self.root = root
+        self.retention = retention
+        self._indexes = {}
+        self._refs = Counter()
+        self._dirty = set()
+        self._lock = threading.Lock()
+        os.makedirs(os.path.join(root, OBJECTS_DIR), exist_ok=True)
+        os.makedirs(os.path.join(root, INDEX_DIR), exist_ok=True)
+        self._load()
+
+    def _index_path(self, test_id: str) -> str:
+        return os.path.join(self.root, INDEX_DIR, f"{test_id}.json")
+
+    def path(self, digest: str, thumbnail: bool = False) -> str:
+        suffix = ".thumb.png" if thumbnail else ".png"
+        return os.path.join(self.root, OBJECTS_DIR, digest[:2], f"{digest}{suffix}")
+
+    def _load(self):
+        index_dir = os.path.join(self.root, INDEX_DIR)
+        for filename in os.listdir(index_dir):
+            if not filename.endswith(".json"):
+                continue
+            try:
+                with open(os.path.join(index_dir, filename)) as f:
+                    entries = json.load(f)
+            except (OSError, ValueError) as e:
+                logger.warning("Skipping unreadable screenshot index %s: %s", filename, e)
+                continue
+            self._indexes[filename[: -len(".json")]] = entries
+            self._refs.update(entry["digest"] for entry in entries)
+
+    def latest_digest(self, test_id: str):
+        with self._lock:
+            entries = self._indexes.get(test_id)
+            return entries[-1]["digest"] if entries else None
+
+    def history(self, test_id: str) -> list:
+        """Returns the check's captures, newest first"""
+        with self._lock:
+            return [dict(entry) for entry in reversed(self._indexes.get(test_id, []))]
+
+    def add(self, test_id: str, image_digest: str, png: bytes = None, timestamp: float = None) -> dict:
+        """Records a capture, ``png`` may be omitted when it matches the latest capture"""
+        timestamp = timestamp or time.time()
+        with self._lock:
+            entries = self._indexes.setdefault(test_id, [])
+            if entries and entries[-1]["digest"] == image_digest:
+                entries[-1]["last_seen"] = timestamp
+                entries[-1]["captures"] += 1
+                self._dirty.add(test_id)
+                return dict(entries[-1])
+            previous = entries[-1] if entries else None
+        if png is None:
+            raise ValueError(f"Screenshot {image_digest} is new and its image data is missing")
+
+        entry = {"digest": image_digest, "first_seen": timestamp, "last_seen": timestamp, "captures": 1}
+        entry.update(self._write_object(image_digest, png, previous))
+
+        with self._lock:
+            entries.append(entry)
+            self._refs[image_digest] += 1
+            expired = entries[: -self.retention] if len(entries) > self.retention else []
+            del entries[: len(expired)]
+            unreferenced = []
+            for old in expired:
+                self._refs[old["digest"]] -= 1
+                if self._refs[old["digest"]] <= 0:
+                    del self._refs[old["digest"]]
+                    unreferenced.append(old["digest"])
+            self._write_index(test_id, entries)
+        for old_digest in unreferenced:
+            self._delete_object(old_digest)
+        return dict(entry)
+
+    def _write_object(self, image_digest: str, png: bytes, previous: dict) -> dict:
+        """Writes the image (and thumbnail) unless already stored, returns perceptual fields"""
+        path = self.path(image_digest)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            self._write_file(path, png)
+        if Image is None:
+            return {}
+        try:
+            image = Image.open(io.BytesIO(png))
+            image.load()
+        except Exception as e:
+            logger.warning("Could not decode screenshot %s: %s", image_digest, e)
+            return {}
+        fields = {"width": image.width, "height": image.height, "dhash": f"{dhash(image):016x}"}
+        if previous and previous.get("dhash"):
+            distance = bin(int(fields["dhash"], 16) ^ int(previous["dhash"], 16)).count("1")
+            fields["diff"] = round(distance / 64, 3)
+        thumbnail_path = self.path(image_digest, thumbnail=True)
+        if not os.path.exists(thumbnail_path):
+            image.thumbnail((THUMBNAIL_WIDTH, THUMBNAIL_WIDTH * 4))
+            buffer = io.BytesIO()
+            image.save(buffer, format="PNG", optimize=True)
+            self._write_file(thumbnail_path, buffer.getvalue())
+        return fields
+
+    def _write_file(self, path: str, data: bytes):
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    def _write_index(self, test_id: str, entries: list):
+        self._write_file(self._index_path(test_id), json.dumps(entries).encode("utf-8"))
+        self._dirty.discard(test_id)
+
+    def _delete_object(self, image_digest: str):
+        for thumbnail in (False, True):
+            try:
+                os.remove(self.path(image_digest, thumbnail))
+            except FileNotFoundError:
+                pass
+
+    def flush(self):
+        """Persists last_seen and capture counts of unchanged captures"""
+        with self._lock:
+            for test_id in list(self._dirty):
+                self._write_index(test_id, self._indexes[test_id])
@@ -1,13 +1,60 @@
 import argparse
+import gc
+import os
+import re
 import signal
 import sys
-from watchtower.config import AppConfig
-from watchtower.testcases import TestSuite
+import threading
+import time
+from apscheduler.executors.pool import ThreadPoolExecutor
+from apscheduler.schedulers.background import BackgroundScheduler
+from watchtower import browserpool
+from watchtower.adaptive import DEFAULT_MAX_FACTOR, AdaptivePolicy
+from watchtower.alerts import (
+    DEFAULT_BATCH_WINDOW,
+    DEFAULT_RATE_PER_MINUTE,
+    AlertDispatcher,
+    CommandNotifier,
+    SmtpNotifier,
+    WebhookNotifier,
+)
+from watchtower.cluster import Coordinator, parse_address
+from watchtower.config import (
+    DEFAULT_CONF_FILENAME,
+    DEFAULT_WATCH_INTERVAL,
+    AppConfig,
+    ConfigWatcher,
+    InvalidWatchTowerConfigException,
+)
+from watchtower.engine import AsyncScheduler, DEFAULT_MAX_CONCURRENCY
+from watchtower.executors import DEFAULT_THREAD_WORKERS, EXECUTOR_MODES, CheckExecutors
+from watchtower.health import (
+    DEFAULT_FAILURES,
+    DEFAULT_FLAP_WINDOW,
+    DEFAULT_RECOVERIES,
+    DEFAULT_WINDOW,
+    HealthPolicy,
+    parse_failures,
+)
+from watchtower.metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE
+from watchtower.ratelimit import ProbeLimiter
+from watchtower.rollups import parse_window
+from watchtower.screenshots import DEFAULT_RETENTION as DEFAULT_SCREENSHOT_RETENTION, ScreenshotStore
+from watchtower.snapshot import DEFAULT_MAX_STREAMS, DEFAULT_STREAM_INTERVAL, ChangeFeed
+from watchtower.storage import MAX_QUERY_LIMIT, ResultStore
+from watchtower.testcases import (
+    DEFAULT_STATE_LOG_CAPACITY,
+    DEFAULT_STATE_LOG_PAGE_SIZE,
+    MAX_STATE_LOG_PAGE_SIZE,
+    StateLog,
+    TestSuite,
+    get_check_class,
+)
 
 from watchtower.logging_config import logger
 
 
-from flask import Flask, jsonify
+from flask import Flask, Response, jsonify, request, send_file, stream_with_context
 from flask_cors import CORS
 
 app = Flask(__name__)
@@ -15,6 +62,9 @@ app = Flask(__name__)
 CORS(app, resources={r"/api/*": {"origins": "http://localhost:3000"}})
 
 test_suite = TestSuite()
+config_file = DEFAULT_CONF_FILENAME
+alert_dispatcher = None
+stream_feed = ChangeFeed(test_suite.snapshot)
 logger.info("Tests loaded")
 
 @app.route("/")
@@ -24,19 +74,228 @@ def root():
 
 @app.route("/api/scoreboard", methods=["GET"])
 def get_data():
-    return jsonify(test_suite.to_json())
+    body, etag = test_suite.snapshot.encoded()
+    response = Response(body, mimetype="application/json")
+    response.set_etag(etag)
+    return response.make_conditional(request)
+
+
+STREAM_KEEPALIVE_SECONDS = 15
+MAX_LONG_POLL_SECONDS = 60
+
+
+@app.route("/api/scoreboard/changes", methods=["GET"])
+def get_changes():
+    since = request.args.get("since", 0, type=int)
+    epoch = request.args.get("epoch")
+    wait = min(request.args.get("wait", 0, type=float), MAX_LONG_POLL_SECONDS)
+    if wait and (not epoch or epoch == test_suite.snapshot.epoch):
+        test_suite.snapshot.wait(since, wait)
+    body, _ = test_suite.snapshot.changes_since(since, epoch)
+    return Response(body, mimetype="application/json")
+
+
+@app.route("/api/stream", methods=["GET"])
+def get_stream():
+    snapshot = test_suite.snapshot
+    last_event_id = request.headers.get("Last-Event-ID") or request.args.get("since", "")
+    epoch, _, since = last_event_id.rpartition("-")
+    since = int(since) if since.isdigit() else snapshot.version
+    if not stream_feed.subscribe():
+        response = jsonify({"error": "Too many stream subscribers, poll /api/scoreboard/changes instead"})
+        response.headers["Retry-After"] = str(STREAM_KEEPALIVE_SECONDS)
+        return response, 503
+
+    def events(since, epoch):
+        try:
+            while True:
+                if stream_feed.wait(since, STREAM_KEEPALIVE_SECONDS) <= since and epoch == snapshot.epoch:
+                    yield ": keepalive\n\n"
+                    continue
+                body, version = snapshot.changes_since(since, epoch or None)
+                since, epoch = version, snapshot.epoch
+                yield f"id: {epoch}-{version}\nevent: changes\ndata: {body.decode()}\n\n"
+        finally:
+            stream_feed.unsubscribe()
+
+    response = Response(stream_with_context(events(since, epoch)), mimetype="text/event-stream")
+    response.headers["Cache-Control"] = "no-cache"
+    response.headers["X-Accel-Buffering"] = "no"
+    return response
 
 
 @app.route("/api/statelog", methods=["GET"])
 def get_statelog():
-    return jsonify(test_suite.state_log.to_json())
+    limit = request.args.get("limit", DEFAULT_STATE_LOG_PAGE_SIZE, type=int)
+    return jsonify(
+        test_suite.state_log.to_json(
+            since=request.args.get("since", type=float),
+            until=request.args.get("until", type=float),
+            limit=max(1, min(limit, MAX_STATE_LOG_PAGE_SIZE)),
+            cursor=request.args.get("cursor", type=int),
+        )
+    )
+
+
+@app.route("/api/checks/<test_id>/history", methods=["GET"])
+def get_check_history(test_id):
+    if not test_suite.result_store:
+        return jsonify({"error": "Result history is disabled"}), 404
+    history = test_suite.result_store.query(
+        test_id,
+        since=request.args.get("since", type=float),
+        until=request.args.get("until", type=float),
+        limit=max(1, min(request.args.get("limit", DEFAULT_STATE_LOG_PAGE_SIZE, type=int), MAX_QUERY_LIMIT)),
+    )
+    return jsonify({"test_id": test_id, "history": history})
+
+
+def _window_arg():
+    window = request.args.get("window", "24h")
+    return window, parse_window(window)
+
+
+@app.route("/api/checks/<test_id>/uptime", methods=["GET"])
+def get_check_uptime(test_id):
+    try:
+        window, seconds = _window_arg()
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    uptime = test_suite.rollups.check_uptime(test_id, seconds)
+    if uptime is None:
+        return jsonify({"error": f"No results for check '{test_id}'"}), 404
+    return jsonify({"test_id": test_id, "window": window, **uptime})
+
+
+@app.route("/api/groups/<group_name>/sla", methods=["GET"])
+def get_group_sla(group_name):
+    try:
+        window, seconds = _window_arg()
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    sla = test_suite.rollups.group_sla(group_name, seconds)
+    if sla is None:
+        return jsonify({"error": f"No results for group '{group_name}'"}), 404
+    return jsonify({"group": group_name, "window": window, **sla})
+
+
+@app.route("/api/sla", methods=["GET"])
+def get_sla():
+    try:
+        window, seconds = _window_arg()
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    rollups = test_suite.rollups
+    groups = [{"group": name, **rollups.group_sla(name, seconds)} for name in list(rollups.groups)]
+    return jsonify({"window": window, "fleet": rollups.fleet_sla(seconds), "groups": groups})
+
+
+@app.route("/metrics", methods=["GET"])
+def get_metrics():
+    body = test_suite.metrics.render() + test_suite.engine_stats.render(
+        test_suite.scheduler, test_suite.snapshot
+    )
+    return Response(body, content_type=METRICS_CONTENT_TYPE)
+
+
+@app.route("/api/checks/<test_id>/screenshots", methods=["GET"])
+def get_check_screenshots(test_id):
+    if not test_suite.screenshot_store:
+        return jsonify({"error": "Screenshots are disabled"}), 404
+    return jsonify({"test_id": test_id, "screenshots": test_suite.screenshot_store.history(test_id)})
+
+
+@app.route("/api/screenshots/<digest>", methods=["GET"])
+@app.route("/api/screenshots/<digest>/thumbnail", methods=["GET"], defaults={"thumbnail": True})
+def get_screenshot(digest, thumbnail=False):
+    store = test_suite.screenshot_store
+    if not store or not re.fullmatch(r"[0-9a-f]{64}", digest):
+        return jsonify({"error": "Screenshot not found"}), 404
+    path = store.path(digest, thumbnail=thumbnail)
+    if thumbnail and not os.path.exists(path):
+        # Thumbnails need Pillow, serve the full image without it
+        path = store.path(digest)
+    if not os.path.exists(path):
+        return jsonify({"error": "Screenshot not found"}), 404
+    # Content addressed, so the image behind a URL never changes
+    response = send_file(path, mimetype="image/png", etag=digest, conditional=True)
+    response.cache_control.no_cache = None
+    response.cache_control.public = True
+    response.cache_control.max_age = 31536000
+    response.cache_control.immutable = True
+    return response
+
+
+@app.route("/api/cluster", methods=["GET"])
+def get_cluster():
+    if not test_suite.coordinator:
+        return jsonify({"error": "Not running as a coordinator"}), 404
+    return jsonify(test_suite.coordinator.status())
+
+
+@app.route("/api/alerts", methods=["GET"])
+def get_alerts():
+    if not alert_dispatcher:
+        return jsonify({"error": "No alert notifiers configured"}), 404
+    return jsonify(alert_dispatcher.status())
+
+
+@app.route("/api/dependencies", methods=["GET"])
+def get_dependencies():
+    return jsonify(test_suite.dependencies.status())
+
+
+def reload_config() -> dict:
+    """Re-reads the config file and applies only the changed checks"""
+    return test_suite.reload(AppConfig(config_file).config)
+
+
+@app.route("/api/reload", methods=["POST"])
+def post_reload():
+    try:
+        summary = reload_config()
+    except Exception as e:
+        logger.error("Config reload failed, keeping the running checks: %s", e)
+        return jsonify({"error": f"Config reload failed: {e}"}), 400
+    return jsonify(summary)
+
+
+def reload_handler(sig, frame):
+    def reload():
+        try:
+            reload_config()
+        except Exception as e:
+            logger.error("Config reload failed, keeping the running checks: %s", e)
+
+    # Not in the signal handler itself, a reload can take a while and takes locks
+    threading.Thread(target=reload, name="watchtower-reload", daemon=True).start()
 
 
 def signal_handler(sig, frame):
     print("Shutting down gracefully...")
+    if alert_dispatcher:
+        alert_dispatcher.stop()
+    if test_suite.result_store:
+        test_suite.result_store.flush()
+    if test_suite.screenshot_store:
+        test_suite.screenshot_store.flush()
     sys.exit(0)
 
 
+def parse_executor_modes(parser, values) -> dict:
+    """Parses --executor TYPE=MODE values into {check class: mode}"""
+    modes = {}
+    for value in values:
+        check_type, _, mode = value.partition("=")
+        check_class = get_check_class(check_type)
+        if not check_class or mode not in EXECUTOR_MODES:
+            parser.error(
+                f"invalid --executor '{value}', expected TYPE=MODE with MODE one of {', '.join(EXECUTOR_MODES)}"
+            )
+        modes[check_class] = mode
+    return modes
+
+
 def run():
     parser = argparse.ArgumentParser(
         prog="WatchTower API Server",
@@ -46,19 +305,345 @@ def run():
     parser.add_argument(
         "-c", "--config", help="Watchtower config file. Default: watchtower.conf"
     )
+    parser.add_argument(
+        "-e",
+        "--engine",
+        choices=["thread", "asyncio"],
+        default="thread",
+        help="Check execution engine. Default: thread",
+    )
+    parser.add_argument(
+        "--max-concurrency",
+        type=int,
+        help=f"Max in-flight checks. Default: {DEFAULT_MAX_CONCURRENCY} for asyncio, 10 threads for thread",
+    )
+    parser.add_argument(
+        "--schedule",
+        choices=["spread", "aligned"],
+        default="spread",
+        help="'spread' offsets each check's start within its interval, 'aligned' starts all checks together. "
+        "Default: spread",
+    )
+    parser.add_argument(
+        "--jitter",
+        type=float,
+        help="Random delay of up to this many seconds added to every run.",
+    )
+    parser.add_argument(
+        "--failures",
+        default=f"{DEFAULT_FAILURES}/{DEFAULT_WINDOW}",
+        help="Failed results among the last M that mark a check down, as N/M. "
+        f"Default: {DEFAULT_FAILURES}/{DEFAULT_WINDOW}",
+    )
+    parser.add_argument(
+        "--recoveries",
+        type=int,
+        default=DEFAULT_RECOVERIES,
+        help=f"Passing results in a row that mark a down check up again. Default: {DEFAULT_RECOVERIES}",
+    )
+    parser.add_argument(
+        "--flap-window",
+        type=int,
+        default=DEFAULT_FLAP_WINDOW,
+        help=f"Results considered for flapping detection, 0 disables it. Default: {DEFAULT_FLAP_WINDOW}",
+    )
+    parser.add_argument(
+        "--adaptive",
+        action="store_true",
+        help="Lengthen the interval of long stable checks and re-check failing ones faster. "
+        "Checks can opt in or out with their 'adaptive' option.",
+    )
+    parser.add_argument(
+        "--adaptive-max-factor",
+        type=float,
+        default=DEFAULT_MAX_FACTOR,
+        help=f"Longest adaptive interval as a multiple of the configured one. Default: {DEFAULT_MAX_FACTOR}",
+    )
+    parser.add_argument(
+        "--probe-budget",
+        type=float,
+        help="Planned probes per second over all adaptive checks, failing checks are only sped up within it.",
+    )
+    parser.add_argument(
+        "--no-coalesce",
+        action="store_true",
+        help="Schedule every check on its own instead of batching the checks of each host.",
+    )
+    parser.add_argument(
+        "--max-per-target",
+        type=int,
+        help="Max concurrent checks against the same target.",
+    )
+    parser.add_argument(
+        "--rate",
+        type=float,
+        help="Max check runs started per second across all targets.",
+    )
+    parser.add_argument(
+        "--rate-per-target",
+        type=float,
+        help="Max check runs started per second against the same target.",
+    )
+    parser.add_argument(
+        "--executor",
+        action="append",
+        default=[],
+        metavar="TYPE=MODE",
+        help=f"Where checks of a type run, MODE is one of {', '.join(EXECUTOR_MODES)}. "
+        "Repeatable, e.g. --executor ping=process. Default: inline",
+    )
+    parser.add_argument(
+        "--process-workers",
+        type=int,
+        help="Worker processes for checks run with the process executor. Default: number of CPUs",
+    )
+    parser.add_argument(
+        "--thread-workers",
+        type=int,
+        default=DEFAULT_THREAD_WORKERS,
+        help=f"Threads for checks run with the thread executor. Default: {DEFAULT_THREAD_WORKERS}",
+    )
+    parser.add_argument(
+        "--browser-workers",
+        type=int,
+        default=browserpool.DEFAULT_POOL_SIZE,
+        help=f"Max browser processes for browser checks. Default: {browserpool.DEFAULT_POOL_SIZE}",
+    )
+    parser.add_argument(
+        "--browser-max-uses",
+        type=int,
+        default=browserpool.DEFAULT_MAX_USES,
+        help=f"Page loads after which a browser process is restarted. Default: {browserpool.DEFAULT_MAX_USES}",
+    )
+    parser.add_argument(
+        "--shard-listen",
+        metavar="HOST:PORT",
+        help="Run as coordinator, sharding checks over workers that connect to this address.",
+    )
+    parser.add_argument(
+        "--local-workers",
+        type=int,
+        default=0,
+        help="Run as coordinator and start this many local worker processes.",
+    )
+    parser.add_argument(
+        "--cluster-key",
+        default=os.environ.get("WATCHTOWER_CLUSTER_KEY"),
+        help="Shared secret workers authenticate with. "
+        "Default: $WATCHTOWER_CLUSTER_KEY, random for local-only clusters",
+    )
+    parser.add_argument(
+        "--state-log-size",
+        type=int,
+        default=DEFAULT_STATE_LOG_CAPACITY,
+        help=f"Number of state transitions kept in memory. Default: {DEFAULT_STATE_LOG_CAPACITY}",
+    )
+    parser.add_argument(
+        "-d",
+        "--data-dir",
+        default="data",
+        help="Directory for the persistent check result history. Default: data",
+    )
+    parser.add_argument(
+        "--screenshot-dir",
+        help="Directory for browser check screenshots. Default: <data-dir>/screenshots",
+    )
+    parser.add_argument(
+        "--screenshot-retention",
+        type=int,
+        default=DEFAULT_SCREENSHOT_RETENTION,
+        help=f"Distinct screenshots kept per browser check. Default: {DEFAULT_SCREENSHOT_RETENTION}",
+    )
+    parser.add_argument(
+        "--no-history",
+        action="store_true",
+        help="Do not persist check results to disk.",
+    )
+    parser.add_argument(
+        "--watch-config",
+        action="store_true",
+        help="Reload the config file when it changes. SIGHUP and POST /api/reload always reload it.",
+    )
+    parser.add_argument(
+        "--watch-interval",
+        type=float,
+        default=DEFAULT_WATCH_INTERVAL,
+        help=f"Seconds between config file change checks. Default: {DEFAULT_WATCH_INTERVAL}",
+    )
+    parser.add_argument(
+        "--alert-webhook",
+        action="append",
+        default=[],
+        metavar="URL",
+        help="POST state change digests as JSON to URL. Repeatable.",
+    )
+    parser.add_argument(
+        "--alert-command",
+        action="append",
+        default=[],
+        metavar="COMMAND",
+        help="Run COMMAND with each state change digest as JSON on stdin. Repeatable.",
+    )
+    parser.add_argument(
+        "--alert-smtp",
+        metavar="HOST[:PORT]",
+        help="Email state change digests through this SMTP server. Needs --alert-email-to.",
+    )
+    parser.add_argument(
+        "--alert-smtp-user",
+        help="SMTP login, the password is read from $WATCHTOWER_SMTP_PASSWORD",
+    )
+    parser.add_argument(
+        "--alert-smtp-starttls",
+        action="store_true",
+        help="Use STARTTLS with the SMTP server.",
+    )
+    parser.add_argument(
+        "--alert-email-to",
+        action="append",
+        default=[],
+        metavar="ADDRESS",
+        help="Recipient of alert emails. Repeatable.",
+    )
+    parser.add_argument(
+        "--alert-email-from",
+        default="watchtower@localhost",
+        help="Sender of alert emails. Default: watchtower@localhost",
+    )
+    parser.add_argument(
+        "--alert-batch-window",
+        type=float,
+        default=DEFAULT_BATCH_WINDOW,
+        help=f"Seconds state changes are collected into one alert. Default: {DEFAULT_BATCH_WINDOW}",
+    )
+    parser.add_argument(
+        "--alert-rate",
+        type=float,
+        default=DEFAULT_RATE_PER_MINUTE,
+        help=f"Alerts per minute per notifier, changes in between are merged. Default: {DEFAULT_RATE_PER_MINUTE}",
+    )
+    parser.add_argument(
+        "--stream-interval",
+        type=float,
+        default=DEFAULT_STREAM_INTERVAL,
+        help="Minimum seconds between /api/stream pushes, changes in between are merged. "
+        f"Default: {DEFAULT_STREAM_INTERVAL}",
+    )
+    parser.add_argument(
+        "--max-streams",
+        type=int,
+        default=DEFAULT_MAX_STREAMS,
+        help=f"Maximum concurrent /api/stream subscribers, each holds a server thread. Default: {DEFAULT_MAX_STREAMS}",
+    )
     args = parser.parse_args()
 
     logger.info("Started WatchTower server")
 
-    appconfig = AppConfig(args.config) if args.config else AppConfig()
+    if not args.no_history:
+        test_suite.result_store = ResultStore(args.data_dir)
+        logger.info("Persisting check results to '%s'", args.data_dir)
 
-    test_suite.initialize_tests(appconfig.config)
+    test_suite.state_log = StateLog(capacity=args.state_log_size)
+    stream_feed.interval = args.stream_interval
+    stream_feed.max_subscribers = args.max_streams
+    test_suite.screenshot_store = ScreenshotStore(
+        args.screenshot_dir or os.path.join(args.data_dir, "screenshots"),
+        retention=args.screenshot_retention,
+    )
+
+    if args.engine == "asyncio":
+        test_suite.scheduler = AsyncScheduler(
+            max_concurrency=args.max_concurrency or DEFAULT_MAX_CONCURRENCY
+        )
+        logger.info("Using asyncio check engine")
+    elif args.max_concurrency:
+        test_suite.scheduler = BackgroundScheduler(
+            executors={"default": ThreadPoolExecutor(args.max_concurrency)}
+        )
+
+    test_suite.spread = args.schedule == "spread"
+    test_suite.jitter = args.jitter
+    test_suite.coalesce = not args.no_coalesce
+    test_suite.adaptive = AdaptivePolicy(
+        enabled=args.adaptive, budget=args.probe_budget, max_factor=args.adaptive_max_factor
+    )
+    try:
+        test_suite.health_policy = HealthPolicy(
+            *parse_failures(args.failures), recoveries=args.recoveries, flap_window=args.flap_window
+        )
+    except ValueError as e:
+        parser.error(str(e))
+    test_suite.executors = CheckExecutors(
+        parse_executor_modes(parser, args.executor),
+        thread_workers=args.thread_workers,
+        process_workers=args.process_workers,
+    )
+    browserpool.configure_pool(size=args.browser_workers, max_uses=args.browser_max_uses)
+    if args.max_per_target or args.rate or args.rate_per_target:
+        test_suite.limiter = ProbeLimiter(
+            max_per_target=args.max_per_target,
+            rate=args.rate,
+            rate_per_target=args.rate_per_target,
+        )
+
+    if args.shard_listen or args.local_workers:
+        if args.shard_listen and not args.cluster_key:
+            parser.error("--shard-listen requires --cluster-key or WATCHTOWER_CLUSTER_KEY")
+        if args.adaptive or args.probe_budget:
+            parser.error("--adaptive and --probe-budget are not supported with --shard-listen or --local-workers")
+        test_suite.coordinator = Coordinator(
+            test_suite,
+            address=parse_address(args.shard_listen) if args.shard_listen else ("127.0.0.1", 0),
+            authkey=args.cluster_key.encode("utf-8") if args.cluster_key else None,
+            local_workers=args.local_workers,
+            worker_engine=args.engine,
+        )
+
+    notifiers = [WebhookNotifier(url, rate_per_minute=args.alert_rate) for url in args.alert_webhook]
+    notifiers += [CommandNotifier(command, rate_per_minute=args.alert_rate) for command in args.alert_command]
+    if args.alert_smtp:
+        if not args.alert_email_to:
+            parser.error("--alert-smtp requires --alert-email-to")
+        smtp_host, _, smtp_port = args.alert_smtp.partition(":")
+        notifiers.append(
+            SmtpNotifier(
+                smtp_host,
+                args.alert_email_from,
+                args.alert_email_to,
+                port=int(smtp_port or 25),
+                username=args.alert_smtp_user,
+                password=os.environ.get("WATCHTOWER_SMTP_PASSWORD"),
+                starttls=args.alert_smtp_starttls,
+                rate_per_minute=args.alert_rate,
+            )
+        )
+    if notifiers:
+        global alert_dispatcher
+        alert_dispatcher = AlertDispatcher(notifiers, batch_window=args.alert_batch_window)
+        alert_dispatcher.attach(test_suite)
+        alert_dispatcher.start()
+
+    global config_file
+    config_file = args.config or DEFAULT_CONF_FILENAME
+    try:
+        appconfig = AppConfig(config_file)
+    except (OSError, InvalidWatchTowerConfigException) as e:
+        parser.exit(1, f"{e}\n")
 
     signal.signal(signal.SIGINT, signal_handler)
+    if hasattr(signal, "SIGHUP"):
+        signal.signal(signal.SIGHUP, reload_handler)
+    if args.watch_config:
+        ConfigWatcher(config_file, reload_config, interval=args.watch_interval).start()
 
-    
+    # Started first, so checks are scheduled as they are added rather than after the whole inventory
     test_suite.start()
     logger.info("Scheduler started")
+    started = time.monotonic()
+    test_suite.initialize_tests(appconfig.config)
+    # Checks live for the whole run, keep the collector from rescanning them
+    gc.freeze()
+    logger.info("Scheduled %s checks in %.2fs", len(test_suite.tests), time.monotonic() - started)
 
     logger.info("Starting web server...")
     app.run(host="0.0.0.0")
@@ -0,0 +1,219 @@
+import json
+import threading
+import time
+from collections import OrderedDict
+from uuid import uuid4
+
+from watchtower.stats import LatencyHistogram
+
+
+# Shared, json.dumps builds a new encoder on every call when given options
+_encoder = json.JSONEncoder(default=str, separators=(",", ":"))
+
+
+def encode(data) -> bytes:
+    return _encoder.encode(data).encode("utf-8")
+
+
+class ScoreboardSnapshot:
+    """Scoreboard document maintained incrementally as results are recorded.
+
+    Each check is encoded once when its result changes, the full document is
+    assembled from those fragments at most once per version and the bytes are
+    reused until the next result comes in.
+    """
+
+    def __init__(self):
+        self.epoch = uuid4().hex[:8]
+        self.version = 0
+        self._lock = threading.Lock()
+        self._changed = threading.Condition(self._lock)
+        self._groups = {}
+        self._changes = OrderedDict()
+        self._deltas = {}
+        self._encoded = None
+        self._removed_version = 0
+        self.encode_time = LatencyHistogram()
+
+    @property
+    def etag(self) -> str:
+        return f"{self.epoch}-{self.version}"
+
+    def add(self, test, group):
+        with self._lock:
+            self._update(test, group)
+
+    def update(self, test, group):
+        with self._lock:
+            self._update(test, group)
+
+    def remove(self, test, group):
+        """Drops a check, clients that saw it are told to refetch the full scoreboard"""
+        with self._lock:
+            entry = self._groups.get(group.name)
+            if entry is None or entry["checks"].pop(test.test_id, None) is None:
+                return
+            if not entry["checks"]:
+                del self._groups[group.name]
+            else:
+                entry["failing_checks"], entry["counts"] = group.state()
+            self._changes.pop(test.test_id, None)
+            self.version += 1
+            self._removed_version = self.version
+            self._deltas.clear()
+            self._encoded = None
+            self._changed.notify_all()
+
+    def _update(self, test, group):
+        entry = self._groups.get(group.name)
+        if entry is None:
+            entry = self._groups[group.name] = {"name": group.name, "checks": {}}
+        entry["failing_checks"], entry["counts"] = group.state()
+        entry["checks"][test.test_id] = encode(test.to_scoreboard_dict())
+        self.version += 1
+        self._changes[test.test_id] = (self.version, group.name)
+        self._changes.move_to_end(test.test_id)
+        self._deltas.clear()
+        self._encoded = None
+        self._changed.notify_all()
+
+    def wait(self, since: int, timeout: float) -> int:
+        """Blocks until the version moves past ``since`` or timeout, returns the version"""
+        with self._changed:
+            self._changed.wait_for(lambda: self.version > since, timeout)
+            return self.version
+
+    def changes_since(self, since: int, epoch: str = None):
+        """Returns (json bytes, version) with the checks updated after version ``since``.
+
+        Walks the change index from the newest entry backwards, so the cost is
+        proportional to the number of changes rather than the number of checks.
+        The result is shared by every subscriber asking for the same version.
+        Clients from another server epoch, from the future, or from before a
+        check was removed get ``full: true`` and should refetch the whole scoreboard.
+        """
+        with self._lock:
+            if (epoch and epoch != self.epoch) or since > self.version or since < self._removed_version:
+                full = {"epoch": self.epoch, "version": self.version, "full": True}
+                return encode(full), self.version
+            if since not in self._deltas:
+                started = time.perf_counter()
+                self._deltas[since] = self._encode_changes(since)
+                self.encode_time.observe((time.perf_counter() - started) * 1000)
+            return self._deltas[since], self.version
+
+    def _encode_changes(self, since):
+        checks = []
+        groups = {}
+        for test_id in reversed(self._changes):
+            version, group_name = self._changes[test_id]
+            if version <= since:
+                break
+            groups[group_name] = entry = self._groups[group_name]
+            checks.append(
+                b'{"group":%s,"check":%s}' % (encode(group_name), entry["checks"][test_id])
+            )
+        checks.reverse()
+
+        return b'{"epoch":%s,"version":%d,"full":false,"totals":%s,"groups":%s,"checks":[%s]}' % (
+            encode(self.epoch),
+            self.version,
+            encode(self._totals()),
+            encode(
+                [
+                    {"name": name, "failing_checks": entry["failing_checks"], "counts": entry["counts"]}
+                    for name, entry in groups.items()
+                ]
+            ),
+            b",".join(checks),
+        )
+
+    def _totals(self) -> dict:
+        """Fleet wide status counts, summed over groups rather than checks"""
+        totals = {"passing": 0, "failing": 0, "pending": 0}
+        for entry in self._groups.values():
+            for status, count in entry["counts"].items():
+                totals[status] += count
+        totals["groups"] = len(self._groups)
+        return totals
+
+    def encoded(self):
+        """Returns (json bytes, etag) for the current version"""
+        with self._lock:
+            if self._encoded is None:
+                started = time.perf_counter()
+                groups = [
+                    b'{"name":%s,"failing_checks":%s,"counts":%s,"checks":[%s]}'
+                    % (
+                        encode(entry["name"]),
+                        encode(entry["failing_checks"]),
+                        encode(entry["counts"]),
+                        b",".join(entry["checks"].values()),
+                    )
+                    for entry in self._groups.values()
+                ]
+                self._encoded = (
+                    b'{"totals":%s,"groups":[%s]}' % (encode(self._totals()), b",".join(groups)),
+                    self.etag,
+                )
+                self.encode_time.observe((time.perf_counter() - started) * 1000)
+            return self._encoded
+
+
+DEFAULT_STREAM_INTERVAL = 1.0
+DEFAULT_MAX_STREAMS = 100
+
+
+class ChangeFeed:
+    """Fans scoreboard changes out to stream subscribers, at most once per ``interval``.
+
+    A single publisher thread waits on the snapshot and bumps the feed's
+    version, so subscribers are woken once per interval however many results
+    come in, and subscribers at the same version share one encoded delta.
+    Each subscriber still holds a server thread, ``max_subscribers`` caps them.
+    """
+
+    def __init__(
+        self,
+        snapshot: ScoreboardSnapshot,
+        interval: float = DEFAULT_STREAM_INTERVAL,
+        max_subscribers: int = DEFAULT_MAX_STREAMS,
+    ):
+        self.snapshot = snapshot
+        self.interval = interval
+        self.max_subscribers = max_subscribers
+        self.version = snapshot.version
+        self.subscribers = 0
+        self._lock = threading.Lock()
+        self._published = threading.Condition(self._lock)
+        self._thread = None
+
+    def subscribe(self) -> bool:
+        """Registers a subscriber, False when the cap is reached"""
+        with self._lock:
+            if self.subscribers >= self.max_subscribers:
+                return False
+            self.subscribers += 1
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._publish, name="watchtower-stream", daemon=True)
+                self._thread.start()
+            return True
+
+    def unsubscribe(self):
+        with self._lock:
+            self.subscribers -= 1
+
+    def wait(self, since: int, timeout: float) -> int:
+        """Blocks until a published version moves past ``since`` or timeout, returns the version"""
+        with self._published:
+            self._published.wait_for(lambda: self.version > since, timeout)
+            return self.version
+
+    def _publish(self):
+        while True:
+            version = self.snapshot.wait(self.version, None)
+            with self._published:
+                self.version = version
+                self._published.notify_all()
+            # Results arriving meanwhile go out together with the next push
+            time.sleep(self.interval)
@@ -0,0 +1,59 @@
+import threading
+from bisect import bisect_left
+
+# Upper bounds in milliseconds, the last bucket is +Inf
+LATENCY_BUCKETS_MS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000)
+
+
+class LatencyHistogram:
+    """Streaming histogram with fixed bucket bounds, constant memory per check"""
+
+    __slots__ = ("bounds", "counts", "count", "sum", "max", "_lock")
+
+    def __init__(self, bounds=LATENCY_BUCKETS_MS):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = None
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        with self._lock:
+            self.counts[bisect_left(self.bounds, value)] += 1
+            self.count += 1
+            self.sum += value
+            self.max = value if self.max is None else max(self.max, value)
+
+    def cumulative_counts(self):
+        """Returns [(upper bound, count <= bound)] ending with (inf, total)"""
+        total = 0
+        buckets = []
+        for bound, count in zip(self.bounds + (float("inf"),), self.counts):
+            total += count
+            buckets.append((bound, total))
+        return buckets
+
+    def quantile(self, q: float):
+        """Estimates a quantile by linear interpolation within its bucket"""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for i, count in enumerate(self.counts):
+            if count and seen + count >= rank:
+                lower = self.bounds[i - 1] if i else 0
+                upper = self.bounds[i] if i < len(self.bounds) else self.max
+                return round(min(lower + (upper - lower) * (rank - seen) / count, self.max), 3)
+            seen += count
+        return self.max
+
+    def to_dict(self):
+        return {
+            "count": self.count,
+            "mean": round(self.sum / self.count, 3) if self.count else None,
+            "p50": self.quantile(0.5),
+            "p90": self.quantile(0.9),
+            "p99": self.quantile(0.99),
+            "max": self.max,
+        }
@@ -0,0 +1,322 @@
+import mmap
+import os
+import struct
+import threading
+import time
+from collections import defaultdict
+
+from watchtower.logging_config import logger
+
+DETAIL_SIZE = 47
+# timestamp, check index, latency (ms, NaN when unknown), outcome (1 pass, 0 fail, -1 none), detail
+RECORD = struct.Struct(f"<dIfb{DETAIL_SIZE}s")
+# minute start, check index, runs, failures, latency sum, latency min, latency max
+ROLLUP = struct.Struct("<IIHHfff")
+
+SEGMENT_SUFFIX = ".seg"
+ROLLUP_SUFFIX = ".roll"
+INDEX_FILENAME = "checks.idx"
+
+DEFAULT_SEGMENT_SECONDS = 3600
+DEFAULT_RAW_RETENTION = 24 * 3600
+DEFAULT_ROLLUP_RETENTION = 35 * 24 * 3600
+DEFAULT_FLUSH_INTERVAL = 1
+DEFAULT_COMPACT_INTERVAL = 60
+READ_CHUNK_RECORDS = 4096
+MAX_QUERY_LIMIT = 1000
+
+
+def encode_outcome(result) -> int:
+    return -1 if result is None else int(bool(result))
+
+
+def decode_outcome(value: int):
+    return None if value < 0 else bool(value)
+
+
+def encode_detail(detail) -> bytes:
+    return str(detail or "").encode("utf-8")[:DETAIL_SIZE].decode("utf-8", "ignore").encode("utf-8")
+
+
+class ResultStore:
+    """Append-only on-disk history of every check execution.
+
+    Results are packed into fixed-width records, buffered in memory and flushed
+    by a background thread into one segment file per ``segment_seconds``. Records
+    are timestamped on append so each segment is sorted by time and is searched
+    through a read-only mmap. A record torn by a crash mid-write is cut off when
+    the store is opened. Segments older than ``raw_retention`` are compacted
+    into per-minute rollups, rollups older than ``rollup_retention`` are deleted,
+    which keeps disk usage bounded by the retention windows.
+    """
+
+    def __init__(
+        self,
+        data_dir: str,
+        segment_seconds: int = DEFAULT_SEGMENT_SECONDS,
+        raw_retention: int = DEFAULT_RAW_RETENTION,
+        rollup_retention: int = DEFAULT_ROLLUP_RETENTION,
+        flush_interval: float = DEFAULT_FLUSH_INTERVAL,
+        compact_interval: float = DEFAULT_COMPACT_INTERVAL,
+    ):
+        self.data_dir = data_dir
+        self.segment_seconds = segment_seconds
+        self.raw_retention = raw_retention
+        self.rollup_retention = rollup_retention
+        self.flush_interval = flush_interval
+        self.compact_interval = compact_interval
+        os.makedirs(data_dir, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._buffer = bytearray()
+        self._last_timestamp = 0.0
+        self._check_ids = []
+        self._check_index = {}
+        self._load_index()
+        self._truncate_torn_records()
+
+        self._stopped = threading.Event()
+        self._threads = []
+
+    def start(self):
+        self._stopped.clear()
+        self._threads = [
+            threading.Thread(target=self._run_every, args=(self.flush_interval, self.flush), daemon=True),
+            threading.Thread(target=self._run_every, args=(self.compact_interval, self.compact), daemon=True),
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        for thread in self._threads:
+            thread.join()
+        self.flush()
+
+    def _run_every(self, interval, func):
+        while not self._stopped.wait(interval):
+            try:
+                func()
+            except Exception:
+                logger.exception("Result store %s failed", func.__name__)
+
+    # Check index
+
+    def _load_index(self):
+        path = os.path.join(self.data_dir, INDEX_FILENAME)
+        if not os.path.exists(path):
+            return
+        with open(path, "r", encoding="utf-8") as index_file:
+            for line in index_file:
+                test_id = line.strip()
+                if test_id:
+                    self._check_index[test_id] = len(self._check_ids)
+                    self._check_ids.append(test_id)
+
+    def _index_for(self, test_id: str) -> int:
+        index = self._check_index.get(test_id)
+        if index is None:
+            with open(os.path.join(self.data_dir, INDEX_FILENAME), "a", encoding="utf-8") as index_file:
+                index_file.write(f"{test_id}\n")
+            index = self._check_index[test_id] = len(self._check_ids)
+            self._check_ids.append(test_id)
+        return index
+
+    def _truncate_torn_records(self):
+        """Cuts a partial record off the end of each segment, later appends would be misaligned"""
+        for _, path in self._files(SEGMENT_SUFFIX):
+            size = os.path.getsize(path)
+            if size % RECORD.size:
+                logger.warning("Truncating %s partial bytes at the end of %s", size % RECORD.size, path)
+                os.truncate(path, size - size % RECORD.size)
+
+    # Writing
+
+    def append(self, test_id: str, result, latency=None, detail=None) -> float:
+        """Buffers one check execution, returns the timestamp it was stored with"""
+        with self._lock:
+            timestamp = max(time.time(), self._last_timestamp)
+            self._last_timestamp = timestamp
+            self._buffer += RECORD.pack(
+                timestamp,
+                self._index_for(test_id),
+                float("nan") if latency is None else latency,
+                encode_outcome(result),
+                encode_detail(detail),
+            )
+        return timestamp
+
+    def flush(self):
+        with self._write_lock:
+            with self._lock:
+                data, self._buffer = self._buffer, bytearray()
+            if not data:
+                return
+            # Split the buffer on segment boundaries, records are in time order
+            offset = 0
+            while offset < len(data):
+                segment = self._segment_start(RECORD.unpack_from(data, offset)[0])
+                end = offset + RECORD.size
+                while end < len(data) and self._segment_start(RECORD.unpack_from(data, end)[0]) == segment:
+                    end += RECORD.size
+                with open(self._segment_path(segment), "ab") as segment_file:
+                    segment_file.write(data[offset:end])
+                offset = end
+
+    def _segment_start(self, timestamp: float) -> int:
+        return int(timestamp // self.segment_seconds * self.segment_seconds)
+
+    def _segment_path(self, start: int) -> str:
+        return os.path.join(self.data_dir, f"results-{start}{SEGMENT_SUFFIX}")
+
+    def _files(self, suffix):
+        files = []
+        for filename in os.listdir(self.data_dir):
+            if filename.endswith(suffix):
+                start = int(filename[: -len(suffix)].rsplit("-", 1)[1])
+                files.append((start, os.path.join(self.data_dir, filename)))
+        return sorted(files)
+
+    # Reading
+
+    @staticmethod
+    def _bisect(mapped, timestamp, right=False):
+        """Offset of the first record at or after ``timestamp`` (after it with ``right``)"""
+        low, high = 0, len(mapped) // RECORD.size
+        while low < high:
+            mid = (low + high) // 2
+            found = struct.unpack_from("<d", mapped, mid * RECORD.size)[0]
+            if found < timestamp or (right and found == timestamp):
+                low = mid + 1
+            else:
+                high = mid
+        return low * RECORD.size
+
+    def iter_records(self, since=None, until=None):
+        """Yields (timestamp, test_id, result, latency, detail) for flushed raw records"""
+        for start, path in self._files(SEGMENT_SUFFIX):
+            if until is not None and start > until:
+                break
+            if since is not None and start + self.segment_seconds <= since:
+                continue
+            with open(path, "rb") as segment_file:
+                if os.fstat(segment_file.fileno()).st_size < RECORD.size:
+                    continue
+                with mmap.mmap(segment_file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                    size = len(mapped) - len(mapped) % RECORD.size
+                    offset = self._bisect(mapped, since) if since is not None else 0
+                    while offset < size:
+                        chunk = mapped[offset : min(offset + READ_CHUNK_RECORDS * RECORD.size, size)]
+                        offset += len(chunk)
+                        for timestamp, index, latency, outcome, detail in RECORD.iter_unpack(chunk):
+                            if until is not None and timestamp > until:
+                                return
+                            yield (
+                                timestamp,
+                                self._check_ids[index],
+                                decode_outcome(outcome),
+                                None if latency != latency else latency,
+                                detail.rstrip(b"\x00").decode("utf-8", "ignore"),
+                            )
+
+    def query(self, test_id: str, since=None, until=None, limit=None) -> list:
+        """Returns the check's most recent ``limit`` records between since and until, oldest first.
+
+        Segments are read newest first and within each segment only the time
+        window is scanned, so the cost depends on how far back the last
+        ``limit`` results go rather than on the size of the store.
+        """
+        index = self._check_index.get(test_id)
+        if index is None:
+            return []
+        records = []
+        for start, path in reversed(self._files(SEGMENT_SUFFIX)):
+            if since is not None and start + self.segment_seconds <= since:
+                break
+            if until is not None and start > until:
+                continue
+            records += self._segment_records(path, index, since, until, limit and limit - len(records))
+            if limit and len(records) >= limit:
+                break
+        records.reverse()
+        return [
+            {
+                "timestamp": timestamp,
+                "result": decode_outcome(outcome),
+                "latency": None if latency != latency else latency,
+                "detail": detail.rstrip(b"\x00").decode("utf-8", "ignore"),
+            }
+            for timestamp, _, latency, outcome, detail in records
+        ]
+
+    def _segment_records(self, path, index, since, until, limit) -> list:
+        """Raw records of check ``index`` in one segment, newest first"""
+        records = []
+        with open(path, "rb") as segment_file:
+            if os.fstat(segment_file.fileno()).st_size < RECORD.size:
+                return records
+            with mmap.mmap(segment_file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                size = len(mapped) - len(mapped) % RECORD.size
+                low = self._bisect(mapped, since) if since is not None else 0
+                end = min(self._bisect(mapped, until, right=True), size) if until is not None else size
+                while end > low:
+                    begin = max(low, end - READ_CHUNK_RECORDS * RECORD.size)
+                    chunk = mapped[begin:end]
+                    end = begin
+                    for record in reversed(list(RECORD.iter_unpack(chunk))):
+                        if record[1] == index:
+                            records.append(record)
+                            if limit and len(records) >= limit:
+                                return records
+        return records
+
+    def iter_rollups(self, since=None):
+        """Yields (minute, test_id, runs, failures, latency_sum, latency_min, latency_max)"""
+        for start, path in self._files(ROLLUP_SUFFIX):
+            if since is not None and start + self.segment_seconds <= since:
+                continue
+            with open(path, "rb") as rollup_file:
+                for minute, index, runs, failures, total, low, high in ROLLUP.iter_unpack(
+                    rollup_file.read()
+                ):
+                    yield minute, self._check_ids[index], runs, failures, total, low, high
+
+    # Compaction
+
+    def compact(self):
+        now = time.time()
+        for start, path in self._files(SEGMENT_SUFFIX):
+            if start + self.segment_seconds > now - self.raw_retention:
+                break
+            self._downsample(start, path)
+        for start, path in self._files(ROLLUP_SUFFIX):
+            if start + self.segment_seconds <= now - self.rollup_retention:
+                os.remove(path)
+                logger.debug("Removed expired rollup %s", path)
+
+    def _downsample(self, start, path):
+        rollups = defaultdict(lambda: [0, 0, 0.0, float("inf"), float("-inf")])
+        with open(path, "rb") as segment_file:
+            data = segment_file.read()
+        size = len(data) - len(data) % RECORD.size
+        for timestamp, index, latency, outcome, _ in RECORD.iter_unpack(data[:size]):
+            rollup = rollups[(int(timestamp // 60 * 60), index)]
+            rollup[0] += 1
+            rollup[1] += outcome == 0
+            if latency == latency:
+                rollup[2] += latency
+                rollup[3] = min(rollup[3], latency)
+                rollup[4] = max(rollup[4], latency)
+
+        rollup_path = os.path.join(self.data_dir, f"rollups-{start}{ROLLUP_SUFFIX}")
+        with open(rollup_path + ".tmp", "wb") as rollup_file:
+            for (minute, index), (runs, failures, total, low, high) in sorted(rollups.items()):
+                if low > high:
+                    low = high = float("nan")
+                rollup_file.write(
+                    ROLLUP.pack(minute, index, min(runs, 0xFFFF), min(failures, 0xFFFF), total, low, high)
+                )
+        os.replace(rollup_path + ".tmp", rollup_path)
+        os.remove(path)
+        logger.debug("Compacted %s into %s", path, rollup_path)
@@ -1,56 +1,253 @@
+import asyncio
+import threading
 import time
-from datetime import datetime
+from collections import Counter
+from datetime import datetime, timedelta, timezone
 from typing import Callable
+from uuid import UUID, uuid5
 
+from apscheduler.events import EVENT_JOB_SUBMITTED
+from apscheduler.jobstores.base import JobLookupError
 from apscheduler.schedulers.background import BackgroundScheduler
+from apscheduler.triggers.date import DateTrigger
 from apscheduler.triggers.interval import IntervalTrigger
 from rich import print
+from watchtower import browserpool, httppool
+from watchtower.adaptive import AdaptivePolicy, AdaptiveTrigger, next_run
+from watchtower.batch import HostBatch
 from watchtower.checks import SchedulableCheck, BrowserCheck, DnsCheck, HttpStatusCheck, PingCheck, SpeedTestCheck, TcpCheck
 from watchtower.config import AppConfig
-from watchtower.models import Config, Host, Check, CheckTypes
+from watchtower.dependencies import DependencyGraph
+from watchtower.engine import AsyncScheduler
+from watchtower.executors import CheckExecutors
+from watchtower.health import HealthPolicy
+from watchtower.models import DEFAULT_GROUP, Config, Host, Check, CheckTypes
 from watchtower.logging_config import logger
 from watchtower.exceptions import CheckNotFoundError
+from watchtower.metrics import EngineStats, MetricsRegistry
+from watchtower.ratelimit import ProbeLimiter, next_slot
+from watchtower.rollups import RollupIndex
+from watchtower.snapshot import ScoreboardSnapshot
+from watchtower.util import gc_paused
+
+
+PASSING = "passing"
+FAILING = "failing"
+PENDING = "pending"
+
+
+def check_status(result) -> str:
+    if result is True:
+        return PASSING
+    if result is False:
+        return FAILING
+    return PENDING
+
+
+class StatusCounts:
+    """Number of passing, failing and pending checks"""
+
+    __slots__ = (PASSING, FAILING, PENDING)
+
+    def __init__(self):
+        self.passing = 0
+        self.failing = 0
+        self.pending = 0
+
+    def move(self, old: str = None, new: str = None):
+        if old:
+            setattr(self, old, getattr(self, old) - 1)
+        if new:
+            setattr(self, new, getattr(self, new) + 1)
+
+    @property
+    def total(self) -> int:
+        return self.passing + self.failing + self.pending
+
+    def to_dict(self) -> dict:
+        return {PASSING: self.passing, FAILING: self.failing, PENDING: self.pending}
 
 
 class TestGroup:
-    def __init__(self, name:str ):
+    def __init__(self, name: str, lock=None):
         self.name = name
-        self.failing_checks = []
-        self.checks = []
+        self.checks = {}
+        self.counts = StatusCounts()
+        self._status = {}
+        # Insertion ordered set of failing test_ids
+        self._failing = {}
+        self._lock = lock or threading.Lock()
 
-    def add(self, test: SchedulableCheck):
-        self.checks.append(test)
+    @property
+    def failing_checks(self) -> list:
+        with self._lock:
+            return list(self._failing)
 
+    def state(self):
+        """Returns (failing test_ids, counts) read together"""
+        with self._lock:
+            return list(self._failing), self.counts.to_dict()
+
+
+class GroupIndex:
+    """Groups by name, with status counts per group and for the whole fleet.
+
+    Every membership and status change goes through one lock, so a group's
+    failing set, its counts and the fleet counts always agree and readers get
+    totals without walking the checks.
+    """
 
-class StateLog:
     def __init__(self):
-        self.log = []
-        # TODO: config max logs and truncate when hit
+        self._groups = {}
+        self.fleet = StatusCounts()
+        self._lock = threading.Lock()
+
+    def __iter__(self):
+        with self._lock:
+            return iter(list(self._groups.values()))
+
+    def __len__(self):
+        return len(self._groups)
+
+    def get(self, name: str) -> TestGroup:
+        return self._groups.get(name)
+
+    def add(self, group_name: str, test: SchedulableCheck) -> TestGroup:
+        status = check_status(test.health.state)
+        with self._lock:
+            group = self._groups.get(group_name)
+            if group is None:
+                logger.debug("Creating Group: %s", group_name)
+                group = self._groups[group_name] = TestGroup(group_name, self._lock)
+            group.checks[test.test_id] = test
+            self._move(group, test.test_id, None, status)
+        return group
 
-    def add(self, state):
-        self.log.append(state)
+    def remove(self, test: SchedulableCheck, group: TestGroup):
+        with self._lock:
+            if group.checks.pop(test.test_id, None) is None:
+                return
+            self._move(group, test.test_id, group._status.pop(test.test_id), None)
+            if not group.checks:
+                del self._groups[group.name]
+
+    def record(self, test: SchedulableCheck, group: TestGroup, result):
+        new = check_status(result)
+        with self._lock:
+            old = group._status.get(test.test_id)
+            if old != new and group.checks.get(test.test_id) is test:
+                self._move(group, test.test_id, old, new)
+
+    def _move(self, group: TestGroup, test_id: str, old: str, new: str):
+        if new:
+            group._status[test_id] = new
+        group.counts.move(old, new)
+        self.fleet.move(old, new)
+        if new == FAILING:
+            group._failing[test_id] = None
+        elif old == FAILING:
+            del group._failing[test_id]
+
+    def totals(self) -> dict:
+        with self._lock:
+            return dict(self.fleet.to_dict(), groups=len(self._groups))
+
+
+DEFAULT_STATE_LOG_CAPACITY = 10000
+DEFAULT_STATE_LOG_PAGE_SIZE = 100
+MAX_STATE_LOG_PAGE_SIZE = 1000
 
-    def to_json(self):
-        results = []
-        for state in self.log:
-            results.append(state.__dict__)
-        container = {"state_log": results}
-        return container
+
+class StateLog:
+    """Fixed capacity ring buffer of state transitions, oldest entries are overwritten.
+
+    Every transition gets an absolute sequence number which doubles as the pagination
+    cursor. Timestamps are kept non-decreasing in insertion order, so time range
+    queries are a binary search over the buffer.
+    """
+
+    def __init__(self, capacity: int = DEFAULT_STATE_LOG_CAPACITY):
+        self.capacity = capacity
+        self.log = [None] * capacity
+        self._next = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return self._next - self._first
+
+    @property
+    def _first(self):
+        return max(0, self._next - self.capacity)
+
+    def add(self, state):
+        with self._lock:
+            if self._next:
+                previous = self.log[(self._next - 1) % self.capacity]
+                state.timestamp = max(state.timestamp, previous.timestamp)
+            self.log[self._next % self.capacity] = state
+            self._next += 1
+
+    def _bisect(self, timestamp, right=False):
+        low, high = self._first, self._next
+        while low < high:
+            mid = (low + high) // 2
+            ts = self.log[mid % self.capacity].timestamp
+            if ts < timestamp or (right and ts == timestamp):
+                low = mid + 1
+            else:
+                high = mid
+        return low
+
+    def query(self, since=None, until=None, limit=DEFAULT_STATE_LOG_PAGE_SIZE, cursor=None):
+        """Returns (states, next_cursor) for transitions between since and until (epoch seconds)"""
+        with self._lock:
+            start = self._first
+            if since is not None:
+                start = self._bisect(since)
+            if cursor is not None:
+                start = max(start, cursor)
+            end = self._bisect(until, right=True) if until is not None else self._next
+            stop = min(end, start + limit)
+            states = [self.log[i % self.capacity] for i in range(start, stop)]
+            return states, (stop if stop < end else None)
+
+    def to_json(self, **query):
+        states, next_cursor = self.query(**query)
+        return {"state_log": [state.to_dict() for state in states], "next_cursor": next_cursor}
 
 
 class State:
-    def __init__(self, test, previous_state, latest_state):
-        self.test = test.__dict__
+    __slots__ = ("test_id", "previous_state", "latest_state", "flapping", "timestamp")
+
+    def __init__(self, test, previous_state, latest_state, timestamp=None, flapping=False):
+        self.test_id = test.test_id
         self.previous_state = previous_state
         self.latest_state = latest_state
-        self.timestamp = datetime.now()
+        self.flapping = flapping
+        self.timestamp = timestamp or time.time()
+
+    def to_dict(self):
+        return {
+            "test_id": self.test_id,
+            "previous_state": self.previous_state,
+            "latest_state": self.latest_state,
+            "flapping": self.flapping,
+            "timestamp": self.timestamp,
+            "time": datetime.fromtimestamp(self.timestamp).strftime("%Y-%m-%d %H:%M:%S"),
+        }
 
 
+# Seconds between dependency levels when checks behind a recovered host are resumed
+RESUME_STAGGER = 2
+
+TEST_ID_NAMESPACE = UUID("6f0c2a8e-4f7b-4c55-9a3e-1d2b7f9c0e41")
+
 check_mapping = {
     "ping": PingCheck,
     "browser": BrowserCheck,
     "http_status": HttpStatusCheck,
     "tcp": TcpCheck,
+    "port": TcpCheck,
     "dns": DnsCheck,
     "speedtest": SpeedTestCheck
     # Add more mappings as needed
@@ -62,92 +259,460 @@ def get_check_class(check_name:str) -> Callable:
     return check_mapping.get(check_name)
 
 
+def stable_test_id(host: Host, check: Check, ordinal: int = 0) -> str:
+    """Returns a test_id that stays the same for the same config entry across restarts"""
+    key = f"{host.group}|{host.name}|{host.target}|{check.type}|{check.display_name}|{ordinal}"
+    return str(uuid5(TEST_ID_NAMESPACE, key))
+
+
 class TestSuite:
-    def __init__(self, scheduler=None, state_log=None):
+    def __init__(
+        self,
+        scheduler=None,
+        state_log=None,
+        result_store=None,
+        spread: bool = False,
+        jitter: float = None,
+        limiter: ProbeLimiter = None,
+        coalesce: bool = False,
+        screenshot_store=None,
+        executors: CheckExecutors = None,
+        health_policy: HealthPolicy = None,
+        adaptive: AdaptivePolicy = None,
+    ):
         self.scheduler = scheduler or BackgroundScheduler()
         self.state_log = state_log or StateLog()        
-        self.groups = []
-
-
-    def reload(self):
-        self.groups = []        
-        self.stop()
-        self.start()
+        self.result_store = result_store
+        self.spread = spread
+        self.jitter = jitter
+        self.limiter = limiter
+        self.coalesce = coalesce
+        self.screenshot_store = screenshot_store
+        self.executors = executors or CheckExecutors()
+        self.health_policy = health_policy or HealthPolicy()
+        self.adaptive = adaptive or AdaptivePolicy()
+        self.subscribers = []
+        self.batches = {}
+        self.tests = {}
+        self.definitions = {}
+        self.coordinator = None
+        self.snapshot = ScoreboardSnapshot()
+        self.rollups = RollupIndex()
+        self.metrics = MetricsRegistry()
+        self.engine_stats = EngineStats()
+        self.groups = GroupIndex()
+        self.dependencies = DependencyGraph()
+        self.initialized = threading.Event()
+        self._triggers = {}
+        self._reload_lock = threading.Lock()
+        self._dependency_lock = threading.Lock()
+
+
+    @property
+    def version(self) -> int:
+        """Monotonically increasing number bumped for every recorded result"""
+        return self.snapshot.version
+
+    def reload(self, config: Config) -> dict:
+        """Applies a new config to the running suite, touching only checks that changed.
+
+        Checks are matched by their stable test_id. New ones are scheduled,
+        missing or disabled ones unscheduled, and ones whose interval or options
+        changed are rebuilt keeping their last result and latency.
+        Unchanged checks keep running on their existing jobs.
+        """
+        with self._reload_lock, gc_paused():
+            reachability_changed = self.dependencies.configure(config.hosts)
+            desired = {test_id: (host, check) for test_id, host, check in self._config_checks(config)}
+            removed = [test_id for test_id in self.tests if test_id not in desired]
+            for test_id in removed:
+                self.remove_test(test_id)
+                del self.definitions[test_id]
+            added = changed = 0
+            for test_id, (host, check) in desired.items():
+                previous = self.definitions.get(test_id)
+                if previous == check:
+                    continue
+                test = self._build_test(test_id, host, check)
+                if previous is None:
+                    added += 1
+                else:
+                    changed += 1
+                    self._carry_state(self.tests[test_id][0], test)
+                    self.remove_test(test_id)
+                self.add_test(host=host, check=test)
+                self.definitions[test_id] = check
+            self._reachability_changed(reachability_changed)
+            summary = {
+                "added": added,
+                "removed": len(removed),
+                "changed": changed,
+                "unchanged": len(desired) - added - changed,
+            }
+        logger.info(
+            "Reloaded config: %(added)s added, %(removed)s removed, %(changed)s changed, %(unchanged)s unchanged",
+            summary,
+        )
+        return summary
+
+    @staticmethod
+    def _carry_state(previous: SchedulableCheck, test: SchedulableCheck):
+        """Copies the last result of a check being replaced onto its rebuilt instance"""
+        for field in ("last_run_successful", "last_run_time", "last_run_duration", "latency") + previous.outcome_fields:
+            setattr(test, field, getattr(previous, field))
+        test.health.copy_from(previous.health)
+
+    def subscribe(self, callback: Callable):
+        """Calls ``callback(state)`` with every confirmed State transition"""
+        self.subscribers.append(callback)
 
     def start(self):
+        if isinstance(self.scheduler, BackgroundScheduler):
+            self.scheduler.add_listener(self.engine_stats.job_submitted, EVENT_JOB_SUBMITTED)
+        if self.result_store:
+            self.result_store.start()
+            threading.Thread(
+                target=self.load_history, args=(time.time(),), name="watchtower-load-history", daemon=True
+            ).start()
         self.scheduler.start()
+        if self.coordinator:
+            self.coordinator.start()
+
+    def load_history(self, until: float):
+        """Seeds the uptime rollups from results persisted before ``until``"""
+        # The suite may be started before its checks are loaded, so the first ones run sooner
+        self.initialized.wait()
+        group_names = {test_id: group.name for test_id, (_, group) in list(self.tests.items())}
+        started = time.monotonic()
+        self.rollups.load(self.result_store, group_names, until)
+        logger.info("Loaded result history in %.1fs", time.monotonic() - started)
 
     def stop(self):
+        if self.coordinator:
+            self.coordinator.stop()
         self.scheduler.shutdown()
-
-    def _group_tests(self, check, group_name):
-        matching_group = [group for group in self.groups if group.name == group_name]
-        if len(matching_group) == 1:
-            group = matching_group[0]
-            logger.debug(f"Group: '{group.name}' already exists.")  # debug log
-            group.add(check)
-        elif len(matching_group) == 0:
-            logger.debug(f"Creating Group: {group_name} ")  # debug log
-            group = TestGroup(group_name)
-            group.add(check)
-            self.groups.append(group)
-        return group
+        self.executors.shutdown()
+        httppool.close()
+        browserpool.shutdown_pool()
+        if self.screenshot_store:
+            self.screenshot_store.flush()
+        if self.result_store:
+            self.result_store.stop()
 
     def add_test(self, host: Host, check: SchedulableCheck):
-        if not host.group:
-            group = "Ungrouped"
-
-        g = self._group_tests(check, host.group)
-
-        trigger = IntervalTrigger(seconds=check.interval)
-        self.scheduler.add_job(self.run_test, trigger=trigger, args=(check, g))
+        try:
+            check.health.policy = self.health_policy.with_options(check.options)
+        except ValueError as e:
+            logger.warning("Check %s on %s: %s, using the default thresholds", check.name, check.target, e)
+            check.health.policy = self.health_policy
+        g = self.groups.add(host.group or DEFAULT_GROUP, check)
+        self.tests[check.test_id] = (check, g)
+        check.suppressed = self.dependencies.suppressed(host.name)
+        self._reachability_changed(self.dependencies.track(check.test_id, host.name, check.health.state))
+        self.snapshot.add(check, g)
+        self.metrics.register(check, g)
+        if hasattr(check, "screenshot_store"):
+            check.screenshot_store = self.screenshot_store
+
+        if self.coordinator:
+            # Sharded mode, a worker node runs the check and streams results back
+            return self.coordinator.assign(host, check)
+
+        check.adaptive = self.adaptive.interval_for(check)
+        # Adaptive checks keep their own job, their interval drifts away from the host batch's
+        if self.coalesce and not check.adaptive:
+            return self._add_to_batch(host, check, g)
+
+        run_func = self.run_test_async if isinstance(self.scheduler, AsyncScheduler) else self.run_test
+        self.scheduler.add_job(run_func, trigger=self._trigger(check), args=(check, g), id=check.test_id)
+
+    def remove_test(self, test_id: str):
+        """Unschedules a check and drops it from the scoreboard"""
+        test, group = self.tests.pop(test_id)
+        if self.coordinator:
+            self.coordinator.unassign(test)
+        elif test.adaptive:
+            self.scheduler.remove_job(test_id)
+            self.adaptive.release(test.adaptive)
+        elif self.coalesce:
+            key = (test.target, test.interval)
+            batch = self.batches[key]
+            batch.remove(test)
+            if not batch:
+                del self.batches[key]
+                self.scheduler.remove_job(batch.test_id)
+        else:
+            self.scheduler.remove_job(test_id)
+        self.groups.remove(test, group)
+        self._reachability_changed(self.dependencies.untrack(test_id))
+        self.snapshot.remove(test, group)
+        self.metrics.unregister(test_id)
+        self.engine_stats.forget(test_id)
+
+    def _add_to_batch(self, host: Host, check: SchedulableCheck, group: TestGroup):
+        """Adds the check to its host's batch, scheduling the batch when it is new"""
+        key = (host.target, check.interval)
+        batch = self.batches.get(key)
+        if batch is None:
+            batch = self.batches[key] = HostBatch(host.target, check.interval)
+            run_func = self.run_batch_async if isinstance(self.scheduler, AsyncScheduler) else self.run_batch
+            self.scheduler.add_job(run_func, trigger=self._trigger(batch), args=(batch,), id=batch.test_id)
+        batch.add(check, group)
+
+    def _trigger(self, check: SchedulableCheck) -> IntervalTrigger:
+        """Builds the check's trigger, spreading start times over the interval when enabled"""
+        jitter = check.options.get("jitter", self.jitter) or None
+        adaptive = getattr(check, "adaptive", None)
+        if adaptive:
+            start_date = None
+            if self.spread:
+                start_date = datetime.fromtimestamp(next_slot(check.test_id, check.interval), timezone.utc)
+            return AdaptiveTrigger(adaptive, start_date)
+        if not self.spread:
+            # Triggers are stateless, checks with the same interval share one
+            key = (check.interval, jitter)
+            if key not in self._triggers:
+                self._triggers[key] = IntervalTrigger(seconds=check.interval, jitter=jitter)
+            return self._triggers[key]
+        start_date = datetime.fromtimestamp(next_slot(check.test_id, check.interval), timezone.utc)
+        return IntervalTrigger(seconds=check.interval, start_date=start_date, jitter=jitter)
 
     def run_test(self, test, group):
-        last_state = test.last_run_successful
-        test_result = test.run()
+        self.engine_stats.job_started()
+        return self._run_limited(test, group)
+
+    def _run_limited(self, test, group):
+        if test.suppressed:
+            return None
+        if not self.limiter:
+            return self._run_test(test, group)
+        with self.limiter.slot(test.target, timeout=test.interval) as acquired:
+            if not acquired:
+                self.engine_stats.run_skipped(test)
+                return None
+            return self._run_test(test, group)
+
+    async def run_test_async(self, test, group):
+        self.engine_stats.job_started()
+        return await self._run_limited_async(test, group)
+
+    async def _run_limited_async(self, test, group):
+        if test.suppressed:
+            return None
+        if not self.limiter:
+            return await self._run_test_async(test, group)
+        async with self.limiter.async_slot(test.target, timeout=test.interval) as acquired:
+            if not acquired:
+                self.engine_stats.run_skipped(test)
+                return None
+            return await self._run_test_async(test, group)
+
+    def run_batch(self, batch: HostBatch):
+        self.engine_stats.job_started()
+        if batch.suppressed:
+            return
+        address, dns_failed = batch.literal_address, False
+        for test, group in batch.dns_checks:
+            result = self._run_limited(test, group)
+            # Only an A lookup on the default resolver says anything about the address the probes use
+            if test.resolves_address:
+                if result:
+                    address = address or test.address
+                dns_failed = dns_failed or result is False
+        if address is None and batch.needs_address and not dns_failed:
+            address = batch.resolve()
+        runnable, unresolved = batch.probe_checks(address)
+        for test, group in unresolved:
+            self._fail_unresolved(batch, test, group)
+        batch.share_address(address)
+        try:
+            for test, group in runnable:
+                self._run_limited(test, group)
+        finally:
+            batch.share_address(None)
+
+    async def run_batch_async(self, batch: HostBatch):
+        self.engine_stats.job_started()
+        if batch.suppressed:
+            return
+        address, dns_failed = batch.literal_address, False
+        dns_checks = batch.dns_checks
+        results = await asyncio.gather(*(self._run_limited_async(test, group) for test, group in dns_checks))
+        for (test, _), result in zip(dns_checks, results):
+            if test.resolves_address:
+                if result:
+                    address = address or test.address
+                dns_failed = dns_failed or result is False
+        if address is None and batch.needs_address and not dns_failed:
+            # No A lookup ran (none configured, or skipped by probe limits)
+            address = await batch.resolve_async()
+        runnable, unresolved = batch.probe_checks(address)
+        for test, group in unresolved:
+            self._fail_unresolved(batch, test, group)
+        batch.share_address(address)
+        try:
+            await asyncio.gather(*(self._run_limited_async(test, group) for test, group in runnable))
+        finally:
+            batch.share_address(None)
+
+    def _fail_unresolved(self, batch: HostBatch, test, group):
+        """Records a failure for a check whose target did not resolve, without probing"""
+        if test.suppressed:
+            return None
+        test.timings = {}
+        self.engine_stats.run_started(test)
+        started = time.monotonic()
+        test_result = batch.unresolved(test)
+        return self.record_result(test, group, test_result, (time.monotonic() - started) * 1000)
+
+    def _run_test(self, test, group):
+        test.timings = {}
+        self.engine_stats.run_started(test)
+        started = time.monotonic()
+        test_result = self.executors.run(test)
+        return self.record_result(test, group, test_result, (time.monotonic() - started) * 1000)
+
+    async def _run_test_async(self, test, group):
+        test.timings = {}
+        self.engine_stats.run_started(test)
+        started = time.monotonic()
+        test_result = await self.executors.run_async(test)
+        return self.record_result(test, group, test_result, (time.monotonic() - started) * 1000)
+
+    def record_result(self, test, group, test_result, duration=None):
+        if self.tests.get(test.test_id, (None,))[0] is not test:
+            # The check was removed or replaced by a reload while it ran
+            return test_result
         current_datetime = datetime.now()
         test.last_run_time = current_datetime.strftime("%Y-%m-%d %H:%M:%S")
         test.last_run_successful = test_result
-        if last_state != test.last_run_successful:
-            self.state_log.add(State(test, last_state, test.last_run_successful))
-
-        if test_result == False:
-            if test.test_id not in group.failing_checks:
-                group.failing_checks.append(test.test_id)
-        elif test_result == True:
-            group.failing_checks = [
-                failing_checks
-                for failing_checks in group.failing_checks
-                if failing_checks != test.test_id
-            ]
+        test.last_run_duration = duration
+        if duration is not None:
+            test.timings["total_ms"] = round(duration, 3)
+            test.latency.observe(duration)
+        if self.result_store:
+            timestamp = self.result_store.append(
+                test.test_id, test_result, duration, test.extended_results or test.extended
+            )
+        else:
+            timestamp = time.time()
+        self.rollups.record(test.test_id, group.name, test_result, timestamp)
+        self.engine_stats.run_finished(test, duration)
+        health = test.health
+        confirmed_state = health.state
+        if health.observe(test_result):
+            # Only confirmed changes, a single lost packet or a flapping check stays quiet
+            state = State(test, confirmed_state, health.state, flapping=health.flapping)
+            self.state_log.add(state)
+            self.groups.record(test, group, health.state)
+            self._reachability_changed(self.dependencies.record(test.test_id, health.state))
+            for callback in self.subscribers:
+                try:
+                    callback(state)
+                except Exception:
+                    logger.exception("State subscriber %s failed", callback)
+        if test.adaptive and test.adaptive.update(test_result, health.state):
+            self._expedite(test)
+        self.snapshot.update(test, group)
+        self.metrics.observe(test, test_result)
         return test_result
 
+    def _reachability_changed(self, hosts: list):
+        """Suppresses or resumes the checks of hosts whose dependencies went down or came back"""
+        if not hosts:
+            return
+        suppressed = resumed = 0
+        changed, to_resume = [], []
+        with self._dependency_lock:
+            for host_name in hosts:
+                unreachable = self.dependencies.suppressed(host_name)
+                for test_id in self.dependencies.tests_of(host_name):
+                    entry = self.tests.get(test_id)
+                    if entry is None or entry[0].suppressed == unreachable:
+                        continue
+                    test, group = entry
+                    test.suppressed = unreachable
+                    changed.append(test)
+                    # The suppressed period is not lateness, the next run starts a new measurement
+                    self.engine_stats.forget(test_id)
+                    self.snapshot.update(test, group)
+                    if unreachable:
+                        suppressed += 1
+                    else:
+                        resumed += 1
+                        to_resume.append((self.dependencies.depth.get(host_name, 0), test, group))
+        if suppressed:
+            logger.info("Suppressed %s checks behind a down host", suppressed)
+        if resumed:
+            logger.info("Resuming %s checks behind a recovered host", resumed)
+        if self.coordinator:
+            # Workers run the checks, they skip or resume them when told
+            self.coordinator.suppress(changed)
+        elif to_resume:
+            self._resume(to_resume)
+
+    def _resume(self, tests: list):
+        """Runs resumed checks once right away, each dependency level RESUME_STAGGER seconds after its parents"""
+        now = datetime.now(timezone.utc)
+        first = min(depth for depth, _, _ in tests)
+        run_func = self.run_test_async if isinstance(self.scheduler, AsyncScheduler) else self.run_test
+        triggers = {}
+        for depth, test, group in tests:
+            if depth not in triggers:
+                triggers[depth] = DateTrigger(now + timedelta(seconds=(depth - first) * RESUME_STAGGER))
+            self.scheduler.add_job(run_func, trigger=triggers[depth], args=(test, group))
+
+    def _expedite(self, test):
+        """Brings a check's next run forward after its adaptive interval got shorter"""
+        # The asyncio engine computes the next run after each run completes, so only APScheduler needs it
+        if isinstance(self.scheduler, BackgroundScheduler):
+            try:
+                self.scheduler.modify_job(test.test_id, next_run_time=next_run(test.adaptive))
+            except JobLookupError:
+                pass
+
     def to_json(self):
-        root_container = {'groups': []}
+        root_container = {'groups': [], 'totals': self.groups.totals()}
         for group in self.groups:
+            failing_checks, counts = group.state()
             group_container = {
                 "name": group.name,
-                "failing_checks": group.failing_checks,
+                "failing_checks": failing_checks,
+                "counts": counts,
                 "checks": [],
             }
-            for test in group.checks:
-                group_container["checks"].append(
-                    test.to_dict()
-
-                )  # BUG: This is not ideal, non-serializable types cannot be used
+            for test in list(group.checks.values()):
+                group_container["checks"].append(test.to_scoreboard_dict())
             root_container['groups'].append(group_container)
-        states = []
-        # for state in self.state_log.log:
-        #    states.append(state.__dict__)
-        # state_container = {"state_log": states}
-        # root_container.append(state_container)
         return root_container
 
     def initialize_tests(self, config: Config):
+        self.dependencies.configure(config.hosts)
+        with gc_paused():
+            for test_id, host, check in self._config_checks(config):
+                self.add_test(host=host, check=self._build_test(test_id, host, check))
+                self.definitions[test_id] = check
+        self.initialized.set()
+        totals = self.groups.totals()
+        logger.info("Loaded %s tests in %s groups", len(self.tests), totals["groups"])
+
+    def _config_checks(self, config: Config):
+        """Yields (test_id, host, check) for every enabled check in the config"""
+        seen = Counter()
         for host in config.hosts:
             for check in host.checks:
-                self.add_test(host=host, check=self.initialize_check(host, check))
-        print(f"Loaded Tests: {self.groups}")
+                identity = (host.group, host.name, host.target, check.type, check.display_name)
+                test_id = stable_test_id(host, check, seen[identity])
+                seen[identity] += 1
+                if check.enabled is False:
+                    logger.debug("Check '%s' on %s is disabled, ignoring...", check.display_name, host.name)
+                    continue
+                yield test_id, host, check
+
+    def _build_test(self, test_id: str, host: Host, check: Check) -> SchedulableCheck:
+        test = self.initialize_check(host, check)
+        test.test_id = test_id
+        return test
 
     def initialize_check(self, host: Host, check: Check):
         if not check.type.upper() in CheckTypes.__members__:
@@ -156,7 +721,7 @@ class TestSuite:
             raise CheckNotFoundError(error_msg)
 
         if check.enabled == False:
-            logger.debug("Check '%s' is disabled, ignoring...", check.name)
+            logger.debug("Check '%s' is disabled, ignoring...", check.display_name)
             return
 
         check_class = get_check_class(check.type)